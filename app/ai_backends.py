@@ -0,0 +1,238 @@
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional
+
+class TranslationBackend:
+    """Interface for models that translate natural language to a command
+    
+    translate_batch receives a list of {'query': ..., 'cwd': ...} requests
+    and returns one command string (or None when it has no answer) per
+    request, in order.
+    """
+    
+    name = 'backend'
+    
+    def translate_batch(self, requests: List[Dict]) -> List[Optional[str]]:
+        raise NotImplementedError
+
+class LocalHTTPBackend(TranslationBackend):
+    """Model served by a local HTTP process
+    
+    POSTs {"requests": [{"query", "cwd"}, ...]} and expects
+    {"commands": [str | null, ...]} back.
+    """
+    
+    name = 'http'
+    
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+    
+    def translate_batch(self, requests: List[Dict]) -> List[Optional[str]]:
+        body = json.dumps({'requests': requests}).encode('utf-8')
+        http_request = urllib.request.Request(
+            self.url, data=body, headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(http_request, timeout=self.timeout) as response:
+            commands = json.loads(response.read().decode('utf-8')).get('commands', [])
+        return (list(commands) + [None] * len(requests))[:len(requests)]
+
+class CallableBackend(TranslationBackend):
+    """In-process model exposed as a function over a batch of requests"""
+    
+    name = 'callable'
+    
+    def __init__(self, func: Callable[[List[Dict]], List[Optional[str]]]):
+        self.func = func
+    
+    def translate_batch(self, requests: List[Dict]) -> List[Optional[str]]:
+        return list(self.func(requests))
+
+def load_backend(spec: str) -> TranslationBackend:
+    """Create a backend from a spec string
+    
+    'http://host:port/path' uses LocalHTTPBackend; 'package.module:factory'
+    imports the module (so heavy model code is only loaded when configured)
+    and calls factory(), which must return a TranslationBackend or a
+    callable taking a batch of requests.
+    """
+    if spec.startswith(('http://', 'https://')):
+        return LocalHTTPBackend(spec)
+    module_name, _, attribute = spec.partition(':')
+    if not attribute:
+        raise ValueError(f"Invalid backend spec '{spec}' (expected URL or module:factory)")
+    backend = getattr(importlib.import_module(module_name), attribute)()
+    if isinstance(backend, TranslationBackend):
+        return backend
+    return CallableBackend(backend)
+
+class TranslationCache:
+    """Persistent (SQLite) cache of model translations keyed on query and cwd"""
+    
+    def __init__(self, db_path: str, max_entries: int = 50000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS translations ('
+            'query TEXT NOT NULL, cwd TEXT NOT NULL, command TEXT, created REAL, '
+            'PRIMARY KEY (query, cwd))'
+        )
+        self._connection().commit()
+    
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            self._local.conn = conn
+        return conn
+    
+    def get(self, query: str, cwd: str):
+        """Return (hit, command)"""
+        row = self._connection().execute(
+            'SELECT command FROM translations WHERE query = ? AND cwd = ?', (query, cwd)
+        ).fetchone()
+        # Rows without a command are non-answers stored by older versions
+        return (True, row[0]) if row and row[0] is not None else (False, None)
+    
+    def put(self, query: str, cwd: str, command: Optional[str]):
+        conn = self._connection()
+        conn.execute('INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)',
+                     (query, cwd, command, time.time()))
+        conn.execute(
+            'DELETE FROM translations WHERE rowid IN (SELECT rowid FROM translations '
+            'ORDER BY created DESC LIMIT -1 OFFSET ?)', (self.max_entries,)
+        )
+        conn.commit()
+
+class BatchingTranslator:
+    """Coalesce concurrent translation requests into backend batches
+    
+    Requests arriving within `batch_window` seconds of each other (up to
+    `max_batch`) are sent to the backend as one call. Callers wait on a
+    Future with their own latency budget.
+    """
+    
+    def __init__(self, backend: TranslationBackend, cache: Optional[TranslationCache] = None,
+                 max_batch: int = 16, batch_window: float = 0.01):
+        self.backend = backend
+        self.cache = cache
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self._pending: List = []
+        self._condition = threading.Condition()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'cache_hits': 0,
+            'backend_calls': 0,
+            'batched_requests': 0,
+            'timeouts': 0,
+            'errors': 0,
+            'latency_total_ms': 0.0,
+            'latency_max_ms': 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name='ai-batcher', daemon=True)
+        self._thread.start()
+    
+    def _count(self, key: str, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+    
+    def translate(self, query: str, cwd: str, budget: float) -> Optional[str]:
+        """Translate a query, giving up (returning None) after `budget` seconds"""
+        started = time.perf_counter()
+        self._count('requests')
+        try:
+            if self.cache is not None:
+                hit, command = self.cache.get(query, cwd)
+                if hit:
+                    self._count('cache_hits')
+                    return command
+            future: Future = Future()
+            with self._condition:
+                self._pending.append(({'query': query, 'cwd': cwd}, future))
+                self._condition.notify()
+            try:
+                return future.result(timeout=budget)
+            except FutureTimeoutError:
+                self._count('timeouts')
+                return None
+            except Exception:
+                self._count('errors')
+                return None
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            with self._stats_lock:
+                self.stats['latency_total_ms'] += elapsed
+                self.stats['latency_max_ms'] = max(self.stats['latency_max_ms'], elapsed)
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # Give concurrent callers a moment to join this batch
+                deadline = time.monotonic() + self.batch_window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                self._pending = self._pending[self.max_batch:]
+            try:
+                self._dispatch(batch)
+            except Exception as e:
+                # Never let one bad batch stop the (single) batcher thread
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    def _dispatch(self, batch):
+        requests = [request for request, _ in batch]
+        self._count('backend_calls')
+        self._count('batched_requests', len(batch))
+        try:
+            commands = list(self.backend.translate_batch(requests))
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for index, (request, future) in enumerate(batch):
+            try:
+                if index >= len(commands):
+                    raise ValueError(f"Backend returned {len(commands)} results for "
+                                     f"{len(batch)} requests")
+                command = commands[index]
+                if command is not None and not isinstance(command, str):
+                    raise TypeError(f"Backend returned {type(command).__name__}, expected str")
+                command = command.strip().splitlines()[0] if command and command.strip() else None
+                # Only real answers are cached: a non-answer may be temporary
+                if command is not None and self.cache is not None:
+                    try:
+                        self.cache.put(request['query'], request['cwd'], command)
+                    except sqlite3.Error:
+                        pass
+                future.set_result(command)
+            except Exception as e:
+                future.set_exception(e)
+    
+    def get_stats(self) -> Dict:
+        """Counters plus derived hit rate and mean latency"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        requests = stats['requests'] or 1
+        stats['cache_hit_rate'] = round(stats['cache_hits'] / requests, 3)
+        stats['latency_avg_ms'] = round(stats['latency_total_ms'] / requests, 3)
+        stats['avg_batch_size'] = round(stats['batched_requests'] / (stats['backend_calls'] or 1), 2)
+        return stats
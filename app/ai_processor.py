@@ -1,11 +1,58 @@
 import re
 import os
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+# Words a query is split into when looking up candidate intents
+TOKEN_RE = re.compile(r"[a-z0-9_]+")
+# A leading alternation of plain words, e.g. (?:list|show)
+LEADING_ALTERNATION_RE = re.compile(r"\(\?:([a-z0-9_|]+)\)")
+LEADING_WORD_RE = re.compile(r"[a-z0-9_]+")
+
+def leading_keywords(pattern: str) -> Optional[List[str]]:
+    """Literal words one of which every match of `pattern` must start with
+    
+    Returns None when the pattern does not start with a plain word or an
+    alternation of plain words; such patterns are tried for every query.
+    """
+    if _has_top_level_alternation(pattern):
+        return None
+    for regex in (LEADING_ALTERNATION_RE, LEADING_WORD_RE):
+        match = regex.match(pattern)
+        if match:
+            # A quantifier would make the leading word optional
+            if pattern[match.end():match.end() + 1] in ('?', '*', '{'):
+                return None
+            words = match.group(match.lastindex or 0).split('|')
+            return words if all(words) else None
+    return None
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    """True if `pattern` contains a '|' outside any group or character class"""
+    depth = 0
+    in_class = False
+    escaped = False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and depth == 0:
+            return True
+    return False
 
 class AIProcessor:
     """Process natural language queries and convert to terminal commands"""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = 1024, translator=None, latency_budget: float = 0.5):
         self.command_patterns = {
             r'create (?:a )?(?:new )?(?:folder|directory) (?:called |named )?([^\s]+)': 'mkdir {}',
             r'make (?:a )?(?:new )?(?:folder|directory) (?:called |named )?([^\s]+)': 'mkdir {}',
@@ -21,14 +68,83 @@ class AIProcessor:
             r'who am i': 'whoami',
             r'go to (?:the )?(?:directory|folder) ([^\s]+)': 'cd {}',
         }
+        self.cache_size = cache_size
+        # Optional BatchingTranslator (local model) consulted when no regex
+        # intent matches; answers slower than `latency_budget` are dropped
+        self.translator = translator
+        self.latency_budget = latency_budget
+        self._compile_intents()
+    
+    def add_intent(self, pattern: str, command_template: str):
+        """Register an extra pattern; it is tried after the existing ones"""
+        self.command_patterns[pattern] = command_template
+        self._compile_intents()
+    
+    def _compile_intents(self):
+        """Precompile patterns and index them by their leading keyword"""
+        self._intents: List[Tuple[re.Pattern, str]] = []
+        self._keyword_index: Dict[str, List[int]] = {}
+        self._unindexed: List[int] = []
+        for position, (pattern, command_template) in enumerate(self.command_patterns.items()):
+            self._intents.append((re.compile(pattern, re.IGNORECASE), command_template))
+            keywords = leading_keywords(pattern)
+            if keywords is None:
+                self._unindexed.append(position)
+                continue
+            for keyword in keywords:
+                self._keyword_index.setdefault(keyword, []).append(position)
+        # Cached results depend on the intent set, so start a fresh cache
+        self._match_cached = lru_cache(maxsize=self.cache_size)(self._match_query)
+    
+    def _candidates(self, query: str) -> List[int]:
+        """Positions of the intents that could match, in registration order"""
+        candidates = set(self._unindexed)
+        for token in TOKEN_RE.findall(query):
+            positions = self._keyword_index.get(token)
+            if positions:
+                candidates.update(positions)
+        return sorted(candidates)
     
-    def process_query(self, query: str) -> Dict[str, Any]:
+    def cache_info(self):
+        """Hit/miss statistics of the query result cache"""
+        return self._match_cached.cache_info()
+    
+    def process_query(self, query: str, cwd: Optional[str] = None) -> Dict[str, Any]:
         """Process natural language query and return command or response"""
         query = query.strip().lower()
+        result = dict(self._match_cached(query))
+        if result['requires_execution'] or self.translator is None:
+            return result
         
+        # Regex fast path missed: ask the model within the latency budget
+        command = self.translator.translate(' '.join(query.split()), cwd or '', self.latency_budget)
+        if not command:
+            return result
+        return {
+            'requires_execution': True,
+            'command': command,
+            'explanation': f'Model interpreted "{query}" as: {command}'
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Regex cache and model translation counters"""
+        info = self.cache_info()
+        stats = {
+            'intents': len(self._intents),
+            'regex_cache_hits': info.hits,
+            'regex_cache_misses': info.misses,
+            'regex_cache_size': info.currsize,
+        }
+        if self.translator is not None:
+            stats['model'] = self.translator.get_stats()
+        return stats
+    
+    def _match_query(self, query: str) -> Dict[str, Any]:
+        """Uncached matching of a normalized query"""
         # Try to match command patterns
-        for pattern, command_template in self.command_patterns.items():
-            match = re.search(pattern, query, re.IGNORECASE)
+        for position in self._candidates(query):
+            compiled, command_template = self._intents[position]
+            match = compiled.search(query)
             if match:
                 groups = match.groups()
                 args = [arg for arg in groups if arg]
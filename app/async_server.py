@@ -0,0 +1,382 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from . import file_reader
+from .async_terminal import AsyncTerminal
+from .governor import GovernorBusy
+from .instrumentation import instrumentation
+from .streaming import SSE_HEADERS, sse_comment, sse_event
+
+# Request line plus headers; larger requests get 431
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+class _HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class _Request:
+    __slots__ = ('method', 'path', 'query', 'headers', 'body')
+    
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path
+        self.query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+    
+    def json(self) -> Dict:
+        if self.headers.get('content-type', '').split(';')[0].strip() != 'application/json':
+            raise _HTTPError(415, 'Expected application/json')
+        try:
+            data = json.loads(self.body or b'{}')
+        except ValueError:
+            raise _HTTPError(400, 'Invalid JSON')
+        return data if isinstance(data, dict) else {}
+
+class AsyncServer:
+    """asyncio HTTP endpoint for command execution, file reads and metrics
+    
+    Serves the execution API (/execute, /execute/stream, /file,
+    /system_info, /system_info/stream) from one event loop thread, so idle
+    keep-alive connections and long-running streams cost a coroutine each
+    rather than a pool thread. Blocking work (built-in commands, file
+    reads, resampling) runs on a ThreadPoolExecutor of `workers` threads;
+    streamed built-ins, which hold a thread for their whole lifetime, get
+    a separate pool of `max_streams` threads and a 429 once it is full.
+    Like the WebSocket server it runs on its own port and shares the app's
+    sessions: `session_resolver` maps the Cookie header to a session id.
+    Cross-origin requests are refused unless the origin's host is the
+    server's host or listed in `allowed_origins`.
+    """
+    
+    def __init__(self, address: Tuple[str, int], session_manager, session_resolver: Callable,
+                 system_monitor=None, workers: int = 4, keepalive_timeout: float = 75.0,
+                 allowed_origins=(), max_streams: int = 16):
+        self.server_address = address
+        self.session_manager = session_manager
+        self.session_resolver = session_resolver
+        self.system_monitor = system_monitor
+        self.workers = workers
+        self.max_streams = max_streams
+        self.keepalive_timeout = keepalive_timeout
+        self.allowed_origins = {origin.rstrip('/') for origin in allowed_origins}
+        self.connections = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stream_executor: Optional[ThreadPoolExecutor] = None
+        self._stream_slots = threading.BoundedSemaphore(max_streams)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._routes = {
+            ('POST', '/execute'): self._execute,
+            ('GET', '/execute/stream'): self._execute_stream,
+            ('POST', '/execute/stream'): self._execute_stream,
+            ('GET', '/file'): self._read_file,
+            ('GET', '/system_info'): self._system_info,
+            ('GET', '/system_info/stream'): self._system_info_stream,
+        }
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """Bind and serve on a daemon thread; raises if the port cannot be bound"""
+        if self.running:
+            return
+        self._started.clear()
+        self._error = None
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='async-worker')
+        self._stream_executor = ThreadPoolExecutor(max_workers=self.max_streams,
+                                                   thread_name_prefix='async-stream')
+        self._thread = threading.Thread(target=self._run, name='async-server', daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+    
+    def stop(self, timeout: float = 5.0):
+        if self._loop is not None and self.running:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+            self._thread.join(timeout)
+        for executor in (self._executor, self._stream_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _run(self):
+        loop = self._loop = asyncio.new_event_loop()
+        _use_pidfd_child_watcher(loop)
+        try:
+            loop.run_until_complete(self._serve())
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._started.set()
+            loop.close()
+    
+    async def _serve(self):
+        self._stopped = asyncio.Event()
+        host, port = self.server_address
+        server = await asyncio.start_server(self._handle_connection, host, port,
+                                            limit=MAX_HEADER_BYTES, reuse_address=True)
+        self.server_address = server.sockets[0].getsockname()[:2]
+        self._started.set()
+        async with server:
+            await self._stopped.wait()
+            server.close()
+            # Streams never finish on their own: cancel the open connections
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.keepalive_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except _HTTPError as e:
+                    await self._send_json(writer, e.status, {'success': False, 'error': str(e)}, close=True)
+                    return
+                if request is None:
+                    return
+                keep_alive = await self._dispatch(request, writer)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        except asyncio.CancelledError:
+            pass  # server stopping
+        finally:
+            self.connections -= 1
+            writer.close()
+    
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[_Request]:
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as e:
+            if not e.partial.strip():
+                return None  # client closed an idle connection
+            raise
+        except asyncio.LimitOverrunError:
+            raise _HTTPError(431, 'Request header too large')
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            raise _HTTPError(400, 'Malformed request line')
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise _HTTPError(501, 'Chunked request bodies are not supported')
+        try:
+            length = int(headers.get('content-length', '0'))
+        except ValueError:
+            raise _HTTPError(400, 'Invalid Content-Length')
+        if length > MAX_BODY_BYTES:
+            raise _HTTPError(413, 'Request body too large')
+        body = await reader.readexactly(length) if length else b''
+        return _Request(method, target, headers, body)
+    
+    async def _dispatch(self, request: _Request, writer: asyncio.StreamWriter) -> bool:
+        """Run the matching route; returns whether the connection stays open"""
+        started = time.perf_counter()
+        handler = self._routes.get((request.method, request.path))
+        keep_alive = request.headers.get('connection', '').lower() != 'close'
+        status = 200
+        try:
+            if handler is None:
+                known = any(path == request.path for _, path in self._routes)
+                raise _HTTPError(405 if known else 404, 'Method not allowed' if known else 'Not found')
+            if not self._origin_allowed(request.headers.get('origin'), request.headers.get('host', '')):
+                raise _HTTPError(403, 'Origin not allowed')
+            status, keep_alive = await handler(request, writer, keep_alive)
+        except _HTTPError as e:
+            status = e.status
+            await self._send_json(writer, status, {'success': False, 'error': str(e)}, close=not keep_alive)
+        except GovernorBusy as e:
+            status = 429
+            instrumentation.count_error('busy')
+            await self._send_json(writer, status, {'success': False, 'output': f'Error: {e}', 'type': 'busy'},
+                                  close=not keep_alive,
+                                  headers={'Retry-After': str(max(1, round(e.retry_after)))})
+        except (ConnectionError, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            status = 500
+            instrumentation.count_error('http')
+            await self._send_json(writer, status, {'success': False, 'error': str(e)}, close=True)
+            keep_alive = False
+        instrumentation.end_request('async' + request.path.replace('/', '.'), request.method, status,
+                                    time.perf_counter() - started)
+        return keep_alive
+    
+    def _origin_allowed(self, origin: Optional[str], host: str) -> bool:
+        if not origin:
+            return True  # not a browser
+        if origin.rstrip('/') in self.allowed_origins:
+            return True
+        # Same host on any port: the page is served by the HTTP port
+        return urlsplit(origin).hostname == urlsplit(f'//{host}').hostname
+    
+    async def _terminal(self, request: _Request) -> AsyncTerminal:
+        session_id = self.session_resolver(request.headers.get('cookie', ''))
+        # A new session loads its history from disk: create it off the loop
+        terminal = await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.session_manager.get_terminal, session_id)
+        return AsyncTerminal(terminal, self._executor, self._stream_executor, self._stream_slots)
+    
+    async def _execute(self, request, writer, keep_alive):
+        command = str(request.json().get('command', '')).strip()
+        if not command:
+            payload = {'success': False, 'output': 'Error: Empty command', 'type': 'error'}
+        else:
+            terminal = await self._terminal(request)
+            output = await terminal.execute_command(command)
+            payload = {'success': True, 'output': output, 'type': 'command'}
+        await self._send_json(writer, 200, payload, close=not keep_alive)
+        return 200, keep_alive
+    
+    async def _execute_stream(self, request, writer, keep_alive):
+        """Output as Server-Sent Events: `output` chunks, then `exit`"""
+        data = request.json() if request.method == 'POST' else request.query
+        command = str(data.get('command', '')).strip()
+        if not command:
+            await self._send_json(writer, 200, {'success': False, 'output': 'Error: Empty command',
+                                                'type': 'error'}, close=not keep_alive)
+            return 200, keep_alive
+        
+        terminal = await self._terminal(request)
+        chunks = terminal.stream_command(command)
+        try:
+            # The first chunk is awaited before answering so a busy server
+            # can still reply 429
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = None
+        await self._start_stream(writer)
+        try:
+            if first is not None:
+                await self._send_event(writer, sse_event({'output': first}, event='output') if first
+                                       else sse_comment())
+                async for chunk in chunks:
+                    await self._send_event(writer, sse_event({'output': chunk}, event='output') if chunk
+                                           else sse_comment())
+        finally:
+            await chunks.aclose()
+        await self._send_event(writer, sse_event({'returncode': terminal.last_returncode}, event='exit'))
+        return 200, False
+    
+    async def _read_file(self, request, writer, keep_alive):
+        """One page of a file; same parameters and payload as the WSGI /file route"""
+        path = request.query.get('path', '').strip()
+        if not path:
+            raise _HTTPError(400, 'Path required')
+        terminal = await self._terminal(request)
+        try:
+            max_bytes = min(int(request.query.get('max_bytes', file_reader.DEFAULT_MAX_BYTES)),
+                            file_reader.DEFAULT_MAX_BYTES)
+            if 'tail' in request.query:
+                page = await terminal.tail_file(path, int(request.query['tail'] or 10), max_bytes)
+            else:
+                page = await terminal.read_file(path, int(request.query.get('offset', 0)), max_bytes)
+        except ValueError as e:
+            raise _HTTPError(400, str(e))
+        except FileNotFoundError:
+            raise _HTTPError(404, f"File '{path}' not found")
+        except IsADirectoryError:
+            raise _HTTPError(400, f"'{path}' is a directory")
+        except PermissionError:
+            raise _HTTPError(403, f"Permission denied: '{path}'")
+        except UnicodeDecodeError:
+            raise _HTTPError(415, 'Cannot read binary file')
+        await self._send_json(writer, 200, {'success': True, **page}, close=not keep_alive)
+        return 200, keep_alive
+    
+    async def _system_info(self, request, writer, keep_alive):
+        if self.system_monitor is None:
+            raise _HTTPError(404, 'System monitor not available')
+        info = await self.system_monitor.get_system_info_async(self._executor)
+        await self._send_json(writer, 200, {'success': True, 'data': info}, close=not keep_alive)
+        return 200, keep_alive
+    
+    async def _system_info_stream(self, request, writer, keep_alive):
+        """Metric deltas as Server-Sent Events (query: fields, interval)"""
+        if self.system_monitor is None:
+            raise _HTTPError(404, 'System monitor not available')
+        fields = [f.strip() for f in request.query.get('fields', '').split(',') if f.strip()]
+        try:
+            interval = float(request.query.get('interval', 0)) or None
+        except ValueError:
+            interval = None
+        subscription = self.system_monitor.subscribe(fields=fields or None, interval=interval)
+        await self._start_stream(writer)
+        try:
+            while not subscription.closed:
+                delta = await subscription.next_delta_async(timeout=15.0)
+                await self._send_event(writer, sse_comment() if delta is None
+                                       else sse_event(delta, event='metrics'))
+        finally:
+            self.system_monitor.unsubscribe(subscription)
+        return 200, False
+    
+    @staticmethod
+    async def _send_json(writer, status: int, payload: Dict, close: bool = False,
+                         headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode('utf-8')
+        head = [f'HTTP/1.1 {status} {HTTPStatus(status).phrase}',
+                'Content-Type: application/json',
+                f'Content-Length: {len(body)}',
+                'Connection: close' if close else 'Connection: keep-alive']
+        head.extend(f'{name}: {value}' for name, value in (headers or {}).items())
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+    
+    @staticmethod
+    async def _start_stream(writer):
+        # No Content-Length: the stream ends when the connection closes
+        head = ['HTTP/1.1 200 OK', 'Content-Type: text/event-stream', 'Connection: close']
+        head.extend(f'{name}: {value}' for name, value in SSE_HEADERS.items())
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+    
+    @staticmethod
+    async def _send_event(writer, event: str):
+        writer.write(event.encode('utf-8'))
+        # A slow client pauses the stream here (and so the command's pipe)
+        await writer.drain()
+
+def _use_pidfd_child_watcher(loop):
+    """Wait for `loop`'s subprocesses with pidfds instead of a thread per child
+    
+    Only needed before Python 3.12, whose default already does this.
+    """
+    if sys.version_info >= (3, 12) or not hasattr(asyncio, 'PidfdChildWatcher') \
+            or not hasattr(os, 'pidfd_open'):
+        return
+    try:
+        os.close(os.pidfd_open(os.getpid()))
+    except OSError:
+        return  # kernel without pidfd support
+    watcher = asyncio.PidfdChildWatcher()
+    watcher.attach_loop(loop)
+    asyncio.set_child_watcher(watcher)
@@ -0,0 +1,282 @@
+import asyncio
+import codecs
+import os
+import shlex
+import signal
+import subprocess
+from typing import AsyncIterator, Dict, Optional
+
+from . import file_reader
+from .governor import GovernorBusy
+from .instrumentation import instrumentation
+from .pipeline import PipelineSyntaxError, needs_shell, parse as parse_pipeline
+from .terminal import STREAM_CHUNK_SIZE, STREAM_MAX_OUTPUT_BYTES
+
+# A stream with no output for this long yields '' so callers can send a keepalive
+IDLE_CHUNK_INTERVAL = 15.0
+# How long a killed command's pipes may take to close before it is abandoned
+REAP_TIMEOUT = 5.0
+
+_END = object()
+
+class AsyncTerminal:
+    """asyncio front end to a PythonTerminal
+    
+    System commands run as asyncio subprocesses, so a waiting or
+    streaming command costs a coroutine instead of an OS thread, and
+    execution slots are queued for on the event loop. Built-in commands
+    and pipelines keep their synchronous implementations and run on
+    `executor` (a bounded thread pool), as do file reads. A streamed
+    built-in holds a thread between chunks, so those streams run on
+    `stream_executor` instead and take one of `stream_slots` (a
+    BoundedSemaphore); when none is free the stream raises GovernorBusy.
+    Session state (cwd, environment, history, governor) is the wrapped
+    terminal's, so both APIs can be used on one session.
+    """
+    
+    def __init__(self, terminal, executor=None, stream_executor=None, stream_slots=None):
+        self.terminal = terminal
+        self.executor = executor
+        self.stream_executor = stream_executor or executor
+        self.stream_slots = stream_slots
+        # Exit status of the last stream_command(), once it has ended
+        self.last_returncode: Optional[int] = None
+    
+    @property
+    def current_directory(self) -> str:
+        return self.terminal.current_directory
+    
+    async def execute_command(self, command: str) -> str:
+        """Execute a command and return its output"""
+        if not self._is_system_command(command):
+            return await self._offload(self.terminal.execute_command, command)
+        
+        terminal = self.terminal
+        entry = terminal._add_to_history(command)
+        exit_status = 1
+        try:
+            output, exit_status = await self._execute_system_command(command)
+            return output
+        finally:
+            terminal._finish_history(entry, exit_status)
+            if instrumentation.enabled:
+                instrumentation.observe_command('external', entry['duration'], exit_status == 0)
+    
+    async def _execute_system_command(self, command: str):
+        """Async counterpart of PythonTerminal._execute_system_command"""
+        slot = await self._acquire_slot()
+        try:
+            try:
+                proc = await self._spawn(command, stderr=subprocess.PIPE)
+            except OSError as e:
+                return f"Error: {str(e)}", 1
+            try:
+                stdout, stderr = await asyncio.wait_for(proc.communicate(),
+                                                        self.terminal._command_timeout(command))
+            except asyncio.TimeoutError:
+                instrumentation.count_error('subprocess')
+                return "Error: Command timed out", 124
+            finally:
+                await self._reap(proc)
+            
+            output = stdout.decode('utf-8', errors='replace').strip()
+            if stderr:
+                output += f"\nError: {stderr.decode('utf-8', errors='replace').strip()}"
+            return (output if output else "Command executed successfully"), proc.returncode
+        finally:
+            if slot is not None:
+                slot.release()
+    
+    async def stream_command(self, command: str, max_output_bytes: Optional[int] = STREAM_MAX_OUTPUT_BYTES,
+                             timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Execute a command, yielding output chunks as they are produced
+        
+        Yields '' after IDLE_CHUNK_INTERVAL seconds without output. The exit
+        status is left in `last_returncode`. Raises GovernorBusy from the
+        first iteration when no execution slot is available.
+        """
+        if self._is_system_command(command):
+            chunks = self._stream_system_command(command, max_output_bytes, timeout)
+        else:
+            chunks = self._stream_offloaded(command, max_output_bytes, timeout)
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+    
+    async def _stream_system_command(self, command, max_output_bytes, timeout):
+        terminal = self.terminal
+        entry = terminal._add_to_history(command)
+        self.last_returncode = 1
+        slot = proc = None
+        if timeout is None:
+            timeout = terminal._stream_timeout(command)
+        try:
+            slot = await self._acquire_slot()
+            try:
+                proc = await self._spawn(command, stderr=subprocess.STDOUT)
+            except OSError as e:
+                yield f"Error: {str(e)}"
+                return
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout if timeout is not None else None
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            bytes_read = 0
+            while True:
+                wait_for = IDLE_CHUNK_INTERVAL
+                if deadline is not None:
+                    wait_for = min(wait_for, deadline - loop.time())
+                    if wait_for <= 0:
+                        yield "\nError: Command timed out"
+                        return
+                try:
+                    # Cancelling a pending read loses nothing: data stays buffered
+                    chunk = await asyncio.wait_for(proc.stdout.read(STREAM_CHUNK_SIZE), wait_for)
+                except asyncio.TimeoutError:
+                    if deadline is None or loop.time() < deadline:
+                        yield ''
+                    continue
+                if not chunk:
+                    break
+                if max_output_bytes is not None and bytes_read + len(chunk) > max_output_bytes:
+                    chunk = chunk[:max_output_bytes - bytes_read]
+                    bytes_read += len(chunk)
+                    yield decoder.decode(chunk, final=True)
+                    yield f"\nError: Output truncated after {bytes_read} bytes"
+                    return
+                bytes_read += len(chunk)
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+        finally:
+            if proc is not None:
+                await self._reap(proc)
+                self.last_returncode = proc.returncode
+            if slot is not None:
+                slot.release()
+            terminal._finish_history(entry, self.last_returncode)
+    
+    async def _stream_offloaded(self, command, max_output_bytes, timeout):
+        """Drive PythonTerminal.stream_command on the stream executor, one chunk at a time"""
+        loop = asyncio.get_running_loop()
+        self.last_returncode = 1
+        slots = self.stream_slots
+        if slots is not None and not slots.acquire(blocking=False):
+            raise GovernorBusy("Server busy: too many streams running, retry shortly")
+        stream = pending = None
+        try:
+            stream = await self._offload(self.terminal.stream_command, command, max_output_bytes, timeout)
+            iterator = iter(stream)
+            while True:
+                if pending is None:
+                    pending = loop.run_in_executor(self.stream_executor, next, iterator, _END)
+                # Wait without cancelling: the executor thread cannot be interrupted
+                done, _ = await asyncio.wait({pending}, timeout=IDLE_CHUNK_INTERVAL)
+                if not done:
+                    yield ''
+                    continue
+                chunk, pending = pending.result(), None
+                if chunk is _END:
+                    break
+                yield chunk
+        finally:
+            try:
+                if pending is not None:
+                    # Stop the stream so the outstanding next() returns, then close it
+                    kill = getattr(stream, 'kill', None)
+                    if kill is not None:
+                        kill()
+                    await asyncio.wait({pending})
+                if stream is not None:
+                    await self._offload(stream.close)
+                    self.last_returncode = getattr(stream, 'returncode', 0)
+            finally:
+                if slots is not None:
+                    slots.release()
+    
+    async def read_file(self, path: str, offset: int = 0,
+                        max_bytes: int = file_reader.DEFAULT_MAX_BYTES) -> Dict:
+        """One page of a file (see file_reader.read_range), read on the executor"""
+        file_path = self.terminal._resolve_path(path)
+        page = await self._offload(file_reader.read_range, file_path, offset, max_bytes)
+        return {'path': file_path, **page}
+    
+    async def tail_file(self, path: str, count: int = 10,
+                        max_bytes: int = file_reader.DEFAULT_MAX_BYTES) -> Dict:
+        """The last `count` lines of a file, read on the executor"""
+        file_path = self.terminal._resolve_path(path)
+        page = await self._offload(file_reader.tail_lines, file_path, count, max_bytes)
+        return {'path': file_path, **page}
+    
+    def _offload(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+    
+    def _is_system_command(self, command: str) -> bool:
+        """Whether the synchronous terminal would hand `command` to a shell
+        
+        Anything unparseable is left to the synchronous path, which reports
+        the error.
+        """
+        try:
+            if not command.strip() or parse_pipeline(command) is not None:
+                return False
+            if needs_shell(command):
+                return True
+            parts = shlex.split(command.strip())
+        except (PipelineSyntaxError, ValueError):
+            return False
+        return self.terminal._builtin_for(parts) is None
+    
+    async def _acquire_slot(self):
+        governor = self.terminal.governor
+        if governor is None:
+            return None
+        return await governor.acquire_async(self.terminal.session_id)
+    
+    async def _spawn(self, command: str, stderr):
+        """Start `command` under the shell with its stdout on a pipe"""
+        terminal = self.terminal
+        options = dict(
+            cwd=terminal.current_directory,
+            env=terminal._command_environment(),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=stderr,
+            # Own process group so the whole pipeline can be killed at once
+            start_new_session=(os.name == 'posix')
+        )
+        with instrumentation.stage('spawn'):
+            if os.name == 'posix':
+                argv = terminal._limited(['/bin/sh', '-c', command])
+                return await asyncio.create_subprocess_exec(*argv, **options)
+            return await asyncio.create_subprocess_shell(command, **options)
+    
+    @staticmethod
+    async def _reap(proc):
+        """Kill `proc`'s process group if it is still running, then wait for it
+        
+        asyncio only reports the exit once the pipes are closed, so output
+        nobody read is discarded first.
+        """
+        if proc.returncode is None:
+            try:
+                if hasattr(os, 'killpg'):
+                    os.killpg(proc.pid, signal.SIGKILL)
+                else:
+                    proc.kill()
+            except (ProcessLookupError, PermissionError):
+                pass
+        
+        async def drain_and_wait():
+            for pipe in (proc.stdout, proc.stderr):
+                while pipe is not None and await pipe.read(STREAM_CHUNK_SIZE):
+                    pass
+            await proc.wait()
+        try:
+            await asyncio.wait_for(drain_and_wait(), REAP_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass  # a detached grandchild still holds the pipe open
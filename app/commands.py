@@ -0,0 +1,183 @@
+import threading
+from importlib import metadata
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Entry point group scanned for third-party terminal commands
+PLUGIN_GROUP = 'python_terminal.commands'
+
+class Command:
+    """A terminal command: a handler plus the argument schema it accepts
+    
+    `handler(terminal, args)` returns the command's output as a string, or
+    `(output, returncode)` when it knows its exit status.
+    `stream(terminal, args)`, when given, returns an iterable of output
+    chunks used by streaming transports instead of the buffered handler.
+    Arguments are checked against `min_args`/`max_args` before either is
+    called, so handlers can assume the schema holds. `parse(terminal,
+    args)`, when given, parses the arguments without running anything and
+    raises ValueError for ones the handler does not implement; pipelines
+    use it to decide whether the built-in can stand in for the program of
+    the same name.
+    """
+    
+    def __init__(self, name: str, handler: Callable, aliases: Iterable[str] = (),
+                 min_args: int = 0, max_args: Optional[int] = None,
+                 usage: str = '', summary: str = '', missing: Optional[str] = None,
+                 stream: Optional[Callable] = None, parse: Optional[Callable] = None):
+        self.name = name
+        self.handler = handler
+        self.aliases = tuple(aliases)
+        self.min_args = min_args
+        self.max_args = max_args
+        self.usage = usage or name
+        self.summary = summary
+        # Error shown when fewer than `min_args` arguments are given
+        self.missing = missing
+        self.stream = stream
+        self.parse = parse
+    
+    def validate(self, args: List[str]) -> Optional[str]:
+        """Return an error message if `args` do not fit the schema"""
+        if len(args) < self.min_args:
+            return f"Error: {self.missing or 'Usage: ' + self.usage}"
+        if self.max_args is not None and len(args) > self.max_args:
+            return f"Error: Too many arguments. Usage: {self.usage}"
+        return None
+    
+    def argument_error(self, terminal, args: List[str]) -> Optional[str]:
+        """validate() plus the `parse` check: an error message, or None"""
+        error = self.validate(args)
+        if error is None and self.parse is not None:
+            try:
+                self.parse(terminal, args)
+            except ValueError as e:
+                error = f"Error: {self.name}: {str(e)}"
+        return error
+    
+    def run(self, terminal, args: List[str]) -> str:
+        return self.execute(terminal, args)[0]
+    
+    def execute(self, terminal, args: List[str]) -> Tuple[str, int]:
+        """Run the handler, returning (output, exit status)
+        
+        Handlers that only return text get status 1 for "Error..." output
+        and 0 otherwise.
+        """
+        error = self.validate(args)
+        if error:
+            return error, 1
+        output = self.handler(terminal, args)
+        if isinstance(output, tuple):
+            return output
+        return output, 1 if output.startswith('Error') else 0
+    
+    def run_stream(self, terminal, args: List[str]) -> Iterable[str]:
+        error = self.validate(args)
+        if error:
+            return iter([error])
+        if self.stream is not None:
+            return self.stream(terminal, args)
+        return iter([self.run(terminal, args)])
+
+class CommandRegistry:
+    """Name -> Command table with lazily discovered entry point plugins
+    
+    Built-in lookups are a single dict access. Installed distributions are
+    only scanned for `PLUGIN_GROUP` entry points the first time a name is
+    missing from the table, and a plugin module is imported only when its
+    command is first run.
+    """
+    
+    def __init__(self, plugin_group: Optional[str] = PLUGIN_GROUP):
+        self.plugin_group = plugin_group
+        self._commands: Dict[str, Command] = {}
+        self._plugins: Optional[Dict[str, metadata.EntryPoint]] = None
+        self._plugin_errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    def register(self, command: Command) -> Command:
+        """Add a command under its name and aliases, replacing any existing one"""
+        for name in (command.name,) + command.aliases:
+            self._commands[name] = command
+        return command
+    
+    def command(self, name: str, **schema):
+        """Decorator form of register() for `handler(terminal, args)` functions"""
+        def decorator(handler):
+            self.register(Command(name, handler, **schema))
+            return handler
+        return decorator
+    
+    def get(self, name: str) -> Optional[Command]:
+        """Look up a command by name, loading a matching plugin on first use"""
+        command = self._commands.get(name)
+        if command is not None or self.plugin_group is None:
+            return command
+        entry_point = self._discover().get(name)
+        if entry_point is None:
+            return None
+        return self._load(name, entry_point)
+    
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+    
+    def names(self) -> List[str]:
+        """All command names, including plugins that have not been loaded yet"""
+        names = set(self._commands)
+        if self.plugin_group is not None:
+            names.update(self._discover())
+        return sorted(names)
+    
+    def plugin_names(self) -> List[str]:
+        """Names provided by installed entry point plugins (without loading them)"""
+        if self.plugin_group is None:
+            return []
+        return sorted(self._discover())
+    
+    def commands(self) -> List[Command]:
+        """Loaded commands in registration order, one entry per command"""
+        return list(dict.fromkeys(self._commands.values()))
+    
+    def plugin_errors(self) -> Dict[str, str]:
+        """Plugins that failed to load, mapped to the error message"""
+        return dict(self._plugin_errors)
+    
+    def _discover(self) -> Dict[str, metadata.EntryPoint]:
+        if self._plugins is None:
+            with self._lock:
+                if self._plugins is None:
+                    try:
+                        entry_points = metadata.entry_points()
+                        if hasattr(entry_points, 'select'):
+                            found = entry_points.select(group=self.plugin_group)
+                        else:
+                            found = entry_points.get(self.plugin_group, [])
+                    except Exception:
+                        found = []
+                    self._plugins = {ep.name: ep for ep in found}
+        return self._plugins
+    
+    def _load(self, name: str, entry_point) -> Command:
+        with self._lock:
+            if name in self._commands:
+                return self._commands[name]
+            try:
+                loaded = entry_point.load()
+                if not isinstance(loaded, Command):
+                    # A bare `handler(terminal, args)` callable
+                    loaded = Command(name, loaded, summary='(plugin)')
+            except Exception as e:
+                # Report the failure instead of silently running a shell
+                # command of the same name
+                error = f"{type(e).__name__}: {e}"
+                self._plugin_errors[name] = error
+                loaded = Command(
+                    name,
+                    lambda terminal, args: f"Error: Plugin '{name}' failed to load ({error})"
+                )
+            # Register under the entry point name even if the plugin's
+            # Command uses a different one
+            self._commands[name] = loaded
+            for alias in loaded.aliases:
+                self._commands.setdefault(alias, loaded)
+            return loaded
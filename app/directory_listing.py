@@ -0,0 +1,159 @@
+import base64
+import binascii
+import heapq
+import json
+import os
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Sort keys accepted by list_directory; size and mtime sort largest/newest first
+SORT_KEYS = ('type', 'name', 'size', 'mtime', 'none')
+
+def _entry_info(entry: os.DirEntry) -> Dict:
+    """Build a structured entry from a DirEntry, reusing its cached stat data"""
+    try:
+        if entry.is_symlink():
+            kind = 'link'
+        elif entry.is_dir():
+            kind = 'dir'
+        elif entry.is_file():
+            kind = 'file'
+        else:
+            kind = 'other'
+        st = entry.stat(follow_symlinks=False)
+        size, mtime = st.st_size, st.st_mtime
+    except OSError:
+        kind, size, mtime = 'other', 0, 0.0
+    if kind == 'link':
+        try:
+            if entry.is_dir():
+                kind = 'dir'
+        except OSError:
+            pass
+    return {'name': entry.name, 'type': kind, 'size': size, 'mtime': mtime}
+
+def iter_entries(path: str, show_hidden: bool = False) -> Iterator[os.DirEntry]:
+    """Yield DirEntry objects for a directory in on-disk order"""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if not show_hidden and entry.name.startswith('.'):
+                continue
+            yield entry
+
+def _is_dir(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+def _stat(entry: os.DirEntry):
+    try:
+        return entry.stat(follow_symlinks=False)
+    except OSError:
+        return None
+
+def _sort_key(sort: str):
+    """Key function over DirEntry objects
+    
+    Name and type ordering only use the file type scandir already reports,
+    so a stat call is made just for the entries on the returned page.
+    """
+    if sort == 'name':
+        return lambda e: e.name
+    if sort == 'size':
+        return lambda e: (-getattr(_stat(e), 'st_size', 0), e.name)
+    if sort == 'mtime':
+        return lambda e: (-getattr(_stat(e), 'st_mtime', 0), e.name)
+    # 'type': directories first, then by name
+    return lambda e: (not _is_dir(e), e.name)
+
+def _encode_cursor(key) -> str:
+    """Opaque, shell-safe cursor holding the sort key of a page's last entry"""
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor: str):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, binascii.Error):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return tuple(key) if isinstance(key, list) else key
+
+def list_directory(path: str, show_hidden: bool = False, sort: str = 'type',
+                   reverse: bool = False, cursor: Optional[str] = None,
+                   limit: Optional[int] = None) -> Tuple[List[Dict], Optional[str], Optional[int]]:
+    """Return one page of directory entries
+    
+    Returns (entries, next_cursor, total). `next_cursor` is None on the last
+    page. Sorted listings resume after the sort key of the previous page's
+    last entry, so entries added or removed meanwhile do not shift pages
+    (no entry is repeated or skipped). With sort='none' entries are
+    streamed straight from scandir, so the first page of a huge directory
+    is returned without reading the rest of it (and `total` is None); its
+    cursor is a plain offset into the on-disk order.
+    """
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Invalid sort key '{sort}' (use one of: {', '.join(SORT_KEYS)})")
+    entries = iter_entries(path, show_hidden)
+    
+    if sort == 'none':
+        try:
+            offset = int(cursor) if cursor else 0
+        except ValueError:
+            raise ValueError(f"Invalid cursor '{cursor}'")
+        end = None if limit is None else offset + limit + 1
+        page = list(islice(entries, offset, end))
+        if limit is not None and len(page) > limit:
+            return [_entry_info(e) for e in page[:limit]], str(offset + limit), None
+        return [_entry_info(e) for e in page], None, None
+    
+    key = _sort_key(sort)
+    all_entries = list(entries)
+    total = len(all_entries)
+    remaining = all_entries
+    if cursor:
+        after = _decode_cursor(cursor)
+        try:
+            if reverse:
+                remaining = [e for e in all_entries if key(e) < after]
+            else:
+                remaining = [e for e in all_entries if key(e) > after]
+        except TypeError:
+            raise ValueError(f"Cursor '{cursor}' belongs to a different sort order")
+    if limit is None:
+        page = sorted(remaining, key=key, reverse=reverse)
+    elif reverse:
+        page = heapq.nlargest(limit, remaining, key=key)
+    else:
+        # Only the entries on the requested page need ordering
+        page = heapq.nsmallest(limit, remaining, key=key)
+    next_cursor = None
+    if limit is not None and len(remaining) > limit and page:
+        next_cursor = _encode_cursor(key(page[-1]))
+    return [_entry_info(e) for e in page], next_cursor, total
+
+def format_size(size: int, human: bool = False) -> str:
+    """Format a size in bytes, optionally in human readable units"""
+    if not human:
+        return str(size)
+    for unit in ['B', 'K', 'M', 'G', 'T']:
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024.0
+    return f"{size:.1f}P"
+
+def format_entries(entries: List[Dict], long: bool = False, human: bool = False) -> List[str]:
+    """Render entries in the terminal's short or long (-l) format"""
+    lines = []
+    for entry in entries:
+        if long:
+            type_char = {'dir': 'd', 'link': 'l', 'file': '-'}.get(entry['type'], '?')
+            modified = datetime.fromtimestamp(entry['mtime']).strftime('%Y-%m-%d %H:%M')
+            lines.append(f"{type_char} {format_size(entry['size'], human):>10} {modified} {entry['name']}")
+        elif entry['type'] == 'dir':
+            lines.append(f"[DIR]  {entry['name']}")
+        elif human:
+            lines.append(f"[FILE] {entry['name']} ({format_size(entry['size'], True)})")
+        else:
+            lines.append(f"[FILE] {entry['name']} ({entry['size']} bytes)")
+    return lines
@@ -0,0 +1,271 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+CREATE INDEX IF NOT EXISTS files_name ON files(name);
+"""
+
+def _prefix_bounds(path: str):
+    """Bounds (lo, hi) such that lo <= p < hi selects every path below `path`"""
+    prefix = path if path.endswith(os.sep) else path + os.sep
+    return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+def _fnmatch_to_glob(pattern: str) -> str:
+    """Translate an fnmatch pattern to SQLite GLOB syntax"""
+    return pattern.replace('[!', '[^')
+
+class FileIndex:
+    """Persistent SQLite index of paths, sizes and mtimes under configured roots
+    
+    The index is kept current by directory mtime diffing: a directory is only
+    rescanned when its own mtime changes (an entry was added, removed or
+    renamed). The background thread refreshes everything periodically and
+    callers refresh the subtree they are about to search, which costs one
+    stat per directory. In-place edits to a file do not touch its
+    directory, so its recorded size and mtime may lag until the next
+    rescan or `reindex`.
+    """
+    
+    def __init__(self, db_path: str, roots: Iterable[str], refresh_interval: float = 30.0):
+        self.db_path = db_path
+        self.roots = [os.path.normpath(os.path.abspath(os.path.expanduser(r))) for r in roots]
+        self.refresh_interval = refresh_interval
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        conn.commit()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection (sqlite3 connections are not shareable)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def start(self):
+        """Build missing roots and keep the index fresh in a background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='file-index', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop_event.set()
+    
+    def _run(self):
+        for root in self.roots:
+            if self._stop_event.is_set():
+                return
+            if not self.is_indexed(root):
+                self.reindex(root)
+        while not self._stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except sqlite3.Error:
+                pass
+    
+    def is_indexed(self, path: str) -> bool:
+        """True if `path` is a directory recorded in the index"""
+        row = self._connection().execute(
+            'SELECT 1 FROM dirs WHERE path = ?', (os.path.normpath(path),)
+        ).fetchone()
+        return row is not None
+    
+    def covers(self, path: str) -> bool:
+        """True if searches under `path` can be answered from the index"""
+        path = os.path.normpath(path)
+        under_root = any(
+            path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+            for root in self.roots
+        )
+        return under_root and self.is_indexed(path)
+    
+    def reindex(self, path: Optional[str] = None) -> int:
+        """Rebuild the index for `path` (default: every root); returns files indexed"""
+        targets = [os.path.normpath(path)] if path else self.roots
+        total = 0
+        with self._write_lock:
+            conn = self._connection()
+            for target in targets:
+                self._delete_tree(conn, target)
+                total += self._index_tree(conn, target)
+                conn.commit()
+        return total
+    
+    def refresh(self, path: Optional[str] = None) -> int:
+        """Rescan directories (under `path`, default all) whose mtime changed
+        
+        Returns the number of directories rescanned. Directories are
+        stat'ed without holding the write lock, which is only taken when
+        something changed.
+        """
+        conn = self._connection()
+        if path is None:
+            rows = conn.execute('SELECT path, mtime FROM dirs').fetchall()
+        else:
+            path = os.path.normpath(path)
+            lo, hi = _prefix_bounds(path)
+            rows = conn.execute('SELECT path, mtime FROM dirs WHERE path = ? OR (path >= ? AND path < ?)',
+                                (path, lo, hi)).fetchall()
+        changed = []
+        for directory, mtime in rows:
+            if self._stop_event.is_set():
+                break
+            try:
+                current = os.stat(directory).st_mtime
+            except OSError:
+                current = None
+            if current != mtime:
+                changed.append((directory, current))
+        if not changed:
+            return 0
+        rescanned = 0
+        with self._write_lock:
+            for directory, current in changed:
+                if current is None:
+                    self._delete_tree(conn, directory)
+                else:
+                    self._rescan_dir(conn, directory)
+                    rescanned += 1
+            conn.commit()
+        return rescanned
+    
+    def _delete_tree(self, conn, path: str):
+        lo, hi = _prefix_bounds(path)
+        conn.execute('DELETE FROM files WHERE dir = ? OR (dir >= ? AND dir < ?)', (path, lo, hi))
+        conn.execute('DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)', (path, lo, hi))
+    
+    def _scan(self, path: str):
+        """Return (directory mtime, {name: (size, mtime)}, [subdirectory paths])"""
+        files = {}
+        subdirs = []
+        dir_mtime = os.stat(path).st_mtime
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        continue
+                    if entry.is_symlink() and entry.is_dir():
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        st = entry.stat(follow_symlinks=False)
+                    files[entry.name] = (st.st_size, st.st_mtime)
+                except OSError:
+                    continue
+        return dir_mtime, files, subdirs
+    
+    def _index_tree(self, conn, root: str) -> int:
+        """Index `root` and everything below it; caller holds the write lock"""
+        count = 0
+        stack = [(root, os.path.dirname(root))]
+        while stack:
+            path, parent = stack.pop()
+            try:
+                dir_mtime, files, subdirs = self._scan(path)
+            except OSError:
+                continue
+            conn.execute('INSERT OR REPLACE INTO dirs (path, parent, mtime) VALUES (?, ?, ?)',
+                         (path, parent, dir_mtime))
+            conn.executemany(
+                'INSERT OR REPLACE INTO files (path, dir, name, size, mtime) VALUES (?, ?, ?, ?, ?)',
+                [(os.path.join(path, name), path, name, size, mtime)
+                 for name, (size, mtime) in files.items()]
+            )
+            count += len(files)
+            stack.extend((subdir, path) for subdir in subdirs)
+        return count
+    
+    def _rescan_dir(self, conn, path: str):
+        """Diff one directory against the index and apply the changes"""
+        try:
+            dir_mtime, files, subdirs = self._scan(path)
+        except OSError:
+            self._delete_tree(conn, path)
+            return
+        
+        known = {
+            name: (size, mtime)
+            for name, size, mtime in conn.execute(
+                'SELECT name, size, mtime FROM files WHERE dir = ?', (path,))
+        }
+        removed = [os.path.join(path, name) for name in known.keys() - files.keys()]
+        conn.executemany('DELETE FROM files WHERE path = ?', [(p,) for p in removed])
+        conn.executemany(
+            'INSERT OR REPLACE INTO files (path, dir, name, size, mtime) VALUES (?, ?, ?, ?, ?)',
+            [(os.path.join(path, name), path, name, size, mtime)
+             for name, (size, mtime) in files.items() if known.get(name) != (size, mtime)]
+        )
+        
+        known_dirs = {row[0] for row in conn.execute('SELECT path FROM dirs WHERE parent = ?', (path,))}
+        for gone in known_dirs - set(subdirs):
+            self._delete_tree(conn, gone)
+        for new in set(subdirs) - known_dirs:
+            self._index_tree(conn, new)
+        conn.execute('UPDATE dirs SET mtime = ? WHERE path = ?', (dir_mtime, path))
+    
+    def search(self, finder, root: str, max_results: Optional[int] = None,
+               batch_size: int = 1000) -> Iterator[List[str]]:
+        """Yield batches of indexed paths under `root` accepted by a ParallelFileFinder"""
+        root = os.path.normpath(root)
+        lo, hi = _prefix_bounds(root)
+        now = time.time()
+        cursor = self._connection().execute(
+            'SELECT path, dir, name, size, mtime FROM files '
+            'WHERE (dir = ? OR (dir >= ? AND dir < ?)) AND name GLOB ?',
+            (root, lo, hi, _fnmatch_to_glob(finder.pattern))
+        )
+        produced = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            batch = []
+            for path, directory, name, size, mtime in rows:
+                if not finder._match(name):
+                    continue
+                relative_dirs = directory[len(root):].strip(os.sep)
+                parts = relative_dirs.split(os.sep) if relative_dirs else []
+                if finder.max_depth is not None and len(parts) + 1 > finder.max_depth:
+                    continue
+                if finder.exclude and finder.exclude.intersection(parts):
+                    continue
+                if finder.needs_stat and not finder.matches_stat(size, mtime, now):
+                    continue
+                batch.append(path)
+            if max_results is not None and produced + len(batch) >= max_results:
+                yield batch[:max_results - produced]
+                return
+            produced += len(batch)
+            if batch:
+                yield batch
@@ -0,0 +1,451 @@
+import errno
+import os
+import shutil
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+# Bytes moved per copy_file_range/sendfile/read call; cancellation and
+# progress are checked between calls
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+# Errors after which a zero-copy path is abandoned for the next one
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF,
+                errno.ETXTBSY, errno.EPERM}
+# At most this many errors are listed in the summary
+MAX_REPORTED_ERRORS = 20
+
+class OperationCancelled(Exception):
+    pass
+
+def copy_file_data(src_fd: int, dst_fd: int, size: int, on_progress=None,
+                   cancelled: Optional[threading.Event] = None) -> int:
+    """Copy a file's contents between descriptors, preferring zero-copy paths
+    
+    copy_file_range keeps the data in the kernel (and reflinks on
+    filesystems that support it), sendfile is the next best, and a
+    read/write loop is the fallback. A path that reports itself
+    unsupported is abandoned and the copy continues from the same offset
+    with the next one. The loop also picks up anything past `size`, so
+    files that grew or report no size (e.g. under /proc) are copied whole.
+    Returns the number of bytes copied.
+    """
+    copied = 0
+    
+    def advance(count):
+        nonlocal copied
+        copied += count
+        if on_progress is not None:
+            on_progress(count)
+        if cancelled is not None and cancelled.is_set():
+            raise OperationCancelled()
+    
+    if size > 0 and hasattr(os, 'copy_file_range'):
+        try:
+            while copied < size:
+                count = os.copy_file_range(src_fd, dst_fd, min(COPY_CHUNK_SIZE, size - copied),
+                                           copied, copied)
+                if count == 0:
+                    break
+                advance(count)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+    if copied < size and hasattr(os, 'sendfile'):
+        try:
+            os.lseek(dst_fd, copied, os.SEEK_SET)
+            while copied < size:
+                count = os.sendfile(dst_fd, src_fd, copied, min(COPY_CHUNK_SIZE, size - copied))
+                if count == 0:
+                    break
+                advance(count)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+    os.lseek(src_fd, copied, os.SEEK_SET)
+    os.lseek(dst_fd, copied, os.SEEK_SET)
+    while True:
+        data = os.read(src_fd, COPY_CHUNK_SIZE)
+        if not data:
+            break
+        view = memoryview(data)
+        while view:
+            view = view[os.write(dst_fd, view):]
+        advance(len(data))
+    return copied
+
+def copy_metadata(src: str, dst: str, st: os.stat_result):
+    """Permissions, timestamps, extended attributes and (as root) ownership"""
+    if hasattr(os, 'geteuid') and os.geteuid() == 0:
+        try:
+            os.chown(dst, st.st_uid, st.st_gid, follow_symlinks=False)
+        except OSError:
+            pass
+    shutil.copystat(src, dst, follow_symlinks=False)
+
+class FileOperation:
+    """Recursive copy, move or remove, with per-file work on a thread pool
+    
+    `kind` is 'copy', 'move' or 'remove'. Trees are walked on the
+    iterating thread while copying data and unlinking run on `workers`
+    threads; only a few files per worker are queued at a time, so memory
+    stays flat on huge trees.
+    
+    Iterating yields a progress line (bytes and files per second) every
+    `progress_interval` seconds and finally a summary listing any errors.
+    `returncode` is then 0, 1 if anything failed, or 130 if cancelled.
+    kill() cancels from another thread (as does closing the iterator):
+    queued files are dropped and a partly copied file is deleted.
+    
+    Copies preserve permissions, timestamps, extended attributes and, as
+    root, ownership; symbolic links are copied as links. A move renames
+    when it can and otherwise copies, then removes the sources once
+    everything has arrived.
+    """
+    
+    def __init__(self, kind: str, sources: List[str], destination: Optional[str] = None,
+                 recursive: bool = False, force: bool = False, workers: int = 8,
+                 progress_interval: float = 1.0):
+        if kind not in ('copy', 'move', 'remove'):
+            raise ValueError(f"Unknown operation '{kind}'")
+        self.kind = kind
+        self.sources = sources
+        self.destination = destination
+        # mv always moves whole trees
+        self.recursive = recursive or kind == 'move'
+        self.force = force
+        self.workers = max(1, workers)
+        self.progress_interval = progress_interval
+        self.files_done = 0
+        self.files_found = 0
+        self.bytes_done = 0
+        self.bytes_found = 0
+        self.errors: List[str] = []
+        self.returncode: Optional[int] = None
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._queue_depth = self.workers * 4
+        self._slots = threading.Semaphore(self._queue_depth)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._iterator = None
+        self._walking = False
+        self._quiet = False
+        # Off while a move deletes its copied sources, which are not new files
+        self._counting = True
+        # Sources copied across filesystems by a move, removed at the end
+        self._moved: List[Tuple[str, os.stat_result]] = []
+        self._started = self._last_report = 0.0
+    
+    def kill(self):
+        """Cancel from another thread; iteration ends with a summary"""
+        self._cancelled.set()
+    
+    def close(self):
+        """Cancel if still running and wait for the workers to stop"""
+        if self._iterator is not None:
+            self._iterator.close()
+    
+    def run(self) -> str:
+        """Run to completion and return the summary (no progress lines)"""
+        self._quiet = True
+        return ''.join(self).strip()
+    
+    def __iter__(self) -> Iterator[str]:
+        if self._iterator is None:
+            self._iterator = self._run()
+        return self._iterator
+    
+    def _run(self) -> Iterator[str]:
+        self._started = self._last_report = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='file-op')
+        completed = False
+        try:
+            for source, target in self._targets():
+                if self._cancelled.is_set():
+                    break
+                yield from self._process(source, target)
+            yield from self._wait_idle()
+            if self._moved and not self._cancelled.is_set():
+                yield from self._remove_moved_sources()
+            completed = True
+        except OperationCancelled:
+            completed = True
+        except ValueError as e:
+            self._error(str(e))
+            completed = True
+        finally:
+            if not completed:
+                self._cancelled.set()
+                self.returncode = 130
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self.returncode = 130 if self._cancelled.is_set() else (1 if self.errors else 0)
+        yield self._summary()
+    
+    def _targets(self) -> List[Tuple[str, Optional[str]]]:
+        """(source, target) pairs, following cp/mv rules for directory destinations"""
+        if self.kind == 'remove':
+            return [(source, None) for source in self.sources]
+        into_directory = os.path.isdir(self.destination)
+        if len(self.sources) > 1 and not into_directory:
+            raise ValueError(f"Target '{self.destination}' is not a directory")
+        return [(source, os.path.join(self.destination, os.path.basename(source.rstrip(os.sep)))
+                 if into_directory else self.destination) for source in self.sources]
+    
+    def _process(self, source: str, target: Optional[str]) -> Iterator[str]:
+        try:
+            st = os.lstat(source)
+        except FileNotFoundError:
+            if not (self.force and self.kind == 'remove'):
+                self._error(f"'{source}' does not exist")
+            return
+        except OSError as e:
+            self._error(f"'{source}': {e.strerror}")
+            return
+        is_dir = stat.S_ISDIR(st.st_mode)
+        
+        if self.kind == 'remove':
+            if os.path.realpath(source) == os.path.realpath(os.sep):
+                self._error("Refusing to remove '/'")
+            elif is_dir and not self.recursive:
+                # rmdir semantics: empty directories only
+                try:
+                    os.rmdir(source)
+                    with self._lock:
+                        self.files_found += 1
+                        self.files_done += 1
+                except OSError as e:
+                    self._error(f"Cannot remove directory '{source}': {e.strerror} (use rm -r)")
+            elif is_dir:
+                yield from self._remove_tree(source)
+            else:
+                self._submit(0, self._unlink, source)
+            return
+        
+        if is_dir and not self.recursive:
+            self._error(f"Omitting directory '{source}' (use cp -r)")
+            return
+        if os.path.exists(source) and os.path.exists(target) and os.path.samefile(source, target):
+            self._error(f"'{source}' and '{target}' are the same file")
+            return
+        if is_dir and (os.path.realpath(target) + os.sep).startswith(os.path.realpath(source) + os.sep):
+            self._error(f"Cannot {self.kind} directory '{source}' into itself")
+            return
+        if self.kind == 'move':
+            try:
+                os.rename(source, target)
+                with self._lock:
+                    self.files_found += 1
+                    self.files_done += 1
+                return
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    self._error(f"Cannot move '{source}': {e.strerror}")
+                    return
+            # Another filesystem: copy now, remove the source at the end
+            self._moved.append((source, st))
+        if is_dir:
+            yield from self._copy_tree(source, target)
+        else:
+            self._submit(st.st_size, self._copy_entry, source, target, st)
+    
+    def _copy_tree(self, source: str, target: str) -> Iterator[str]:
+        """Create directories as they are walked and queue their files"""
+        directories = []
+        self._walking = True
+        try:
+            stack = [(source, target)]
+            while stack:
+                src_dir, dst_dir = stack.pop()
+                try:
+                    st = os.stat(src_dir)
+                    os.makedirs(dst_dir, exist_ok=True)
+                    directories.append((src_dir, dst_dir, st))
+                    with os.scandir(src_dir) as entries:
+                        for entry in entries:
+                            dst = os.path.join(dst_dir, entry.name)
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append((entry.path, dst))
+                                continue
+                            entry_st = entry.stat(follow_symlinks=False)
+                            self._submit(entry_st.st_size if stat.S_ISREG(entry_st.st_mode) else 0,
+                                         self._copy_entry, entry.path, dst, entry_st)
+                            if self._due():
+                                yield self._progress()
+                except OSError as e:
+                    self._error(f"'{src_dir}': {e.strerror}")
+        finally:
+            self._walking = False
+        # Adding files changed the directories' mtimes: restore them once
+        # the files are in, deepest first
+        yield from self._wait_idle()
+        for src_dir, dst_dir, st in reversed(directories):
+            try:
+                copy_metadata(src_dir, dst_dir, st)
+            except OSError as e:
+                self._error(f"'{dst_dir}': {e.strerror}")
+    
+    def _remove_tree(self, root: str) -> Iterator[str]:
+        """Unlink files on the pool, then remove the directories deepest first"""
+        directories = []
+        self._walking = True
+        try:
+            stack = [root]
+            while stack:
+                directory = stack.pop()
+                directories.append(directory)
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                                continue
+                            self._submit(0, self._unlink, entry.path)
+                            if self._due():
+                                yield self._progress()
+                except OSError as e:
+                    self._error(f"'{directory}': {e.strerror}")
+        finally:
+            self._walking = False
+        yield from self._wait_idle()
+        for directory in reversed(directories):
+            if self._cancelled.is_set():
+                raise OperationCancelled()
+            try:
+                os.rmdir(directory)
+            except OSError as e:
+                self._error(f"Cannot remove '{directory}': {e.strerror}")
+    
+    def _remove_moved_sources(self) -> Iterator[str]:
+        if self.errors:
+            self._error("Sources kept because the copy was incomplete")
+            return
+        self._counting = False
+        for source, st in self._moved:
+            if stat.S_ISDIR(st.st_mode):
+                yield from self._remove_tree(source)
+            else:
+                try:
+                    os.unlink(source)
+                except OSError as e:
+                    self._error(f"Cannot remove '{source}': {e.strerror}")
+    
+    def _submit(self, size: int, func, *args):
+        """Queue per-file work, waiting while the queue is full"""
+        if self._counting:
+            with self._lock:
+                self.files_found += 1
+                self.bytes_found += size
+        while not self._slots.acquire(timeout=0.5):
+            if self._cancelled.is_set():
+                raise OperationCancelled()
+        if self._cancelled.is_set():
+            self._slots.release()
+            raise OperationCancelled()
+        future = self._executor.submit(self._work, func, *args)
+        future.add_done_callback(lambda f: self._slots.release())
+    
+    def _wait_idle(self) -> Iterator[str]:
+        """Wait for every queued file, reporting progress meanwhile"""
+        for _ in range(self._queue_depth):
+            while not self._slots.acquire(timeout=self.progress_interval):
+                yield self._progress()
+        for _ in range(self._queue_depth):
+            self._slots.release()
+        if self._cancelled.is_set():
+            raise OperationCancelled()
+    
+    def _work(self, func, *args):
+        if self._cancelled.is_set():
+            return
+        try:
+            func(*args)
+            if self._counting:
+                with self._lock:
+                    self.files_done += 1
+        except OperationCancelled:
+            pass
+        except OSError as e:
+            self._error(f"'{e.filename or args[0]}': {e.strerror}")
+        except Exception as e:
+            self._error(f"'{args[0]}': {e}")
+    
+    def _copy_entry(self, src: str, dst: str, st: os.stat_result):
+        if stat.S_ISLNK(st.st_mode):
+            if os.path.lexists(dst):
+                os.unlink(dst)
+            os.symlink(os.readlink(src), dst)
+            copy_metadata(src, dst, st)
+            return
+        if not stat.S_ISREG(st.st_mode):
+            raise OSError(errno.EINVAL, 'Not a regular file, directory or symbolic link', src)
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                copy_file_data(fsrc.fileno(), fdst.fileno(), st.st_size,
+                               on_progress=self._add_bytes, cancelled=self._cancelled)
+        except OperationCancelled:
+            # Do not leave a truncated copy behind
+            try:
+                os.unlink(dst)
+            except OSError:
+                pass
+            raise
+        copy_metadata(src, dst, st)
+    
+    @staticmethod
+    def _unlink(path: str):
+        os.unlink(path)
+    
+    def _add_bytes(self, count: int):
+        with self._lock:
+            self.bytes_done += count
+    
+    def _error(self, message: str):
+        with self._lock:
+            self.errors.append(message)
+    
+    def _due(self) -> bool:
+        return time.monotonic() - self._last_report >= self.progress_interval
+    
+    def _progress(self) -> str:
+        now = self._last_report = time.monotonic()
+        if self._quiet:
+            return ''
+        elapsed = max(now - self._started, 1e-6)
+        verb = {'copy': 'Copying', 'move': 'Moving', 'remove': 'Removing'}[self.kind]
+        # '+' while the walk is still finding files
+        line = f"{verb}: {self.files_done}/{self.files_found}{'+' if self._walking else ''} files"
+        if self.kind != 'remove':
+            line += f", {_format_bytes(self.bytes_done)}/{_format_bytes(self.bytes_found)}" \
+                    f" ({_format_bytes(self.bytes_done / elapsed)}/s, "
+        else:
+            line += " ("
+        return line + f"{self.files_done / elapsed:.0f} files/s)\n"
+    
+    def _summary(self) -> str:
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        lines = []
+        if self.files_done or not self.errors:
+            verb = {'copy': 'Copied', 'move': 'Moved', 'remove': 'Removed'}[self.kind]
+            line = f"{verb} {self.files_done} file{'' if self.files_done == 1 else 's'}"
+            if self.kind != 'remove':
+                line += f" ({_format_bytes(self.bytes_done)})"
+            if self.destination is not None:
+                line += f" to '{self.destination}'"
+            line += f" in {elapsed:.1f}s"
+            if self.bytes_done:
+                line += f" ({_format_bytes(self.bytes_done / elapsed)}/s)"
+            lines.append(line)
+        if self.returncode == 130:
+            lines.append("Error: Cancelled")
+        lines.extend(f"Error: {message}" for message in self.errors[:MAX_REPORTED_ERRORS])
+        if len(self.errors) > MAX_REPORTED_ERRORS:
+            lines.append(f"Error: ...and {len(self.errors) - MAX_REPORTED_ERRORS} more")
+        return '\n'.join(lines)
+
+def _format_bytes(value: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == 'B' else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
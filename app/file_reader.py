@@ -0,0 +1,173 @@
+import os
+import time
+from typing import Dict, Iterator, Optional
+
+# Largest slice of a file returned by a single read
+DEFAULT_MAX_BYTES = 1024 * 1024
+# Block size used when scanning backwards for tail
+TAIL_BLOCK_SIZE = 64 * 1024
+
+def _decode(data: bytes, at_eof: bool):
+    """Decode a slice, holding back an incomplete trailing UTF-8 sequence
+    
+    Returns (text, bytes_consumed). Raises UnicodeDecodeError for data that
+    is not UTF-8 text.
+    """
+    if b'\0' in data:
+        raise UnicodeDecodeError('utf-8', data, data.index(b'\0'), data.index(b'\0') + 1,
+                                 'binary data')
+    if not at_eof:
+        # Back up over continuation bytes to the start of the last character
+        # and drop it if its sequence is incomplete
+        for i in range(len(data) - 1, max(len(data) - 4, -1), -1):
+            lead = data[i]
+            if lead & 0xC0 != 0x80:
+                expected = 1 if lead < 0xC0 else 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4
+                if len(data) - i < expected:
+                    data = data[:i]
+                break
+    return data.decode('utf-8'), len(data)
+
+def read_range(path: str, offset: int = 0, max_bytes: int = DEFAULT_MAX_BYTES) -> Dict:
+    """Read up to `max_bytes` starting at byte `offset`
+    
+    The returned `next_offset` is the cursor to pass back to continue
+    reading; `eof` is True once the end of the file was reached. When the
+    slice is cut short it ends on a line boundary where possible.
+    """
+    # A few bytes are needed to always make progress past a multibyte character
+    max_bytes = max(max_bytes, 4)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = min(max(offset, 0), size)
+        f.seek(offset)
+        data = f.read(max_bytes)
+    at_eof = offset + len(data) >= size
+    if not at_eof:
+        newline = data.rfind(b'\n')
+        if newline >= 0:
+            data = data[:newline + 1]
+    text, consumed = _decode(data, at_eof)
+    next_offset = offset + consumed
+    return {
+        'text': text,
+        'offset': offset,
+        'next_offset': next_offset,
+        'size': size,
+        'eof': next_offset >= size,
+    }
+
+def read_lines(path: str, start_line: int = 1, count: Optional[int] = None,
+               max_bytes: int = DEFAULT_MAX_BYTES) -> Dict:
+    """Read `count` lines starting at 1-based `start_line`, capped at `max_bytes`"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        line = 1
+        while line < start_line:
+            if not f.readline():
+                break
+            line += 1
+        offset = f.tell()
+        chunks = []
+        total = 0
+        lines_read = 0
+        while count is None or lines_read < count:
+            data = f.readline(max_bytes - total + 1)
+            if not data:
+                break
+            if total + len(data) > max_bytes:
+                if not chunks:
+                    chunks.append(data[:max_bytes])
+                    total = max_bytes
+                break
+            chunks.append(data)
+            total += len(data)
+            lines_read += 1
+    data = b''.join(chunks)
+    text, consumed = _decode(data, offset + len(data) >= size)
+    next_offset = offset + consumed
+    return {
+        'text': text,
+        'offset': offset,
+        'next_offset': next_offset,
+        'size': size,
+        'eof': next_offset >= size,
+        'next_line': start_line + lines_read,
+    }
+
+def tail_lines(path: str, count: int = 10, max_bytes: int = DEFAULT_MAX_BYTES) -> Dict:
+    """Read the last `count` lines by scanning backwards from the end"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        position = size
+        newlines = 0
+        data = b''
+        # A trailing newline terminates the last line rather than starting one
+        wanted = count + 1 if size and _last_byte(f, size) == b'\n' else count
+        while position > 0 and newlines < wanted and len(data) < max_bytes:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step)
+            newlines += block.count(b'\n')
+            data = block + data
+    if newlines >= wanted:
+        # Drop everything up to the newline that precedes the first wanted line
+        cut = len(data)
+        for _ in range(wanted):
+            cut = data.rfind(b'\n', 0, cut)
+        data = data[cut + 1:]
+    if len(data) > max_bytes:
+        data = data[-max_bytes:]
+        # Skip the tail of a character cut off by the cap
+        start = 0
+        while start < min(len(data), 3) and data[start] & 0xC0 == 0x80:
+            start += 1
+        data = data[start:]
+    offset = size - len(data)
+    text, _ = _decode(data, True)
+    return {
+        'text': text,
+        'offset': offset,
+        'next_offset': size,
+        'size': size,
+        'eof': True,
+    }
+
+def _last_byte(f, size: int) -> bytes:
+    f.seek(size - 1)
+    return f.read(1)
+
+def follow(path: str, offset: int, poll_interval: float = 0.5,
+           keepalive: float = 15.0, max_bytes: int = DEFAULT_MAX_BYTES) -> Iterator[str]:
+    """Yield data appended to a file from `offset` onwards (like tail -f)
+    
+    Yields an empty string after `keepalive` seconds without new data so
+    that streaming callers can notice disconnected clients. A file that
+    shrinks (truncated or rotated in place) is followed from its start.
+    """
+    idle_since = time.monotonic()
+    pending = b''
+    while True:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = offset
+        if size < offset:
+            offset = 0
+            pending = b''
+        if size > offset:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = pending + f.read(min(size - offset, max_bytes))
+            offset += len(data) - len(pending)
+            text, consumed = _decode(data, False)
+            pending = data[consumed:]
+            if text:
+                idle_since = time.monotonic()
+                yield text
+                continue
+        if time.monotonic() - idle_since >= keepalive:
+            idle_since = time.monotonic()
+            yield ''
+        time.sleep(poll_interval)
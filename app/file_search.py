@@ -0,0 +1,179 @@
+import fnmatch
+import os
+import queue
+import re
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional
+
+# Suffixes accepted by parse_size / parse_age
+SIZE_UNITS = {'': 1, 'b': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+AGE_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+def parse_size(value: str) -> int:
+    """Parse a size such as '512', '10k' or '2M' into bytes"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([bkmgt]?)b?', value.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid size '{value}'")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+def parse_age(value: str) -> float:
+    """Parse an age such as '90', '10m', '2h' or '7d' into seconds"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([smhdw]?)', value.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid age '{value}'")
+    return float(match.group(1)) * AGE_UNITS[match.group(2)]
+
+class ParallelFileFinder:
+    """Find files by name pattern, walking directories on a thread pool
+    
+    Directories are scanned with os.scandir by a pool of worker threads and
+    matches are handed back through a bounded queue as they are found, so
+    results can be consumed (and the walk abandoned) before the whole tree
+    has been visited.
+    """
+    
+    def __init__(self, pattern: str = '*', max_depth: Optional[int] = None,
+                 exclude: Iterable[str] = (), min_size: Optional[int] = None,
+                 max_size: Optional[int] = None, newer_than: Optional[float] = None,
+                 older_than: Optional[float] = None, workers: int = 8):
+        self.pattern = pattern
+        self._match = re.compile(fnmatch.translate(pattern)).match
+        self.max_depth = max_depth
+        self.exclude = set(exclude)
+        self.min_size = min_size
+        self.max_size = max_size
+        # Ages are in seconds relative to the start of the search
+        self.newer_than = newer_than
+        self.older_than = older_than
+        self.workers = max(1, workers)
+    
+    @property
+    def needs_stat(self) -> bool:
+        return any(v is not None for v in (self.min_size, self.max_size,
+                                           self.newer_than, self.older_than))
+    
+    def matches_stat(self, size: int, mtime: float, now: float) -> bool:
+        """Apply the size and modification-time filters"""
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        if self.newer_than is not None and now - mtime > self.newer_than:
+            return False
+        if self.older_than is not None and now - mtime < self.older_than:
+            return False
+        return True
+    
+    def find(self, root: str, max_results: Optional[int] = None) -> Iterator[str]:
+        """Yield matching file paths under `root`"""
+        for batch in self.iter_batches(root, max_results=max_results):
+            yield from batch
+    
+    def iter_batches(self, root: str, max_results: Optional[int] = None) -> Iterator[List[str]]:
+        """Yield lists of matching paths, each holding whatever was ready
+        
+        Closing the generator (or reaching `max_results`) stops the walk.
+        """
+        now = time.time()
+        directories: "queue.Queue" = queue.Queue()
+        results: "queue.Queue" = queue.Queue(maxsize=256)
+        stop = threading.Event()
+        done = object()
+        outstanding = [1]
+        outstanding_lock = threading.Lock()
+        directories.put((root, 0))
+        
+        def put_result(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+        
+        def worker():
+            while not stop.is_set():
+                try:
+                    path, depth = directories.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                try:
+                    self._scan(path, depth, now, directories, outstanding,
+                               outstanding_lock, put_result, stop)
+                finally:
+                    with outstanding_lock:
+                        outstanding[0] -= 1
+                        finished = outstanding[0] == 0
+                    if finished:
+                        put_result(done)
+        
+        threads = [
+            threading.Thread(target=worker, name=f'find-worker-{i}', daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        
+        produced = 0
+        try:
+            while True:
+                items = [results.get()]
+                # Drain whatever else is already available without blocking
+                while len(items) < 64:
+                    try:
+                        items.append(results.get_nowait())
+                    except queue.Empty:
+                        break
+                finished = any(item is done for item in items)
+                batch = [path for item in items if item is not done for path in item]
+                if max_results is not None and produced + len(batch) >= max_results:
+                    yield batch[:max_results - produced]
+                    return
+                produced += len(batch)
+                if batch:
+                    yield batch
+                if finished:
+                    return
+        finally:
+            stop.set()
+    
+    def _scan(self, path, depth, now, directories, outstanding, outstanding_lock,
+              put_result, stop):
+        """Scan one directory: queue subdirectories and emit its matching files"""
+        subdirs = []
+        matches = []
+        descend = self.max_depth is None or depth + 1 < self.max_depth
+        files_in_range = self.max_depth is None or depth + 1 <= self.max_depth
+        needs_stat = self.needs_stat
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if descend and entry.name not in self.exclude:
+                                subdirs.append(entry.path)
+                            continue
+                        if not files_in_range or not self._match(entry.name):
+                            continue
+                        if entry.is_symlink() and entry.is_dir():
+                            # Symlinks to directories are neither walked nor reported
+                            continue
+                        if needs_stat:
+                            st = entry.stat()
+                            if not self.matches_stat(st.st_size, st.st_mtime, now):
+                                continue
+                        matches.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            # Unreadable directories are skipped, as os.walk does
+            pass
+        
+        if subdirs and not stop.is_set():
+            with outstanding_lock:
+                outstanding[0] += len(subdirs)
+            for subdir in subdirs:
+                directories.put((subdir, depth + 1))
+        if matches:
+            put_result(matches)
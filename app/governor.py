@@ -0,0 +1,257 @@
+import asyncio
+import os
+import shlex
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+class GovernorBusy(Exception):
+    """Raised when a command cannot get an execution slot (maps to HTTP 429)"""
+    
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _Waiter:
+    __slots__ = ('session_id', 'event', 'wake', 'granted')
+    
+    def __init__(self, session_id, wake: Optional[Callable[[], None]] = None):
+        self.session_id = session_id
+        # Thread waiters block on the event; coroutines pass their own wake-up
+        self.event = threading.Event() if wake is None else None
+        self.wake = wake or self.event.set
+        self.granted = False
+
+class Slot:
+    """A granted execution slot; release() is idempotent"""
+    
+    def __init__(self, governor: 'ExecutionGovernor', session_id):
+        self.governor = governor
+        self.session_id = session_id
+        self._released = False
+    
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.governor._release(self.session_id)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+class ExecutionGovernor:
+    """Admission control and resource limits for spawned commands
+    
+    At most `max_concurrent` commands run at once, and at most
+    `per_session` of them for any one session. Requests beyond that wait
+    in a FIFO queue. The queue holds at most `max_queue` requests, and
+    `per_session` per session so one client cannot fill it. A full queue
+    is rejected at once, and a request that waits longer than
+    `queue_timeout` gives up; both raise GovernorBusy. When a slot frees,
+    it goes to the oldest waiter whose session is under its own limit, so
+    a busy session never blocks the others.
+    
+    Spawned processes get RLIMIT_CPU, RLIMIT_AS and a nice increment from
+    a small shell wrapper (`wrap_argv`, POSIX only). Buffered commands time out after
+    `default_timeout` seconds and streamed ones, which hold their slot
+    while a client reads, after `stream_timeout`; `timeouts` overrides
+    both per program.
+    """
+    
+    def __init__(self, max_concurrent: int = 8, per_session: int = 2, max_queue: int = 32,
+                 queue_timeout: float = 5.0, cpu_seconds: Optional[int] = None,
+                 memory_bytes: Optional[int] = None, nice: int = 0,
+                 default_timeout: float = 30.0, timeouts: Optional[Dict[str, float]] = None,
+                 stream_timeout: float = 600.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.per_session = max(1, per_session)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.nice = nice
+        self.default_timeout = default_timeout
+        self.stream_timeout = stream_timeout
+        # Program name -> timeout in seconds (e.g. {'make': 600})
+        self.timeouts = dict(timeouts or {})
+        self._lock = threading.Lock()
+        self._running = 0
+        self._running_by_session: Dict = {}
+        self._queued_by_session: Dict = {}
+        self._queue: deque = deque()
+        self.rejected = 0
+        self.timed_out = 0
+        self.admitted = 0
+    
+    @classmethod
+    def from_env(cls, environ=os.environ) -> 'ExecutionGovernor':
+        """Build from TERMINAL_EXEC_*, TERMINAL_COMMAND_TIMEOUT(S) and TERMINAL_STREAM_TIMEOUT"""
+        def optional_int(name):
+            value = environ.get(name)
+            return int(value) if value else None
+        
+        timeouts = {}
+        for item in environ.get('TERMINAL_COMMAND_TIMEOUTS', '').split(','):
+            name, _, seconds = item.partition('=')
+            if name.strip() and seconds.strip():
+                timeouts[name.strip()] = float(seconds)
+        return cls(
+            max_concurrent=int(environ.get('TERMINAL_EXEC_MAX_CONCURRENT', str(max(2, (os.cpu_count() or 1) * 2)))),
+            per_session=int(environ.get('TERMINAL_EXEC_PER_SESSION', '2')),
+            max_queue=int(environ.get('TERMINAL_EXEC_QUEUE_DEPTH', '32')),
+            queue_timeout=float(environ.get('TERMINAL_EXEC_QUEUE_TIMEOUT', '5')),
+            cpu_seconds=optional_int('TERMINAL_EXEC_CPU_SECONDS'),
+            memory_bytes=optional_int('TERMINAL_EXEC_MEMORY_BYTES'),
+            nice=int(environ.get('TERMINAL_EXEC_NICE', '0')),
+            default_timeout=float(environ.get('TERMINAL_COMMAND_TIMEOUT', '30')),
+            timeouts=timeouts,
+            stream_timeout=float(environ.get('TERMINAL_STREAM_TIMEOUT', '600'))
+        )
+    
+    def acquire(self, session_id=None, timeout: Optional[float] = None) -> Slot:
+        """Wait for an execution slot; raises GovernorBusy if none comes"""
+        waiter = self._enter(session_id, _Waiter(session_id))
+        if waiter is None:
+            return Slot(self, session_id)
+        waiter.event.wait(self.queue_timeout if timeout is None else timeout)
+        return self._admitted(waiter)
+    
+    async def acquire_async(self, session_id=None, timeout: Optional[float] = None) -> Slot:
+        """acquire() for coroutines: queues without holding a thread"""
+        loop = asyncio.get_running_loop()
+        woken = asyncio.Event()
+        waiter = self._enter(session_id, _Waiter(session_id, lambda: loop.call_soon_threadsafe(woken.set)))
+        if waiter is None:
+            return Slot(self, session_id)
+        try:
+            await asyncio.wait_for(woken.wait(), self.queue_timeout if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        return self._admitted(waiter)
+    
+    def _enter(self, session_id, waiter: _Waiter) -> Optional[_Waiter]:
+        """Grant a slot at once (None), queue `waiter`, or raise GovernorBusy"""
+        with self._lock:
+            if self._can_run(session_id) and self._next_eligible() is None:
+                self._grant(session_id)
+                return None
+            if len(self._queue) >= self.max_queue \
+                    or self._queued_by_session.get(session_id, 0) >= self.per_session:
+                self.rejected += 1
+                raise GovernorBusy(f"Server busy: {self._running} commands running, "
+                                   f"{len(self._queue)} queued", retry_after=1.0)
+            self._queue.append(waiter)
+            self._queued_by_session[session_id] = self._queued_by_session.get(session_id, 0) + 1
+            return waiter
+    
+    def _admitted(self, waiter: _Waiter) -> Slot:
+        """The slot a woken (or timed out) waiter was granted"""
+        with self._lock:
+            if not waiter.granted:
+                self._queue.remove(waiter)
+                self._dequeued(waiter.session_id)
+                self.timed_out += 1
+                raise GovernorBusy("Server busy: timed out waiting for an execution slot",
+                                   retry_after=2.0)
+        return Slot(self, waiter.session_id)
+    
+    def _abandon(self, waiter: _Waiter):
+        """Withdraw a waiter whose caller went away, handing on a granted slot"""
+        with self._lock:
+            if not waiter.granted:
+                self._queue.remove(waiter)
+                self._dequeued(waiter.session_id)
+                return
+        self._release(waiter.session_id)
+    
+    def _can_run(self, session_id) -> bool:
+        return self._running < self.max_concurrent \
+            and self._running_by_session.get(session_id, 0) < self.per_session
+    
+    def _next_eligible(self) -> Optional[_Waiter]:
+        for waiter in self._queue:
+            if self._running_by_session.get(waiter.session_id, 0) < self.per_session:
+                return waiter
+        return None
+    
+    def _grant(self, session_id):
+        self._running += 1
+        self._running_by_session[session_id] = self._running_by_session.get(session_id, 0) + 1
+        self.admitted += 1
+    
+    def _dequeued(self, session_id):
+        remaining = self._queued_by_session[session_id] - 1
+        if remaining:
+            self._queued_by_session[session_id] = remaining
+        else:
+            del self._queued_by_session[session_id]
+    
+    def _release(self, session_id):
+        with self._lock:
+            self._running -= 1
+            remaining = self._running_by_session[session_id] - 1
+            if remaining:
+                self._running_by_session[session_id] = remaining
+            else:
+                del self._running_by_session[session_id]
+            # Hand freed capacity straight to waiters, oldest eligible first
+            while self._running < self.max_concurrent:
+                waiter = self._next_eligible()
+                if waiter is None:
+                    break
+                self._queue.remove(waiter)
+                self._dequeued(waiter.session_id)
+                self._grant(waiter.session_id)
+                waiter.granted = True
+                waiter.wake()
+    
+    def timeout_for(self, command: str, streaming: bool = False) -> float:
+        """Timeout for a command line, looked up by its program name"""
+        if self.timeouts:
+            try:
+                words = shlex.split(command)
+            except ValueError:
+                words = command.split()
+            if words:
+                program = os.path.basename(words[0])
+                if program in self.timeouts:
+                    return self.timeouts[program]
+        return self.stream_timeout if streaming else self.default_timeout
+    
+    def wrap_argv(self, argv: List[str]) -> List[str]:
+        """`argv` run through a shell that applies the resource limits, then execs it
+        
+        Limits are set by the child itself rather than a preexec_fn, which
+        can deadlock a fork made while other threads hold locks. The
+        command does not start if a limit cannot be applied.
+        """
+        if os.name != 'posix' or not (self.cpu_seconds or self.memory_bytes or self.nice):
+            return argv
+        steps = []
+        if self.cpu_seconds:
+            # SIGXCPU at the soft limit, SIGKILL one second later
+            steps.append(f'ulimit -S -t {int(self.cpu_seconds)}')
+            steps.append(f'ulimit -H -t {int(self.cpu_seconds) + 1}')
+        if self.memory_bytes:
+            steps.append(f'ulimit -v {max(1, int(self.memory_bytes) // 1024)}')
+        steps.append(f'exec nice -n {int(self.nice)} "$@"' if self.nice else 'exec "$@"')
+        return ['/bin/sh', '-c', ' && '.join(steps), 'sh', *argv]
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'running': self._running,
+                'queued': len(self._queue),
+                'max_concurrent': self.max_concurrent,
+                'per_session': self.per_session,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'queue_timeouts': self.timed_out,
+            }
@@ -0,0 +1,180 @@
+import glob
+import mmap
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+from .file_search import ParallelFileFinder
+
+# Files larger than this are searched through mmap instead of being read
+MMAP_THRESHOLD = 1024 * 1024
+# Leading bytes inspected for NUL bytes when deciding a file is binary
+BINARY_SNIFF_BYTES = 8192
+# Buffers are searched in line-aligned blocks of roughly this size
+BLOCK_SIZE = 8 * 1024 * 1024
+
+class GrepEngine:
+    """Search files for a fixed string or regular expression
+    
+    Each file is searched as a single byte buffer (mmap for large files)
+    rather than decoded line by line; only matching lines are decoded.
+    Files are searched concurrently on a thread pool and results are
+    yielded per file as soon as that file is done.
+    """
+    
+    def __init__(self, pattern: str, regex: bool = False, ignore_case: bool = True,
+                 max_count: Optional[int] = None, include: Optional[str] = None,
+                 exclude_dirs: Iterable[str] = (), workers: int = 8):
+        self.pattern = pattern
+        self.regex = regex
+        self.ignore_case = ignore_case
+        self.max_count = max_count
+        self.include = include
+        self.exclude_dirs = set(exclude_dirs)
+        self.workers = max(1, workers)
+        self.errors: List[str] = []
+        
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        source = pattern if regex else re.escape(pattern)
+        if ignore_case and not pattern.isascii():
+            # Bytes patterns only fold ASCII case; search decoded text instead
+            self._text_regex = re.compile(source, flags)
+            self._bytes_regex = None
+        else:
+            self._text_regex = None
+            self._bytes_regex = re.compile(source.encode('utf-8'), flags)
+        # Fixed strings use bytes.find; ignoring case, the block is lowercased
+        # first (bytes.lower is a fast ASCII-only fold, which is all we need
+        # since non-ASCII patterns take the text path above)
+        self._literal = pattern.encode('utf-8') if not regex and not ignore_case else None
+        self._folded_literal = (pattern.lower().encode('utf-8')
+                                if not regex and ignore_case and pattern.isascii() else None)
+    
+    def expand_paths(self, paths: Iterable[str], recursive: bool = False) -> Iterator[str]:
+        """Expand globs and (with `recursive`) directories into file paths"""
+        for path in paths:
+            candidates = sorted(glob.glob(path)) if glob.has_magic(path) else [path]
+            if not candidates:
+                self.errors.append(f"Error: No files match '{path}'")
+            for candidate in candidates:
+                if os.path.isdir(candidate):
+                    if not recursive:
+                        self.errors.append(f"Error: '{candidate}' is a directory (use -r)")
+                        continue
+                    finder = ParallelFileFinder(self.include or '*', exclude=self.exclude_dirs)
+                    yield from finder.find(candidate)
+                elif not os.path.exists(candidate):
+                    self.errors.append(f"Error: File '{candidate}' not found")
+                else:
+                    yield candidate
+    
+    def search(self, files: Iterable[str]) -> Iterator[Tuple[str, List[Tuple[int, str]]]]:
+        """Yield (path, [(line_number, line), ...]) for each file with matches"""
+        with ThreadPoolExecutor(max_workers=self.workers,
+                                thread_name_prefix='grep-worker') as executor:
+            pending = deque()
+            # Keep a bounded number of files in flight so huge trees are
+            # enumerated lazily rather than all at once
+            max_in_flight = self.workers * 4
+            for path in files:
+                pending.append(executor.submit(self._search_file_safe, path))
+                while len(pending) >= max_in_flight:
+                    result = pending.popleft().result()
+                    if result[1]:
+                        yield result
+            while pending:
+                result = pending.popleft().result()
+                if result[1]:
+                    yield result
+    
+    def _search_file_safe(self, path: str):
+        try:
+            return path, self.search_file(path)
+        except PermissionError:
+            self.errors.append(f"Error: Permission denied: '{path}'")
+        except OSError as e:
+            self.errors.append(f"Error: {path}: {e.strerror or e}")
+        return path, []
+    
+    def search_file(self, path: str) -> List[Tuple[int, str]]:
+        """Return up to max_count (line_number, line) matches in one file"""
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return []
+            if b'\0' in f.read(BINARY_SNIFF_BYTES):
+                return []
+            f.seek(0)
+            if size > MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return self._search_buffer(data)
+            return self._search_buffer(f.read())
+    
+    def _search_buffer(self, data) -> List[Tuple[int, str]]:
+        if self._text_regex is not None:
+            return self._search_text(bytes(data).decode('utf-8', errors='replace'))
+        
+        # Search in line-aligned blocks so case folding (and mmap slicing)
+        # only ever holds one block in memory
+        matches = []
+        line_number = 1
+        start = 0
+        end = len(data)
+        while start < end:
+            stop = min(start + BLOCK_SIZE, end)
+            if stop < end:
+                newline = data.find(b'\n', stop)
+                stop = end if newline < 0 else newline + 1
+            block = data[start:stop]
+            line_number = self._search_block(block, line_number, matches)
+            if self.max_count is not None and len(matches) >= self.max_count:
+                break
+            start = stop
+        return matches
+    
+    def _search_block(self, block: bytes, line_number: int, matches: list) -> int:
+        """Append matches found in `block`; returns the line number after it"""
+        haystack = block.lower() if self._folded_literal is not None else block
+        literal = self._folded_literal if self._folded_literal is not None else self._literal
+        first_line = line_number
+        counted_to = 0
+        pos = 0
+        end = len(block)
+        while pos < end:
+            if literal is not None:
+                start = haystack.find(literal, pos)
+                if start < 0:
+                    break
+            else:
+                match = self._bytes_regex.search(haystack, pos)
+                if match is None:
+                    break
+                start = match.start()
+            line_start = block.rfind(b'\n', 0, start) + 1
+            line_end = block.find(b'\n', start)
+            if line_end < 0:
+                line_end = end
+            if literal is None and match.end() > line_end:
+                # `\s`, `[^x]` and the like matched across the newline: like
+                # grep, only a match within this one line counts
+                if self._bytes_regex.search(haystack, line_start, line_end) is None:
+                    pos = line_end + 1
+                    continue
+            line_number += block.count(b'\n', counted_to, line_start)
+            counted_to = line_start
+            matches.append((line_number, block[line_start:line_end].decode('utf-8', errors='replace')))
+            if self.max_count is not None and len(matches) >= self.max_count:
+                break
+            # At most one match per line: resume after this line
+            pos = line_end + 1
+        return first_line + block.count(b'\n')
+    
+    def _search_text(self, text: str) -> List[Tuple[int, str]]:
+        matches = []
+        for line_number, line in enumerate(text.splitlines(), 1):
+            if self._text_regex.search(line):
+                matches.append((line_number, line))
+                if self.max_count is not None and len(matches) >= self.max_count:
+                    break
+        return matches
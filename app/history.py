@@ -0,0 +1,206 @@
+import bisect
+import heapq
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Prefix searches matching more distinct commands than this walk the
+# entries newest-first instead of ranking every indexed match
+INDEX_SCAN_LIMIT = 2000
+
+def format_entry(entry: Dict) -> Dict:
+    """API representation of a history entry"""
+    return {
+        'id': entry.get('id'),
+        'command': entry['command'],
+        'timestamp': datetime.fromtimestamp(entry['timestamp']).isoformat(),
+        'session': entry.get('session'),
+        'exit_status': entry.get('exit_status'),
+        'duration': entry.get('duration'),
+    }
+
+class CommandHistory:
+    """Global command history shared by every session
+    
+    The newest `max_entries` commands are kept in a deque. Each finished
+    command is also appended as one JSON line to `log_path`, so history
+    survives restarts; once the log holds `compact_factor` times more lines
+    than are kept in memory it is rewritten from the deque. Distinct
+    commands are kept in a sorted list so prefix searches are a bisect
+    rather than a scan.
+    """
+    
+    def __init__(self, log_path: Optional[str] = None, max_entries: int = 100000,
+                 compact_factor: int = 2):
+        self.log_path = log_path
+        self.max_entries = max_entries
+        self.compact_factor = max(2, compact_factor)
+        self._entries: deque = deque(maxlen=max_entries)
+        # Prefix index: sorted distinct commands, the newest entry for each,
+        # and how many retained entries use it (so eviction can unindex it)
+        self._sorted: List[str] = []
+        self._latest: Dict[str, Dict] = {}
+        self._counts: Dict[str, int] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._log = None
+        self._log_lines = 0
+        
+        if log_path:
+            directory = os.path.dirname(log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._load()
+            self._log = open(log_path, 'a', encoding='utf-8')
+            if self._log_lines > self.max_entries:
+                self.compact()
+    
+    def _load(self):
+        """Replay the on-disk log, keeping the newest `max_entries` entries"""
+        if not os.path.exists(self.log_path):
+            return
+        # Only the lines that will be retained are parsed
+        tail: deque = deque(maxlen=self.max_entries)
+        with open(self.log_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                self._log_lines += 1
+                tail.append(line)
+        for line in tail:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn write from a crash
+            if not isinstance(entry, dict) or 'command' not in entry or 'timestamp' not in entry:
+                continue
+            self._entries.append(entry)
+        # Build the index once rather than maintaining it per replayed line
+        for entry in self._entries:
+            command = entry['command']
+            self._counts[command] = self._counts.get(command, 0) + 1
+            self._latest[command] = entry
+        self._sorted = sorted(self._counts)
+        if self._entries:
+            self._next_id = (self._entries[-1].get('id') or len(self._entries)) + 1
+    
+    def _add(self, entry: Dict):
+        """Append to the deque and index, unindexing whatever falls off"""
+        if len(self._entries) == self._entries.maxlen:
+            evicted = self._entries[0]['command']
+            self._counts[evicted] -= 1
+            if not self._counts[evicted]:
+                del self._counts[evicted]
+                del self._latest[evicted]
+                del self._sorted[bisect.bisect_left(self._sorted, evicted)]
+        self._entries.append(entry)
+        command = entry['command']
+        if command not in self._counts:
+            self._counts[command] = 0
+            bisect.insort(self._sorted, command)
+        self._counts[command] += 1
+        self._latest[command] = entry
+    
+    def record(self, entry: Dict) -> Dict:
+        """Store a finished entry (command, timestamp, session, exit_status, duration)"""
+        with self._lock:
+            entry['id'] = self._next_id
+            self._next_id += 1
+            self._add(entry)
+            if self._log is not None:
+                self._log.write(json.dumps(entry) + '\n')
+                self._log.flush()
+                self._log_lines += 1
+                if self._log_lines >= self.compact_factor * self.max_entries:
+                    self._compact_locked()
+        return entry
+    
+    def compact(self):
+        """Rewrite the log so it only holds the retained entries"""
+        with self._lock:
+            self._compact_locked()
+    
+    def _compact_locked(self):
+        if not self.log_path:
+            return
+        temp_path = f"{self.log_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for entry in self._entries:
+                f.write(json.dumps(entry) + '\n')
+        if self._log is not None:
+            self._log.close()
+        os.replace(temp_path, self.log_path)
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+        self._log_lines = len(self._entries)
+    
+    def recent(self, session_id: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """The newest `limit` entries (oldest first), optionally for one session"""
+        with self._lock:
+            if session_id is None:
+                start = max(0, len(self._entries) - limit)
+                return [self._entries[i] for i in range(start, len(self._entries))]
+            found = []
+            for entry in reversed(self._entries):
+                if entry.get('session') == session_id:
+                    found.append(entry)
+                    if len(found) >= limit:
+                        break
+            return found[::-1]
+    
+    def search(self, prefix: str = '', q: str = '', session_id: Optional[str] = None,
+               limit: int = 50) -> List[Dict]:
+        """Newest-first distinct commands starting with `prefix` and containing `q`
+        
+        A global prefix search with few matching commands is answered from
+        the sorted index. Otherwise the entries are walked back from the
+        newest, which stops as soon as `limit` distinct commands are found
+        (quick exactly when matches are plentiful).
+        """
+        with self._lock:
+            if prefix and session_id is None:
+                lo = bisect.bisect_left(self._sorted, prefix)
+                hi = bisect.bisect_left(self._sorted, prefix + '\U0010ffff', lo)
+                if hi - lo <= INDEX_SCAN_LIMIT:
+                    candidates = [self._latest[self._sorted[i]] for i in range(lo, hi)
+                                  if not q or q in self._sorted[i]]
+                    return heapq.nlargest(limit, candidates, key=lambda entry: entry['id'])
+            
+            found = []
+            if session_id is None:
+                # The first occurrence seen walking backwards is the newest
+                latest = self._latest
+                for entry in reversed(self._entries):
+                    command = entry['command']
+                    if q in command and command.startswith(prefix) and latest[command] is entry:
+                        found.append(entry)
+                        if len(found) >= limit:
+                            break
+                return found
+            
+            seen = set()
+            for entry in reversed(self._entries):
+                command = entry['command']
+                if q in command and command.startswith(prefix) \
+                        and entry.get('session') == session_id and command not in seen:
+                    seen.add(command)
+                    found.append(entry)
+                    if len(found) >= limit:
+                        break
+            return found
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'distinct_commands': len(self._sorted),
+                'max_entries': self.max_entries,
+                'log_path': self.log_path,
+                'log_lines': self._log_lines,
+            }
+    
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
@@ -0,0 +1,339 @@
+import bisect
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; spans a cached built-in (~50us) to a timed-out subprocess (30s)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROFILE_MODES = ('cprofile', 'stack')
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+class Counter:
+    """Monotonic counter with labels, rendered in Prometheus text format"""
+    
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+    
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {value:g}')
+        return lines
+
+class Histogram:
+    """Fixed-bucket latency histogram with labels
+    
+    An observation is one bisect and one list increment under a lock;
+    buckets are stored per bucket and only made cumulative when rendered.
+    """
+    
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+    
+    def snapshot(self) -> Dict[Tuple, Dict]:
+        """count/sum per label set (for JSON stats)"""
+        with self._lock:
+            return {labels: {'count': series[2], 'sum': series[1]}
+                    for labels, series in self._series.items()}
+    
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, ([*counts], total, count))
+                            for labels, (counts, total, count) in self._series.items())
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="' + le + '"')
+                lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {total:.6f}')
+            lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+class _NullTimer:
+    """Shared no-op context manager returned while instrumentation is off"""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class _StageTimer:
+    __slots__ = ('instrumentation', 'name', 'started')
+    
+    def __init__(self, instrumentation: 'Instrumentation', name: str):
+        self.instrumentation = instrumentation
+        self.name = name
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        self.instrumentation.stage_seconds.observe(elapsed, self.name)
+        trace = getattr(self.instrumentation._local, 'trace', None)
+        if trace is not None:
+            trace.append((self.name, elapsed))
+        return False
+
+class Instrumentation:
+    """Stage timers, command and request histograms, and gauges
+    
+    `stage(name)` times a block into `terminal_stage_seconds{stage=...}`
+    and, inside a request started with `begin_request()`, into that
+    request's trace (sent back as a Server-Timing header). With
+    `enabled=False` every hook returns a shared no-op, so the cost is an
+    attribute check.
+    """
+    
+    def __init__(self, enabled: bool = True, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.stage_seconds = Histogram(
+            'terminal_stage_seconds', 'Time spent in each processing stage', ('stage',), buckets)
+        self.command_seconds = Histogram(
+            'terminal_command_seconds', 'Command execution time by command name and outcome',
+            ('command', 'status'), buckets)
+        self.request_seconds = Histogram(
+            'terminal_http_request_seconds', 'HTTP request time to first byte by endpoint',
+            ('endpoint', 'method', 'code'), buckets)
+        self.errors = Counter('terminal_errors_total', 'Errors by stage', ('stage',))
+        self._gauges: List[Tuple[str, str, Callable[[], float]]] = []
+        self._local = threading.local()
+    
+    def stage(self, name: str):
+        """Context manager timing one stage"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, name)
+    
+    def observe_command(self, command: str, seconds: float, ok: bool):
+        if self.enabled:
+            self.command_seconds.observe(seconds, command, 'ok' if ok else 'error')
+    
+    def count_error(self, stage: str):
+        if self.enabled:
+            self.errors.inc(stage)
+    
+    def begin_request(self):
+        """Start collecting this thread's stage timings"""
+        if self.enabled:
+            self._local.trace = []
+    
+    def end_request(self, endpoint: str, method: str, code: int, seconds: float) -> List[Tuple[str, float]]:
+        """Record the request and return its stage trace"""
+        trace = getattr(self._local, 'trace', None)
+        self._local.trace = None
+        if self.enabled:
+            self.request_seconds.observe(seconds, endpoint or 'unknown', method, str(code))
+        return trace or []
+    
+    def add_gauge(self, name: str, help_text: str, read: Callable[[], float]):
+        """Expose `read()` as a gauge, evaluated at scrape time"""
+        self._gauges.append((name, help_text, read))
+    
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        for metric in (self.request_seconds, self.command_seconds, self.stage_seconds, self.errors):
+            lines.extend(metric.render())
+        for name, help_text, read in self._gauges:
+            try:
+                value = float(read())
+            except Exception:
+                continue
+            lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} gauge', f'{name} {value:g}'])
+        return '\n'.join(lines) + '\n'
+
+def server_timing(trace: List[Tuple[str, float]]) -> str:
+    """Format a stage trace as a Server-Timing header value (durations in ms)"""
+    totals: Dict[str, float] = {}
+    for name, seconds in trace:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ', '.join(f'{name.replace(".", "-")};dur={seconds * 1000:.3f}' for name, seconds in totals.items())
+
+class Profiler:
+    """Opt-in profiler for the next N requests
+    
+    `arm(n, mode)` profiles the next `n` requests, either with cProfile
+    (deterministic, higher overhead) or by sampling the request threads'
+    stacks every `interval` seconds (collapsed stacks, flamegraph-ready).
+    When the last one finishes the combined result is written to
+    `output_dir`. While disarmed the only cost is reading `remaining`.
+    """
+    
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+        self.remaining = 0
+        self.mode = 'cprofile'
+        self.interval = 0.005
+        self.last_dump: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self._active: Dict[int, Optional[cProfile.Profile]] = {}
+        self._stats: Optional[pstats.Stats] = None
+        self._stacks: _Tally = _Tally()
+        self._requests = 0
+        self._sampler: Optional[threading.Thread] = None
+    
+    def arm(self, requests: int, mode: str = 'cprofile', interval: float = 0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Invalid profile mode '{mode}' (use one of: {', '.join(PROFILE_MODES)})")
+        with self._lock:
+            if self.remaining or self._active:
+                raise ValueError("A profile is already being captured")
+            self.mode = mode
+            self.interval = max(0.001, interval)
+            self._stats = None
+            self._stacks = _Tally()
+            self._requests = 0
+            self.remaining = max(1, int(requests))
+    
+    def start_request(self) -> bool:
+        """Profile the calling request if armed; returns whether it is profiled"""
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            thread_id = threading.get_ident()
+            if self.mode == 'cprofile':
+                profile = cProfile.Profile()
+                self._active[thread_id] = profile
+            else:
+                self._active[thread_id] = None
+                if self._sampler is None or not self._sampler.is_alive():
+                    self._sampler = threading.Thread(target=self._sample, name='profiler-sampler',
+                                                     daemon=True)
+                    self._sampler.start()
+        if self.mode == 'cprofile':
+            profile.enable()
+        return True
+    
+    def stop_request(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            profile = self._active.get(thread_id)
+        if profile is not None:
+            profile.disable()
+        with self._lock:
+            self._active.pop(thread_id, None)
+            self._requests += 1
+            if profile is not None:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+            if not self.remaining and not self._active:
+                self._dump_locked()
+    
+    def _sample(self):
+        """Collect collapsed stacks of the profiled threads until none are left"""
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                threads = [t for t in self._active if t != own]
+                if not threads and not self.remaining:
+                    return
+            frames = sys._current_frames()
+            for thread_id in threads:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                if stack:
+                    key = ';'.join(reversed(stack))
+                    with self._lock:
+                        self._stacks[key] += 1
+            time.sleep(self.interval)
+    
+    def _dump_locked(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        if self.mode == 'cprofile':
+            if self._stats is None:
+                return
+            path = os.path.join(self.output_dir, f'profile-{stamp}.prof')
+            self._stats.dump_stats(path)
+            summary = io.StringIO()
+            self._stats.stream = summary
+            self._stats.sort_stats('cumulative').print_stats(30)
+            text = summary.getvalue()
+        else:
+            path = os.path.join(self.output_dir, f'profile-{stamp}.folded')
+            with open(path, 'w') as f:
+                for stack, count in self._stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+            text = '\n'.join(f'{count:>6} {stack.rsplit(";", 1)[-1]}'
+                             for stack, count in self._leaf_counts().most_common(30))
+        self.last_dump = {'path': path, 'mode': self.mode, 'requests': self._requests,
+                          'created_at': time.time(), 'summary': text}
+    
+    def _leaf_counts(self) -> _Tally:
+        leaves = _Tally()
+        for stack, count in self._stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return leaves
+    
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                'armed': self.remaining > 0 or bool(self._active),
+                'mode': self.mode,
+                'remaining': self.remaining,
+                'in_flight': len(self._active),
+                'last_dump': self.last_dump,
+            }
+
+# Shared by the terminal, the system monitor and the HTTP layer
+instrumentation = Instrumentation(enabled=os.environ.get('TERMINAL_METRICS', '1') != '0')
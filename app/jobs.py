@@ -0,0 +1,205 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at its depth limit"""
+
+class Job:
+    """A command running in the background on the job pool"""
+    
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    
+    def __init__(self, command: str, session_id: Optional[str] = None,
+                 max_output_bytes: int = 8 * 1024 * 1024):
+        self.id = uuid.uuid4().hex[:12]
+        self.command = command
+        self.session_id = session_id
+        self.status = Job.QUEUED
+        self.returncode: Optional[int] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.max_output_bytes = max_output_bytes
+        
+        # Output is kept as a sliding window: once it grows past the cap the
+        # oldest text is dropped and `_output_start` records how much was lost
+        self._output = ''
+        self._output_start = 0
+        self._condition = threading.Condition()
+        self._stream = None
+        self._cancel_requested = False
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in (Job.COMPLETED, Job.FAILED, Job.CANCELLED)
+    
+    def append_output(self, text: str):
+        """Append output text and wake any streaming readers"""
+        with self._condition:
+            self._output += text
+            overflow = len(self._output) - self.max_output_bytes
+            if overflow > 0:
+                self._output = self._output[overflow:]
+                self._output_start += overflow
+            self._condition.notify_all()
+    
+    def read_output(self, offset: int = 0) -> Tuple[str, int]:
+        """Return output from `offset` onwards and the offset to resume from"""
+        with self._condition:
+            return self._read_locked(offset)
+    
+    def _read_locked(self, offset: int) -> Tuple[str, int]:
+        start = max(offset - self._output_start, 0)
+        return self._output[start:], self._output_start + len(self._output)
+    
+    def iter_output(self, offset: int = 0, keepalive: float = 15.0) -> Iterator[Optional[str]]:
+        """Yield new output as it arrives until the job finishes
+        
+        Yields None when no output arrived within `keepalive` seconds so
+        callers can emit a heartbeat.
+        """
+        while True:
+            with self._condition:
+                text, next_offset = self._read_locked(offset)
+                if not text and not self.finished:
+                    self._condition.wait(keepalive)
+                    text, next_offset = self._read_locked(offset)
+                finished = self.finished
+            if text:
+                offset = next_offset
+                yield text
+            elif finished:
+                return
+            else:
+                yield None
+    
+    def _set_status(self, status: str):
+        with self._condition:
+            self.status = status
+            if self.finished:
+                self.finished_at = time.time()
+            self._condition.notify_all()
+    
+    def to_dict(self) -> Dict:
+        """Serializable summary of the job"""
+        return {
+            'id': self.id,
+            'command': self.command,
+            'status': self.status,
+            'returncode': self.returncode,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'output_bytes': self._output_start + len(self._output),
+        }
+
+class JobManager:
+    """Run commands on a bounded worker pool and track them by job id"""
+    
+    def __init__(self, max_workers: int = 4, max_queue: int = 64,
+                 max_output_bytes: int = 8 * 1024 * 1024, max_finished: int = 200):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_output_bytes = max_output_bytes
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='terminal-job')
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def submit(self, terminal, command: str, session_id: Optional[str] = None,
+               timeout: Optional[float] = None) -> Job:
+        """Queue a command for background execution and return its job"""
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job.status == Job.QUEUED)
+            if queued >= self.max_queue:
+                raise JobQueueFull(f"Job queue is full ({self.max_queue} jobs waiting)")
+            job = Job(command, session_id=session_id, max_output_bytes=self.max_output_bytes)
+            self._jobs[job.id] = job
+            self._prune_locked()
+        self._executor.submit(self._run, job, terminal, timeout)
+        return job
+    
+    def _run(self, job: Job, terminal, timeout: Optional[float]):
+        """Worker body: execute the command and record its output and status"""
+        with job._condition:
+            if job._cancel_requested:
+                job.status = Job.CANCELLED
+                job.finished_at = time.time()
+                job._condition.notify_all()
+                return
+            job.status = Job.RUNNING
+            job.started_at = time.time()
+        try:
+            # The pool is the jobs' concurrency budget, so they do not queue
+            # for (or hold) the session's interactive execution slots
+            stream = terminal.stream_command(command=job.command, max_output_bytes=None,
+                                             timeout=timeout, background=True)
+            job._stream = stream
+            if job._cancel_requested:
+                self._kill(job)
+            for chunk in stream:
+                job.append_output(chunk)
+            job.returncode = getattr(stream, 'returncode', 0)
+            if job._cancel_requested:
+                job._set_status(Job.CANCELLED)
+            else:
+                job._set_status(Job.COMPLETED if job.returncode == 0 else Job.FAILED)
+        except Exception as e:
+            job.error = str(e)
+            job._set_status(Job.FAILED)
+        finally:
+            job._stream = None
+    
+    def _kill(self, job: Job):
+        kill = getattr(job._stream, 'kill', None)
+        if kill is not None:
+            kill()
+    
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with job._condition:
+            if job.finished:
+                return job
+            job._cancel_requested = True
+        self._kill(job)
+        return job
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def list(self, session_id: Optional[str] = None, include_finished: bool = True) -> List[Job]:
+        """Jobs in submission order, optionally restricted to one session"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [
+            job for job in jobs
+            if (session_id is None or job.session_id == session_id)
+            and (include_finished or not job.finished)
+        ]
+    
+    def _prune_locked(self):
+        """Forget the oldest finished jobs beyond the retention limit"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job_id]
+    
+    def shutdown(self):
+        """Cancel outstanding jobs and stop the worker pool"""
+        for job in self.list(include_finished=False):
+            self.cancel(job.id)
+        self._executor.shutdown(wait=False)
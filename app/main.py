@@ -1,8 +1,25 @@
+import hashlib
 import os
-from flask import Flask, render_template, request, jsonify
-from .terminal import PythonTerminal
+import time
+from flask import Flask, Response, abort, g, make_response, render_template, request, jsonify, session, stream_with_context
+from itsdangerous import BadSignature
+from werkzeug.http import parse_cookie
+from .async_server import AsyncServer
+from .file_index import FileIndex
+from .governor import ExecutionGovernor, GovernorBusy
+from .history import CommandHistory
+from .instrumentation import Profiler, instrumentation, server_timing
+from . import file_reader
+from .directory_listing import list_directory
+from .jobs import JobManager, JobQueueFull
+from .metrics_history import MetricsHistory
+from .pty_sessions import PtyManager
+from .session_manager import SessionManager
 from .ai_processor import AIProcessor
+from .ai_backends import BatchingTranslator, TranslationCache, load_backend
 from .system_monitor import SystemMonitor
+from .websocket_server import WebSocketServer
+from .streaming import SSE_HEADERS, sse_comment, sse_event
 
 # Get the correct paths
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,23 +31,232 @@ static_dir = os.path.join(parent_dir, 'static')
 app = Flask(__name__, 
            template_folder=template_dir,
            static_folder=static_dir)
-app.secret_key = os.urandom(24)
+
+def load_secret_key(path: str) -> bytes:
+    """Read the session signing key, creating it on first run
+    
+    A key that survives restarts keeps browser sessions (and WebSocket
+    cookie checks) valid across a graceful restart.
+    """
+    if os.environ.get('TERMINAL_SECRET_KEY'):
+        return os.environ['TERMINAL_SECRET_KEY'].encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            key = f.read()
+        if len(key) >= 24:
+            return key
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    key = os.urandom(32)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        # Another process won the race; use its key
+        with open(path, 'rb') as f:
+            return f.read()
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+app.secret_key = load_secret_key(os.environ.get(
+    'TERMINAL_SECRET_KEY_PATH',
+    os.path.join(os.path.expanduser('~'), '.python_terminal', 'secret_key')))
 
 # Initialize core components
-terminal = PythonTerminal()
-ai_processor = AIProcessor()
-system_monitor = SystemMonitor()
+system_monitor = SystemMonitor(
+    sample_interval=float(os.environ.get('TERMINAL_SAMPLE_INTERVAL', '1.0')),
+    max_staleness=float(os.environ.get('TERMINAL_SAMPLE_MAX_STALENESS', '5.0'))
+)
+# Optional persistent file index: TERMINAL_INDEX_ROOTS is an os.pathsep
+# separated list of directories to keep indexed for find
+index_roots = [r for r in os.environ.get('TERMINAL_INDEX_ROOTS', '').split(os.pathsep) if r]
+file_index = None
+if index_roots:
+    file_index = FileIndex(
+        os.environ.get('TERMINAL_INDEX_PATH',
+                       os.path.join(os.path.expanduser('~'), '.python_terminal', 'file_index.sqlite3')),
+        index_roots,
+        refresh_interval=float(os.environ.get('TERMINAL_INDEX_REFRESH', '30'))
+    )
+    file_index.start()
+# Held by the serving process so a second one fails fast (see server.py)
+instance_lock_path = os.environ.get(
+    'TERMINAL_LOCK_PATH', os.path.join(os.path.expanduser('~'), '.python_terminal', 'server.lock'))
+# Global command history, appended to TERMINAL_HISTORY_PATH as JSON lines
+command_history = CommandHistory(
+    os.environ.get('TERMINAL_HISTORY_PATH',
+                   os.path.join(os.path.expanduser('~'), '.python_terminal', 'history.jsonl')),
+    max_entries=int(os.environ.get('TERMINAL_HISTORY_SIZE', '100000'))
+)
+# Searching other sessions' commands (which may carry secrets) is opt-in
+history_global_search = os.environ.get('TERMINAL_HISTORY_GLOBAL_SEARCH') == '1'
+# Admission control and resource limits for spawned commands, shared by
+# every session (TERMINAL_EXEC_*, TERMINAL_COMMAND_TIMEOUT(S))
+governor = ExecutionGovernor.from_env()
+session_manager = SessionManager(
+    system_monitor=system_monitor,
+    file_index=file_index,
+    history=command_history,
+    governor=governor,
+    max_sessions=int(os.environ.get('TERMINAL_MAX_SESSIONS', '256')),
+    idle_timeout=float(os.environ.get('TERMINAL_SESSION_IDLE_TIMEOUT', '1800'))
+)
+# Optional local model behind the regex intents: TERMINAL_AI_BACKEND is a
+# local HTTP URL or a module:factory returning a TranslationBackend
+translator = None
+if os.environ.get('TERMINAL_AI_BACKEND'):
+    translator = BatchingTranslator(
+        load_backend(os.environ['TERMINAL_AI_BACKEND']),
+        cache=TranslationCache(os.environ.get(
+            'TERMINAL_AI_CACHE_PATH',
+            os.path.join(os.path.expanduser('~'), '.python_terminal', 'translations.sqlite3')))
+    )
+ai_processor = AIProcessor(
+    translator=translator,
+    latency_budget=float(os.environ.get('TERMINAL_AI_LATENCY_BUDGET', '0.5'))
+)
+job_manager = JobManager(
+    max_workers=int(os.environ.get('TERMINAL_JOB_WORKERS', '4')),
+    max_queue=int(os.environ.get('TERMINAL_JOB_QUEUE_DEPTH', '64'))
+)
+metrics_history = MetricsHistory()
+# Interactive shells (one per terminal session), hung up on eviction
+pty_manager = PtyManager(
+    max_sessions=int(os.environ.get('TERMINAL_PTY_MAX_SESSIONS', '64')),
+    shell=os.environ.get('TERMINAL_PTY_SHELL') or None
+)
+session_manager.eviction_callbacks.append(pty_manager.on_session_evicted)
+system_monitor.add_listener(metrics_history.record)
+system_monitor.start()
+
+# Opt-in: POST /debug/profile arms a cProfile/stack-sample capture of the
+# next N requests; the endpoints 404 unless TERMINAL_PROFILING=1
+profiling_enabled = os.environ.get('TERMINAL_PROFILING') == '1'
+profiler = Profiler(os.environ.get(
+    'TERMINAL_PROFILE_DIR', os.path.join(os.path.expanduser('~'), '.python_terminal', 'profiles')))
+instrumentation.add_gauge('terminal_sessions', 'Live terminal sessions',
+                          lambda: len(session_manager))
+instrumentation.add_gauge('terminal_jobs_running', 'Background jobs queued or running',
+                          lambda: len(job_manager.list(include_finished=False)))
+instrumentation.add_gauge('terminal_pty_sessions', 'Interactive shells', lambda: pty_manager.stats()['sessions'])
+instrumentation.add_gauge('terminal_exec_running', 'Spawned commands holding an execution slot',
+                          lambda: governor.stats()['running'])
+instrumentation.add_gauge('terminal_exec_queued', 'Commands waiting for an execution slot',
+                          lambda: governor.stats()['queued'])
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    instrumentation.begin_request()
+    g.profiled = bool(profiler.remaining) and request.endpoint not in ('get_metrics', 'profile_control') \
+        and profiler.start_request()
+
+@app.after_request
+def record_request(response):
+    """Time the request (to the first byte for streamed responses)"""
+    if getattr(g, 'profiled', False):
+        profiler.stop_request()
+    started = g.pop('request_started', None)
+    if started is not None:
+        trace = instrumentation.end_request(request.endpoint, request.method, response.status_code,
+                                            time.perf_counter() - started)
+        if trace:
+            response.headers['Server-Timing'] = server_timing(trace)
+    return response
+
+def get_session_id():
+    """Return the terminal session id stored in the client's cookie"""
+    session_id = session.get('terminal_session')
+    if not session_id:
+        session_id = session_manager.new_session_id()
+        session['terminal_session'] = session_id
+    return session_id
+
+def current_terminal():
+    """Return the terminal bound to the current browser session"""
+    return session_manager.get_terminal(get_session_id())
+
+def resolve_websocket_session(cookie_header: str):
+    """Map a WebSocket upgrade's Cookie header to a terminal session id
+    
+    The Flask session cookie is verified with the app's signing key, so a
+    socket joins the same terminal as the page that opened it. Requests
+    without a valid cookie get a fresh session.
+    """
+    cookies = parse_cookie(cookie_header or '')
+    value = cookies.get(app.config['SESSION_COOKIE_NAME'])
+    if value:
+        serializer = app.session_interface.get_signing_serializer(app)
+        try:
+            data = serializer.loads(value, max_age=int(app.permanent_session_lifetime.total_seconds()))
+        except BadSignature:
+            data = {}
+        if data.get('terminal_session'):
+            return data['terminal_session']
+    return session_manager.new_session_id()
+
+# Persistent command/output channel, served on its own port (see run.py)
+websocket_server = None
+if os.environ.get('TERMINAL_WS_ENABLED', '1') != '0':
+    websocket_server = WebSocketServer(
+        (os.environ.get('TERMINAL_WS_HOST', '0.0.0.0'), int(os.environ.get('TERMINAL_WS_PORT', '5001'))),
+        session_manager,
+        resolve_websocket_session,
+        job_manager=job_manager,
+        system_monitor=system_monitor,
+        pty_manager=pty_manager,
+        compression=os.environ.get('TERMINAL_WS_COMPRESSION', '1') != '0',
+        allowed_origins=[o for o in os.environ.get('TERMINAL_WS_ALLOWED_ORIGINS', '').split(',') if o],
+        bind_and_activate=False
+    )
+
+# Opt-in asyncio endpoint for the execution API, on its own port: idle and
+# streaming connections cost a coroutine rather than a server thread
+async_server = None
+if os.environ.get('TERMINAL_ASYNC_ENABLED') == '1':
+    async_server = AsyncServer(
+        (os.environ.get('TERMINAL_ASYNC_HOST', '0.0.0.0'), int(os.environ.get('TERMINAL_ASYNC_PORT', '5002'))),
+        session_manager,
+        resolve_websocket_session,
+        system_monitor=system_monitor,
+        workers=int(os.environ.get('TERMINAL_ASYNC_WORKERS', '4')),
+        keepalive_timeout=float(os.environ.get('TERMINAL_ASYNC_KEEPALIVE', '75')),
+        max_streams=int(os.environ.get('TERMINAL_ASYNC_MAX_STREAMS', '16')),
+        allowed_origins=[o for o in os.environ.get('TERMINAL_WS_ALLOWED_ORIGINS', '').split(',') if o]
+    )
+    instrumentation.add_gauge('terminal_async_connections', 'Open connections to the asyncio endpoint',
+                              lambda: async_server.connections)
+
+_index_cache = None
 
 @app.route('/')
 def index():
     """Render the main terminal interface"""
-    # Debug information (remove in production)
-    print(f"Template folder: {template_dir}")
-    print(f"Template folder exists: {os.path.exists(template_dir)}")
-    if os.path.exists(template_dir):
-        print(f"Files in templates: {os.listdir(template_dir)}")
-    
-    return render_template('index.html')
+    global _index_cache
+    # The page has no per-request content, so it is rendered once per
+    # template version and revalidated by ETag
+    version = os.stat(os.path.join(template_dir, 'index.html')).st_mtime_ns
+    if _index_cache is None or _index_cache[0] != version:
+        body = render_template('index.html')
+        _index_cache = (version, body, hashlib.sha1(body.encode('utf-8')).hexdigest())
+    _, body, etag = _index_cache
+    response = make_response(body)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def busy_response(error):
+    """429 for a command the execution governor turned away"""
+    instrumentation.count_error('busy')
+    response = jsonify({
+        'success': False,
+        'output': f'Error: {error}',
+        'type': 'busy'
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, round(error.retry_after)))
+    return response
 
 @app.route('/execute', methods=['POST'])
 def execute_command():
@@ -38,6 +264,7 @@ def execute_command():
     try:
         data = request.get_json()
         command = data.get('command', '').strip()
+        terminal = current_terminal()
         
         if not command:
             return jsonify({
@@ -47,42 +274,187 @@ def execute_command():
             })
         
         # Check if it's an AI query (starts with natural language indicators)
-        ai_indicators = ['create', 'make', 'show me', 'list all', 'find', 'search', 'what is']
-        is_ai_query = any(command.lower().startswith(indicator) for indicator in ai_indicators)
+        with instrumentation.stage('classify'):
+            ai_indicators = ['create', 'make', 'show me', 'list all', 'find', 'search', 'what is']
+            is_ai_query = any(command.lower().startswith(indicator) for indicator in ai_indicators)
         
         if is_ai_query:
             # Process with AI
-            result = ai_processor.process_query(command)
+            with instrumentation.stage('ai.process_query'):
+                result = ai_processor.process_query(command, cwd=terminal.current_directory)
             if result['requires_execution']:
                 # Execute the generated command
-                output = terminal.execute_command(result['command'])
-                return jsonify({
+                with instrumentation.stage('execute'):
+                    output = terminal.execute_command(result['command'])
+                payload = {
                     'success': True,
                     'output': f"AI: {result['explanation']}\nExecuting: {result['command']}\n\n{output}",
                     'type': 'ai_command'
-                })
+                }
             else:
-                return jsonify({
+                payload = {
                     'success': True,
                     'output': result['explanation'],
                     'type': 'ai_response'
-                })
+                }
         else:
             # Direct command execution
-            output = terminal.execute_command(command)
-            return jsonify({
+            with instrumentation.stage('execute'):
+                output = terminal.execute_command(command)
+            payload = {
                 'success': True,
                 'output': output,
                 'type': 'command'
-            })
+            }
+        with instrumentation.stage('serialize'):
+            return jsonify(payload)
     
+    except GovernorBusy as e:
+        return busy_response(e)
     except Exception as e:
+        instrumentation.count_error('http')
         return jsonify({
             'success': False,
             'output': f'Error: {str(e)}',
             'type': 'error'
         })
 
+@app.route('/execute/stream', methods=['GET', 'POST'])
+def execute_command_stream():
+    """Execute a command and stream its output as Server-Sent Events
+    
+    Accepts the command as JSON (POST) or as the `command` query parameter
+    (GET, for EventSource clients). Emits `output` events with text chunks
+    and a final `exit` event carrying the return code.
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        command = data.get('command', '').strip()
+    else:
+        command = request.args.get('command', '').strip()
+    
+    if not command:
+        return jsonify({
+            'success': False,
+            'output': 'Error: Empty command',
+            'type': 'error'
+        })
+    
+    try:
+        stream = current_terminal().stream_command(command)
+    except GovernorBusy as e:
+        return busy_response(e)
+    
+    def generate():
+        try:
+            for chunk in stream:
+                if chunk:
+                    yield sse_event({'output': chunk}, event='output')
+                else:
+                    yield sse_comment()
+            yield sse_event({'returncode': getattr(stream, 'returncode', 0)}, event='exit')
+        finally:
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                close()
+    
+    return Response(stream_with_context(generate()),
+                    mimetype='text/event-stream',
+                    headers=SSE_HEADERS)
+
+@app.route('/file')
+def read_file_page():
+    """Read one page of a file
+    
+    Query parameters: path (relative to the session's directory), offset
+    (byte cursor from a previous response's next_offset), max_bytes, and
+    tail=N to read the last N lines instead.
+    """
+    path = request.args.get('path', '').strip()
+    if not path:
+        return jsonify({
+            'success': False,
+            'error': 'Path required'
+        }), 400
+    
+    try:
+        file_path = current_terminal()._resolve_path(path)
+        max_bytes = min(request.args.get('max_bytes', file_reader.DEFAULT_MAX_BYTES, type=int),
+                        file_reader.DEFAULT_MAX_BYTES)
+        if 'tail' in request.args:
+            page = file_reader.tail_lines(file_path, request.args.get('tail', 10, type=int),
+                                          max_bytes=max_bytes)
+        else:
+            page = file_reader.read_range(file_path, request.args.get('offset', 0, type=int),
+                                          max_bytes=max_bytes)
+        return jsonify({
+            'success': True,
+            'path': file_path,
+            **page
+        })
+    except FileNotFoundError:
+        return jsonify({
+            'success': False,
+            'error': f"File '{path}' not found"
+        }), 404
+    except IsADirectoryError:
+        return jsonify({
+            'success': False,
+            'error': f"'{path}' is a directory"
+        }), 400
+    except PermissionError:
+        return jsonify({
+            'success': False,
+            'error': f"Permission denied: '{path}'"
+        }), 403
+    except UnicodeDecodeError:
+        return jsonify({
+            'success': False,
+            'error': 'Cannot read binary file'
+        }), 415
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/directory')
+def list_directory_page():
+    """List one page of a directory as structured entries
+    
+    Query parameters: path, sort (type|name|size|mtime|none), reverse,
+    all (include hidden entries), limit, cursor (from next_cursor).
+    """
+    try:
+        terminal = current_terminal()
+        path = request.args.get('path', '').strip()
+        path = terminal._resolve_path(path) if path else terminal.current_directory
+        entries, next_cursor, total = list_directory(
+            path,
+            show_hidden=request.args.get('all') in ('1', 'true'),
+            sort=request.args.get('sort', 'type'),
+            reverse=request.args.get('reverse') in ('1', 'true'),
+            cursor=request.args.get('cursor'),
+            limit=min(request.args.get('limit', 500, type=int), 5000)
+        )
+        return jsonify({
+            'success': True,
+            'path': path,
+            'entries': entries,
+            'next_cursor': next_cursor,
+            'total': total
+        })
+    except FileNotFoundError:
+        return jsonify({
+            'success': False,
+            'error': f"Path '{request.args.get('path', '')}' does not exist"
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
 @app.route('/system_info')
 def get_system_info():
     """Get current system information"""
@@ -98,11 +470,115 @@ def get_system_info():
             'error': str(e)
         })
 
+@app.route('/system_info/stream')
+def stream_system_info():
+    """Stream metric deltas from the shared sampler as Server-Sent Events
+    
+    Query parameters:
+      fields   - comma separated snapshot fields to include (default: all)
+      interval - minimum seconds between messages (default: sampler cadence)
+    """
+    fields = [f for f in request.args.get('fields', '').split(',') if f.strip()]
+    try:
+        interval = float(request.args.get('interval', 0)) or None
+    except ValueError:
+        interval = None
+    
+    subscription = system_monitor.subscribe(
+        fields=[f.strip() for f in fields] or None,
+        interval=interval
+    )
+    
+    def generate():
+        try:
+            while not subscription.closed:
+                delta = subscription.next_delta(timeout=15.0)
+                if delta is None:
+                    yield sse_comment()
+                else:
+                    yield sse_event(delta, event='metrics')
+        finally:
+            system_monitor.unsubscribe(subscription)
+    
+    return Response(stream_with_context(generate()),
+                    mimetype='text/event-stream',
+                    headers=SSE_HEADERS)
+
+@app.route('/metrics/history')
+def get_metrics_history():
+    """Get downsampled metric history for a time window
+    
+    Query parameters: metrics (comma separated, default: all tracked),
+    window (seconds, default 600), resolution (seconds; default picks the
+    finest resolution that covers the window).
+    """
+    try:
+        metrics = [m.strip() for m in request.args.get('metrics', '').split(',') if m.strip()]
+        data = metrics_history.query(
+            metrics or metrics_history.metrics,
+            window=request.args.get('window', 600, type=float),
+            resolution=request.args.get('resolution', type=int)
+        )
+        return jsonify({
+            'success': True,
+            'data': data
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
+@app.route('/processes')
+def get_processes():
+    """Query the shared process snapshot
+    
+    Query parameters: sort (cpu|memory|rss|pid|name|user), name (substring),
+    user, min_cpu, limit (top-k).
+    """
+    try:
+        processes = system_monitor.process_table.query(
+            sort=request.args.get('sort', 'cpu'),
+            name=request.args.get('name'),
+            user=request.args.get('user'),
+            min_cpu=request.args.get('min_cpu', type=float),
+            limit=request.args.get('limit', type=int)
+        )
+        return jsonify({
+            'success': True,
+            'processes': processes
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        })
+
 @app.route('/history')
 def get_command_history():
-    """Get command execution history"""
+    """Get command execution history
+    
+    Without parameters this is the session's recent history (oldest first).
+    With `prefix` and/or `q` it is a newest-first search over distinct
+    commands; `scope=global` searches every session (only when
+    TERMINAL_HISTORY_GLOBAL_SEARCH=1) and `limit` caps the number of
+    results (default 50).
+    """
     try:
-        history = terminal.get_command_history()
+        terminal = current_terminal()
+        prefix = request.args.get('prefix', '')
+        query = request.args.get('q', '')
+        if not prefix and not query and 'scope' not in request.args:
+            history = terminal.get_command_history()
+        else:
+            scope = request.args.get('scope', 'session')
+            if scope not in ('session', 'global'):
+                return jsonify({'success': False, 'error': "scope must be 'session' or 'global'"}), 400
+            if scope == 'global' and not history_global_search:
+                return jsonify({'success': False,
+                                'error': 'Global history search is disabled'}), 403
+            limit = min(max(int(request.args.get('limit', 50)), 1), 1000)
+            history = terminal.search_history(prefix=prefix, q=query, scope=scope, limit=limit)
         return jsonify({
             'success': True,
             'history': history
@@ -113,5 +589,203 @@ def get_command_history():
             'error': str(e)
         })
 
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Submit a command for background execution and return its job id"""
+    data = request.get_json(silent=True) or {}
+    command = data.get('command', '').strip()
+    if not command:
+        return jsonify({
+            'success': False,
+            'error': 'Empty command'
+        }), 400
+    
+    try:
+        timeout = float(data['timeout']) if data.get('timeout') else None
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'error': 'Invalid timeout'
+        }), 400
+    
+    try:
+        job = job_manager.submit(current_terminal(), command,
+                                 session_id=get_session_id(),
+                                 timeout=timeout)
+    except JobQueueFull as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 429
+    
+    return jsonify({
+        'success': True,
+        'job': job.to_dict()
+    }), 202
+
+@app.route('/jobs')
+def list_jobs():
+    """List this session's jobs (only unfinished ones with ?running=1)"""
+    running_only = request.args.get('running') in ('1', 'true')
+    jobs = job_manager.list(session_id=get_session_id(), include_finished=not running_only)
+    return jsonify({
+        'success': True,
+        'jobs': [job.to_dict() for job in jobs]
+    })
+
+def get_session_job(job_id):
+    """Look up a job owned by the current session"""
+    job = job_manager.get(job_id)
+    if job is None or job.session_id != get_session_id():
+        return None
+    return job
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Get job status and output from the `offset` query parameter onwards"""
+    job = get_session_job(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': f'Job {job_id} not found'
+        }), 404
+    
+    output, next_offset = job.read_output(request.args.get('offset', 0, type=int))
+    return jsonify({
+        'success': True,
+        'job': job.to_dict(),
+        'output': output,
+        'next_offset': next_offset
+    })
+
+@app.route('/jobs/<job_id>/stream')
+def stream_job(job_id):
+    """Stream a job's output as Server-Sent Events until it finishes"""
+    job = get_session_job(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': f'Job {job_id} not found'
+        }), 404
+    
+    offset = request.args.get('offset', 0, type=int)
+    
+    def generate():
+        for chunk in job.iter_output(offset):
+            if chunk is None:
+                yield sse_comment()
+            else:
+                yield sse_event({'output': chunk}, event='output')
+        yield sse_event(job.to_dict(), event='exit')
+    
+    return Response(stream_with_context(generate()),
+                    mimetype='text/event-stream',
+                    headers=SSE_HEADERS)
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = get_session_job(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': f'Job {job_id} not found'
+        }), 404
+    
+    job_manager.cancel(job_id)
+    return jsonify({
+        'success': True,
+        'job': job.to_dict()
+    })
+
+@app.route('/ai/stats')
+def get_ai_stats():
+    """Get intent cache and model translation counters"""
+    return jsonify({
+        'success': True,
+        'data': ai_processor.get_stats()
+    })
+
+@app.route('/ws/info')
+def get_websocket_info():
+    """Tell clients where the WebSocket channel listens (if it is running)"""
+    get_session_id()  # make sure the socket can join this session
+    if websocket_server is None or not websocket_server.running:
+        return jsonify({'success': True, 'data': {'enabled': False}})
+    return jsonify({
+        'success': True,
+        'data': {
+            'enabled': True,
+            'port': websocket_server.server_address[1],
+            'path': websocket_server.path,
+            'compression': websocket_server.compression,
+        }
+    })
+
+@app.route('/async/info')
+def get_async_info():
+    """Tell clients where the asyncio endpoint listens (if it is running)"""
+    get_session_id()  # make sure requests there join this session
+    if async_server is None or not async_server.running:
+        return jsonify({'success': True, 'data': {'enabled': False}})
+    return jsonify({
+        'success': True,
+        'data': {
+            'enabled': True,
+            'port': async_server.server_address[1],
+        }
+    })
+
+@app.route('/sessions/stats')
+def get_session_stats():
+    """Get live session counts, approximate memory use and history size"""
+    data = session_manager.stats()
+    data['history'] = command_history.stats()
+    data['pty'] = pty_manager.stats()
+    data['exec'] = governor.stats()
+    return jsonify({
+        'success': True,
+        'data': data
+    })
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus text exposition of request, command and stage timings"""
+    if not instrumentation.enabled:
+        abort(404)
+    return Response(instrumentation.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/profile', methods=['GET', 'POST'])
+def profile_control():
+    """Arm the profiler for the next N requests (POST) or show its status (GET)
+    
+    POST JSON: requests (default 10), mode ('cprofile' or 'stack'),
+    interval (stack sampling period in seconds).
+    """
+    if not profiling_enabled:
+        abort(404)
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            profiler.arm(int(data.get('requests', 10)), mode=data.get('mode', 'cprofile'),
+                         interval=float(data.get('interval', 0.005)))
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'data': profiler.status()})
+
+def shutdown():
+    """Stop background work before the process exits or restarts"""
+    if websocket_server is not None and websocket_server.running:
+        websocket_server.stop()
+    if async_server is not None and async_server.running:
+        async_server.stop()
+    job_manager.shutdown()
+    pty_manager.close_all()
+    if file_index is not None:
+        file_index.stop()
+    system_monitor.stop()
+    command_history.close()
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,134 @@
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# (seconds per bucket, number of buckets): 1s for 10 minutes, 10s for
+# 6 hours, 1m for 7 days
+DEFAULT_RESOLUTIONS = ((1, 600), (10, 6 * 360), (60, 7 * 24 * 60))
+DEFAULT_METRICS = ('cpu_percent', 'memory_percent', 'disk_percent')
+
+class RingSeries:
+    """Fixed-size ring of min/max/sum/count buckets at one resolution
+    
+    Storage is a handful of preallocated arrays, so memory is constant no
+    matter how long the process runs. Each slot records the bucket it
+    currently holds; a slot reused for a newer bucket is reset first.
+    """
+    
+    def __init__(self, resolution: int, slots: int):
+        self.resolution = resolution
+        self.slots = slots
+        self.buckets = array('q', [-1]) * slots
+        self.mins = array('f', [0.0]) * slots
+        self.maxs = array('f', [0.0]) * slots
+        self.sums = array('d', [0.0]) * slots
+        self.counts = array('I', [0]) * slots
+    
+    def add(self, timestamp: float, value: float):
+        bucket = int(timestamp // self.resolution)
+        slot = bucket % self.slots
+        if self.buckets[slot] != bucket:
+            self.buckets[slot] = bucket
+            self.mins[slot] = value
+            self.maxs[slot] = value
+            self.sums[slot] = value
+            self.counts[slot] = 1
+            return
+        if value < self.mins[slot]:
+            self.mins[slot] = value
+        if value > self.maxs[slot]:
+            self.maxs[slot] = value
+        self.sums[slot] += value
+        self.counts[slot] += 1
+    
+    def query(self, start: float, end: float) -> List[Tuple[float, float, float, float]]:
+        """Return (bucket_start, min, max, avg) for populated buckets in [start, end]"""
+        first = max(int(start // self.resolution), int(end // self.resolution) - self.slots + 1)
+        last = int(end // self.resolution)
+        points = []
+        for bucket in range(first, last + 1):
+            slot = bucket % self.slots
+            if self.buckets[slot] != bucket or not self.counts[slot]:
+                continue
+            points.append((
+                bucket * self.resolution,
+                round(self.mins[slot], 2),
+                round(self.maxs[slot], 2),
+                round(self.sums[slot] / self.counts[slot], 2),
+            ))
+        return points
+    
+    @property
+    def span(self) -> int:
+        """Seconds of history this series can hold"""
+        return self.resolution * self.slots
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in
+                   (self.buckets, self.mins, self.maxs, self.sums, self.counts))
+
+class MetricsHistory:
+    """In-process time series store fed by SystemMonitor snapshots
+    
+    Every sample is folded into each resolution directly, so downsampling
+    (min/max/avg per bucket) happens as data arrives.
+    """
+    
+    def __init__(self, metrics: Iterable[str] = DEFAULT_METRICS,
+                 resolutions: Iterable[Tuple[int, int]] = DEFAULT_RESOLUTIONS):
+        self.resolutions = sorted(resolutions)
+        self._series: Dict[str, List[RingSeries]] = {
+            metric: [RingSeries(resolution, slots) for resolution, slots in self.resolutions]
+            for metric in metrics
+        }
+        self._lock = threading.Lock()
+    
+    @property
+    def metrics(self) -> List[str]:
+        return list(self._series)
+    
+    def record(self, snapshot: Dict):
+        """Add the tracked metrics of a snapshot (used as a sampler listener)"""
+        timestamp = snapshot.get('timestamp', time.time())
+        with self._lock:
+            for metric, series_list in self._series.items():
+                value = snapshot.get(metric)
+                if value is None:
+                    continue
+                for series in series_list:
+                    series.add(timestamp, float(value))
+    
+    def pick_resolution(self, window: float) -> int:
+        """Finest resolution whose ring covers `window` seconds"""
+        for resolution, slots in self.resolutions:
+            if resolution * slots >= window:
+                return resolution
+        return self.resolutions[-1][0]
+    
+    def query(self, metrics: Iterable[str], window: float = 600,
+              resolution: Optional[int] = None, end: Optional[float] = None) -> Dict:
+        """Return points for each metric over the last `window` seconds"""
+        end = time.time() if end is None else end
+        resolution = resolution or self.pick_resolution(window)
+        series = {}
+        with self._lock:
+            for metric in metrics:
+                if metric not in self._series:
+                    raise ValueError(f"Unknown metric '{metric}' (available: {', '.join(self._series)})")
+                ring = next((s for s in self._series[metric] if s.resolution == resolution), None)
+                if ring is None:
+                    raise ValueError(f"Unsupported resolution {resolution}s")
+                series[metric] = ring.query(end - window, end)
+        return {
+            'resolution': resolution,
+            'start': end - window,
+            'end': end,
+            'fields': ['timestamp', 'min', 'max', 'avg'],
+            'series': series,
+        }
+    
+    def nbytes(self) -> int:
+        """Total bytes held by the ring buffers (constant for the process lifetime)"""
+        return sum(series.nbytes for series_list in self._series.values() for series in series_list)
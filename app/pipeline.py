@@ -0,0 +1,866 @@
+import glob
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from functools import partial
+from itertools import chain, groupby, islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from .streaming import EXIT_GRACE, ProcessOutputStream, kill_process_tree
+
+# Unquoted characters that need a real shell (sequencing, substitution, ...)
+SHELL_ONLY_CHARS = set('&;$`(){}')
+# stderr collected from external stages is reported up to this many bytes
+MAX_STDERR_BYTES = 64 * 1024
+# Buffered lines are flushed to the consumer at least this often
+FLUSH_INTERVAL = 0.1
+# Longest line a built-in stage reads (a file without newlines is not text)
+MAX_LINE_LENGTH = 16 * 1024 * 1024
+
+class PipelineSyntaxError(ValueError):
+    """Raised for malformed pipelines such as `cat |` or `ls >`"""
+
+class StageError(Exception):
+    """A built-in stage failed; the message is its complete "Error: ..." text"""
+
+class PipelineStopped(Exception):
+    """Raised in a built-in stage once its pipeline timed out or was closed"""
+
+class InputBudget:
+    """Stop flag and size limit shared by the line sources of one pipeline
+    
+    Built-in stages run on the consumer's thread, where a timer cannot
+    interrupt them. Instead every line they read from a file or pipe is
+    charged here, which raises once the pipeline was stopped or has read
+    more than `max_bytes` (counted in characters for text files).
+    """
+    
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.stopped = False
+    
+    def charge(self, line):
+        if self.stopped:
+            raise PipelineStopped()
+        self.used += len(line)
+        if self.max_bytes is not None and self.used > self.max_bytes:
+            raise StageError(f"Error: Pipeline input exceeds {self.max_bytes} bytes")
+        if len(line) >= MAX_LINE_LENGTH and line[-1:] not in ('\n', b'\n'):
+            raise StageError(f"Error: Line longer than {MAX_LINE_LENGTH} bytes")
+
+class Operator(str):
+    """An unquoted `|`, `<`, `>` or `>>` (a quoted '>' stays a plain word)"""
+
+class Word(str):
+    """A command word; `expandable` is set when it had unquoted glob or ~"""
+    expandable = False
+
+class PipelineSpec:
+    """A parsed pipeline: argv per stage plus optional file redirections"""
+    
+    def __init__(self, stages: List[List[str]], stdin_path: Optional[str] = None,
+                 stdout_path: Optional[str] = None, append: bool = False):
+        self.stages = stages
+        self.stdin_path = stdin_path
+        self.stdout_path = stdout_path
+        self.append = append
+
+def tokenize(command: str) -> Optional[List[str]]:
+    """Split a command line into Words and Operators with POSIX quoting
+    
+    Returns None when the line uses shell syntax this module does not
+    implement (`&&`, `;`, `$VAR`, `2>`, subshells, ...).
+    """
+    tokens: List[str] = []
+    word: List[str] = []
+    in_word = False
+    expandable = False
+    quote = None
+    
+    def flush():
+        nonlocal word, in_word, expandable
+        if in_word:
+            token = Word(''.join(word))
+            token.expandable = expandable
+            tokens.append(token)
+        word, in_word, expandable = [], False, False
+    
+    i = 0
+    length = len(command)
+    while i < length:
+        c = command[i]
+        if quote is not None:
+            if c == quote:
+                quote = None
+            elif c == '\\' and quote == '"' and i + 1 < length and command[i + 1] in '"\\$`':
+                i += 1
+                word.append(command[i])
+            elif c in '$`' and quote == '"':
+                return None
+            else:
+                word.append(c)
+        elif c in '\'"':
+            quote = c
+            in_word = True
+        elif c == '\\':
+            i += 1
+            if i < length:
+                word.append(command[i])
+                in_word = True
+        elif c.isspace():
+            flush()
+        elif c in '|<>':
+            following = command[i + 1:i + 2]
+            # fd redirections (`2>`, `>&`), `||` and here-docs need a shell
+            if c == '>' and in_word and ''.join(word).isdigit():
+                return None
+            if following == '&' or (c in '|<' and following == c):
+                return None
+            flush()
+            if c == '>' and command[i + 1:i + 2] == '>':
+                tokens.append(Operator('>>'))
+                i += 1
+            else:
+                tokens.append(Operator(c))
+        elif c in SHELL_ONLY_CHARS:
+            return None
+        else:
+            if c in '*?[' or (c == '~' and not in_word):
+                expandable = True
+            word.append(c)
+            in_word = True
+        i += 1
+    
+    if quote is not None:
+        raise PipelineSyntaxError("Unterminated quote")
+    flush()
+    return tokens
+
+def parse(command: str) -> Optional[PipelineSpec]:
+    """Parse a command line into a PipelineSpec
+    
+    Returns None for plain commands without operators, and for lines that
+    need a real shell, so callers can keep their existing handling.
+    """
+    if not any(c in command for c in '|<>'):
+        return None
+    tokens = tokenize(command)
+    if tokens is None or not any(isinstance(token, Operator) for token in tokens):
+        return None
+    
+    stages: List[List[str]] = [[]]
+    stdin_path = stdout_path = None
+    append = False
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if isinstance(token, Operator):
+            if token == '|':
+                if not stages[-1]:
+                    raise PipelineSyntaxError("Missing command before '|'")
+                stages.append([])
+            else:
+                if i + 1 >= len(tokens) or isinstance(tokens[i + 1], Operator):
+                    raise PipelineSyntaxError(f"Missing file name after '{token}'")
+                if token == '<':
+                    if len(stages) > 1:
+                        raise PipelineSyntaxError("Input redirection is only allowed on the first command")
+                    stdin_path = tokens[i + 1]
+                else:
+                    stdout_path = tokens[i + 1]
+                    append = token == '>>'
+                i += 1
+        else:
+            if stdout_path is not None:
+                raise PipelineSyntaxError("Output redirection must come last")
+            stages[-1].append(token)
+        i += 1
+    
+    if not stages[-1]:
+        raise PipelineSyntaxError("Missing command after '|'" if len(stages) > 1
+                                  else "Missing command")
+    return PipelineSpec(stages, stdin_path, stdout_path, append)
+
+def needs_shell(command: str) -> bool:
+    """True for lines with redirection/pipes mixed with shell-only syntax"""
+    return any(c in command for c in '|<>') and tokenize(command) is None
+
+# --- line sources ----------------------------------------------------------
+
+def _file_lines(path: str, budget: Optional[InputBudget] = None) -> Iterator[str]:
+    """Lazily read a text file line by line (closed when the consumer stops)"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        if budget is None:
+            for line in f:
+                yield line[:-1] if line.endswith('\n') else line
+            return
+        for line in iter(partial(f.readline, MAX_LINE_LENGTH), ''):
+            budget.charge(line)
+            yield line[:-1] if line.endswith('\n') else line
+
+def _binary_lines(stream, budget: Optional[InputBudget] = None) -> Iterator[str]:
+    """Decode lines from a subprocess pipe"""
+    for raw in iter(partial(stream.readline, MAX_LINE_LENGTH), b''):
+        if budget is not None:
+            budget.charge(raw)
+        yield raw.decode('utf-8', errors='replace').rstrip('\n')
+
+def _chunk_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Split a stream of text chunks (from a command's stream handler) into lines"""
+    pending = ''
+    for chunk in chunks:
+        if not chunk:
+            continue
+        pending += chunk
+        parts = pending.split('\n')
+        pending = parts.pop()
+        yield from parts
+    if pending:
+        yield pending
+
+def _builtin_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Lines of a built-in command's output; an error reply aborts the pipeline"""
+    chunks = iter(chunks)
+    for chunk in chunks:
+        if chunk:
+            if chunk.startswith('Error'):
+                _close(chunks)
+                raise StageError(chunk.strip())
+            yield from _chunk_lines(chain([chunk], chunks))
+            return
+
+def _close(iterator):
+    close = getattr(iterator, 'close', None)
+    if close is not None:
+        close()
+
+def _files_lines(terminal, files: List[str], budget: Optional[InputBudget]) -> Iterator[str]:
+    for path in files:
+        yield from _file_lines(terminal._resolve_path(path), budget)
+
+def _input(terminal, files: List[str], lines: Optional[Iterator[str]], name: str,
+           budget: Optional[InputBudget] = None) -> Iterator[str]:
+    """Lines from the file operands, else from the previous stage"""
+    if files:
+        return _files_lines(terminal, files, budget)
+    if lines is None:
+        raise ValueError(f"{name}: no input (give a file or pipe into it)")
+    return lines
+
+def _split_count(args: List[str], default: int = 10):
+    """Parse `-n N`, `-nN` and `-N` for head/tail; returns (count, files)"""
+    count = default
+    files = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == '-n':
+            if i + 1 >= len(args):
+                raise ValueError("Option -n requires a value")
+            count = int(args[i + 1])
+            i += 1
+        elif arg.startswith('-n') and len(arg) > 2:
+            count = int(arg[2:])
+        elif arg.startswith('-') and arg[1:].isdigit():
+            count = int(arg[1:])
+        elif arg.startswith('-') and arg != '-':
+            raise ValueError(f"Unknown option {arg}")
+        else:
+            files.append(arg)
+            i += 1
+            continue
+        if count < 0 or args[i].startswith(('+', '-n+')):
+            # `tail -n +N` and `head -n -N` count from the other end
+            raise ValueError(f"Unsupported count {args[i]}")
+        i += 1
+    return count, files
+
+# Flags implemented by the built-in wc, sort and uniq
+FLAGS = {'wc': 'lwcm', 'sort': 'rnfu', 'uniq': 'cdui'}
+
+def _split_flags(args: List[str], allowed: str, name: str):
+    """Parse single-letter flags (combinable, e.g. -rn); returns (flags, files)"""
+    flags = set()
+    files = []
+    for arg in args:
+        if arg.startswith('-') and len(arg) > 1:
+            for flag in arg[1:]:
+                if flag not in allowed:
+                    raise ValueError(f"{name}: unknown option -{flag}")
+                flags.add(flag)
+        else:
+            files.append(arg)
+    return flags, files
+
+# --- built-in line filters -------------------------------------------------
+# Each filter is `filter(terminal, args, lines, budget=None)` where `lines`
+# is the previous stage's output (None for the first stage) and returns an
+# iterator of output lines; files it reads itself are charged to `budget`.
+# Filters pull from `lines` only as far as they need, so `head` stops
+# everything upstream of it early.
+
+CAT_PAGING_OPTIONS = ('--offset', '--lines', '--max-bytes')
+
+def _cat_args(args):
+    i = 0
+    while i < len(args):
+        if args[i] in CAT_PAGING_OPTIONS:
+            i += 2
+            continue
+        if args[i].startswith('-'):
+            raise ValueError(f"cat: unknown option {args[i]}")
+        i += 1
+
+def cat_filter(terminal, args, lines, budget=None):
+    _cat_args(args)
+    if any(arg in CAT_PAGING_OPTIONS for arg in args):
+        # Paging options: fall back to the regular (buffered) cat
+        return _builtin_lines([terminal._read_file(args)])
+    return _input(terminal, args, lines, 'cat', budget)
+
+# Characters that make a grep pattern a basic regular expression
+BRE_CHARS = set('.[]*^$\\')
+
+def _grep_args(args):
+    """Parse grep [-E|-F] [-i] [-v] [-c] [-n] [-m N] pattern [file...]
+    
+    Like grep (and unlike the standalone built-in) matching is
+    case-sensitive unless -i is given. Basic regular expressions and POSIX
+    character classes are not implemented and are rejected.
+    """
+    flags = set()
+    max_count = None
+    positional = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == '--':
+            positional.extend(args[i + 1:])
+            break
+        if arg == '-m':
+            if i + 1 >= len(args):
+                raise ValueError("grep: option -m requires a value")
+            max_count = int(args[i + 1])
+            i += 2
+            continue
+        if arg.startswith('-m') and arg[2:].isdigit():
+            max_count = int(arg[2:])
+        elif arg.startswith('-') and len(arg) > 1:
+            for flag in arg[1:]:
+                if flag not in 'EFivcn':
+                    raise ValueError(f"grep: unknown option -{flag}")
+                flags.add(flag)
+        else:
+            positional.append(arg)
+        i += 1
+    if not positional:
+        raise ValueError("grep: pattern required")
+    pattern = positional[0]
+    if 'E' in flags and '[:' in pattern:
+        raise ValueError("grep: POSIX character classes are not supported")
+    if not flags & {'E', 'F'} and BRE_CHARS.intersection(pattern):
+        raise ValueError("grep: basic regular expressions are not supported")
+    return flags, max_count, pattern, positional[1:]
+
+def grep_filter(terminal, args, lines, budget=None):
+    flags, max_count, pattern, files = _grep_args(args)
+    if files:
+        # Like grep, name the file on each line when there are several
+        sources = [(path if len(files) > 1 else None, _file_lines(terminal._resolve_path(path), budget))
+                   for path in files]
+    else:
+        sources = [(None, _input(terminal, files, lines, 'grep', budget))]
+    return _grep_lines(pattern, flags, max_count, sources)
+
+def _grep_lines(pattern, flags, max_count, sources):
+    if 'E' in flags:
+        match = re.compile(pattern, re.IGNORECASE if 'i' in flags else 0).search
+    elif 'i' in flags:
+        folded = pattern.lower()
+        match = lambda line: folded in line.lower()
+    else:
+        match = lambda line: pattern in line
+    invert = 'v' in flags
+    for name, lines in sources:
+        prefix = f"{name}:" if name else ''
+        count = 0
+        for number, line in enumerate(lines, 1):
+            if max_count is not None and count >= max_count:
+                break
+            if bool(match(line)) == invert:
+                continue
+            count += 1
+            if 'c' not in flags:
+                yield f"{prefix}{number}:{line}" if 'n' in flags else prefix + line
+        _close(lines)
+        if 'c' in flags:
+            yield f"{prefix}{count}"
+
+def find_filter(terminal, args, lines, budget=None):
+    """The built-in `find <pattern> [path] [options]`, one path per line"""
+    finder, search_path, max_results = terminal._parse_find_args(args)
+    for batch in terminal._find_batches(finder, search_path, max_results):
+        if budget is not None and budget.stopped:
+            raise PipelineStopped()
+        yield from batch
+
+def head_filter(terminal, args, lines, budget=None):
+    count, files = _split_count(args)
+    source = _input(terminal, files, lines, 'head', budget)
+    yield from islice(source, max(count, 0))
+    # Stop upstream producers (file reads, finds, processes) right away
+    _close(source)
+
+def _tail_args(args):
+    if '-f' in args:
+        raise ValueError("tail: -f cannot be used in a pipeline")
+    return _split_count(args)
+
+def tail_filter(terminal, args, lines, budget=None):
+    count, files = _tail_args(args)
+    return iter(deque(_input(terminal, files, lines, 'tail', budget), maxlen=max(count, 0)))
+
+def wc_filter(terminal, args, lines, budget=None):
+    """wc [-l] [-w] [-c] [-m] [file...]: lines, words, bytes (-m: characters)"""
+    flags, files = _split_flags(args, FLAGS['wc'], 'wc')
+    columns = [flag for flag in 'lwmc' if flag in flags] or ['l', 'w', 'c']
+    sources = [(path, _file_lines(terminal._resolve_path(path), budget)) for path in files] \
+        or [(None, _input(terminal, [], lines, 'wc', budget))]
+    totals = dict.fromkeys(columns, 0)
+    for name, source in sources:
+        counts = _count(source, columns)
+        for column in columns:
+            totals[column] += counts[column]
+        values = ' '.join(f"{counts[column]:>7}" for column in columns)
+        yield f"{values} {name}" if name else values.strip() if len(columns) == 1 else values
+    if len(sources) > 1:
+        yield ' '.join(f"{totals[column]:>7}" for column in columns) + ' total'
+
+def _count(source, columns):
+    """Count lines/words/characters/bytes, only doing the work asked for"""
+    if columns == ['l']:
+        return {'l': sum(1 for _ in source)}
+    lines = words = chars = size = 0
+    want_words = 'w' in columns
+    want_chars = 'm' in columns
+    want_bytes = 'c' in columns
+    for line in source:
+        lines += 1
+        if want_words:
+            words += len(line.split())
+        if want_chars:
+            chars += len(line) + 1
+        if want_bytes:
+            size += len(line.encode('utf-8')) + 1
+    return {'l': lines, 'w': words, 'm': chars, 'c': size}
+
+_NUMBER_RE = re.compile(r'\s*([-+]?\d+(?:\.\d*)?)')
+
+def _numeric_key(line):
+    match = _NUMBER_RE.match(line)
+    return float(match.group(1)) if match else 0.0
+
+def sort_filter(terminal, args, lines, budget=None):
+    """sort [-r] [-n] [-f] [-u] [file...]"""
+    flags, files = _split_flags(args, FLAGS['sort'], 'sort')
+    if 'n' in flags:
+        key = _numeric_key
+    elif 'f' in flags:
+        key = str.lower
+    else:
+        key = None
+    ordered = sorted(_input(terminal, files, lines, 'sort', budget), key=key, reverse='r' in flags)
+    if 'u' in flags:
+        return (next(group) for _, group in groupby(ordered, key=key))
+    return iter(ordered)
+
+def uniq_filter(terminal, args, lines, budget=None):
+    """uniq [-c] [-d] [-u] [-i] [file]: collapse adjacent duplicate lines"""
+    flags, files = _split_flags(args, FLAGS['uniq'], 'uniq')
+    key = str.lower if 'i' in flags else None
+    for _, group in groupby(_input(terminal, files, lines, 'uniq', budget), key=key):
+        first = next(group)
+        count = 1 + sum(1 for _ in group)
+        if ('d' in flags and count < 2) or ('u' in flags and count > 1):
+            continue
+        yield f"{count:>7} {first}" if 'c' in flags else first
+
+def _echo_args(args):
+    if args and re.fullmatch(r'-[neE]+', args[0]):
+        raise ValueError(f"echo: unknown option {args[0]}")
+
+def echo_filter(terminal, args, lines, budget=None):
+    _echo_args(args)
+    return iter([' '.join(args)])
+
+FILTERS: Dict[str, Callable] = {
+    'cat': cat_filter,
+    'grep': grep_filter,
+    'find': find_filter,
+    'head': head_filter,
+    'tail': tail_filter,
+    'wc': wc_filter,
+    'sort': sort_filter,
+    'uniq': uniq_filter,
+    'echo': echo_filter,
+}
+
+# Argument checks run before anything is spawned: a filter is only used
+# when it implements every argument, else the real program runs instead
+FILTER_ARGS: Dict[str, Callable] = {
+    'cat': lambda terminal, args: _cat_args(args),
+    'grep': lambda terminal, args: _grep_args(args),
+    'find': lambda terminal, args: terminal._parse_find_args(args),
+    'head': lambda terminal, args: _split_count(args),
+    'tail': lambda terminal, args: _tail_args(args),
+    'wc': lambda terminal, args: _split_flags(args, FLAGS['wc'], 'wc'),
+    'sort': lambda terminal, args: _split_flags(args, FLAGS['sort'], 'sort'),
+    'uniq': lambda terminal, args: _split_flags(args, FLAGS['uniq'], 'uniq'),
+    'echo': lambda terminal, args: _echo_args(args),
+}
+
+def filter_command(name: str):
+    """Registry handler running a filter standalone on its file operands"""
+    line_filter = FILTERS[name]
+    
+    def handler(terminal, args):
+        try:
+            return '\n'.join(line_filter(terminal, args, None))
+        except FileNotFoundError as e:
+            return f"Error: File '{e.filename}' not found"
+        except Exception as e:
+            return f"Error: {str(e)}"
+    return handler
+
+# --- execution -------------------------------------------------------------
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, StageError):
+        return str(error)
+    if isinstance(error, FileNotFoundError):
+        return f"Error: '{error.filename}' not found"
+    if isinstance(error, PermissionError):
+        return "Error: Permission denied"
+    return f"Error: {str(error)}"
+
+class Pipeline:
+    """Run a PipelineSpec, yielding output text chunks
+    
+    Built-in stages are chained generators over lines, so data is pulled
+    through on demand and never copied into intermediate strings. Adjacent
+    external commands are connected by OS pipes directly (their data never
+    passes through Python); a built-in feeding an external command writes
+    to its stdin from a helper thread. Like ProcessOutputStream, the object
+    exposes `returncode` once exhausted and `close()` kills what is left.
+    `timeout` kills the external stages and stops the built-in ones at
+    their next line; `max_input_bytes` caps what built-in stages read.
+    """
+    
+    def __init__(self, terminal, spec: PipelineSpec, max_bytes: Optional[int] = None,
+                 chunk_size: int = 64 * 1024, timeout: Optional[float] = None,
+                 max_input_bytes: Optional[int] = None):
+        self.terminal = terminal
+        self.spec = spec
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.returncode: Optional[int] = None
+        self.truncated = False
+        self.timed_out = False
+        self._procs: List[subprocess.Popen] = []
+        self._files = []
+        self._stderr = None
+        self._errors: List[str] = []
+        self._timer = None
+        self._closed = False
+        self._completed = False
+        self._ends_external = False
+        self._stages = None
+        self._budget = InputBudget(max_input_bytes)
+    
+    @property
+    def spawns_processes(self) -> bool:
+        """Whether any stage is an external command (and so needs governing)"""
+        stages = self._plan()
+        return not any(error for _, _, error in stages) \
+            and any(line_filter is None and command is None for line_filter, command, _ in stages)
+    
+    def _plan(self):
+        """(line filter, built-in command, error) per stage, checked before running
+        
+        A filter or built-in only stands in for the program of the same
+        name when it implements every argument given. Otherwise the
+        program runs, or, when it is not installed, the stage's error
+        aborts the pipeline before anything starts.
+        """
+        if self._stages is None:
+            terminal = self.terminal
+            self._stages = []
+            for argv in self.spec.stages:
+                name = argv[0].lower()
+                args = list(argv[1:])
+                line_filter = FILTERS.get(name)
+                command = None if line_filter else terminal.registry.get(name)
+                error = None
+                if line_filter is not None:
+                    try:
+                        FILTER_ARGS[name](terminal, args)
+                    except ValueError as e:
+                        message = str(e)
+                        if not message.startswith(f"{name}:"):
+                            message = f"{name}: {message}"
+                        error = f"Error: {message}"
+                elif command is not None:
+                    error = command.argument_error(terminal, args)
+                if error is not None and terminal._find_program(argv[0]):
+                    line_filter = command = error = None
+                self._stages.append((line_filter, command, error))
+        return self._stages
+    
+    def __iter__(self):
+        if self.timeout is not None:
+            self._timer = threading.Timer(self.timeout, self._on_timeout)
+            self._timer.daemon = True
+            self._timer.start()
+        emitted = False
+        try:
+            for chunk in self._run():
+                emitted = emitted or bool(chunk)
+                yield chunk
+            self._completed = not self.truncated
+        except PipelineStopped:
+            pass  # timed out: reported below
+        except Exception as e:
+            self._errors.append(_error_message(e))
+        finally:
+            self.close()
+        messages = list(self._errors)
+        if self._stderr is not None:
+            self._stderr.seek(0)
+            stderr = self._stderr.read(MAX_STDERR_BYTES).decode('utf-8', errors='replace').strip()
+            self._stderr.close()
+            if stderr:
+                messages.append(f"Error: {stderr}")
+        if self.truncated:
+            messages.append(f"Error: Output truncated after {self.max_bytes} bytes")
+        elif self.timed_out:
+            messages.append("Error: Command timed out")
+        if messages:
+            yield ('\n' if emitted else '') + '\n'.join(messages)
+    
+    def read(self) -> str:
+        """Run to completion and return the whole output"""
+        return ''.join(self).strip('\n')
+    
+    def _run(self):
+        spec = self.spec
+        terminal = self.terminal
+        lines: Optional[Iterator[str]] = None
+        proc: Optional[subprocess.Popen] = None
+        stdin_file = out_file = None
+        last = len(spec.stages) - 1
+        
+        stages = self._plan()
+        for _, _, error in stages:
+            if error is not None:
+                raise StageError(error)
+        
+        if spec.stdin_path is not None:
+            stdin_file = self._open(terminal._resolve_path(spec.stdin_path), 'rb')
+        if spec.stdout_path is not None:
+            out_file = self._open(terminal._resolve_path(spec.stdout_path),
+                                  'ab' if spec.append else 'wb')
+        
+        for index, (argv, (line_filter, command, _)) in enumerate(zip(spec.stages, stages)):
+            args = list(argv[1:])
+            if line_filter is None and command is None:
+                # External command: wire stdin straight to the previous pipe
+                if proc is not None:
+                    stdin = proc.stdout
+                elif lines is not None:
+                    stdin = subprocess.PIPE
+                elif index == 0 and stdin_file is not None:
+                    stdin = stdin_file
+                else:
+                    stdin = subprocess.DEVNULL
+                stdout = out_file if index == last and out_file is not None else subprocess.PIPE
+                new_proc = self._spawn(argv, stdin, stdout)
+                if proc is not None:
+                    # The child owns the read end now
+                    proc.stdout.close()
+                if lines is not None:
+                    self._feed(new_proc.stdin, lines)
+                proc, lines = new_proc, None
+                continue
+            
+            if proc is not None:
+                lines = _binary_lines(proc.stdout, self._budget)
+                proc = None
+            elif index == 0 and stdin_file is not None:
+                lines = _binary_lines(stdin_file, self._budget)
+            
+            if line_filter is not None:
+                lines = line_filter(terminal, args, lines, self._budget)
+            else:
+                # Other built-ins (ls, ps, ...) ignore their input
+                lines = _builtin_lines(command.run_stream(terminal, args))
+        
+        if proc is not None:
+            self._ends_external = True
+            if proc.stdout is None:
+                proc.wait()
+                return
+            stream = ProcessOutputStream(proc, max_bytes=self.max_bytes,
+                                         chunk_size=self.chunk_size)
+            yield from stream
+            self.truncated = stream.truncated
+            return
+        
+        if out_file is not None:
+            for line in lines:
+                out_file.write(line.encode('utf-8') + b'\n')
+            return
+        yield from self._batch(lines)
+    
+    def _batch(self, lines):
+        """Group lines into chunks of about `chunk_size`, flushing slow producers"""
+        buffer: List[str] = []
+        size = 0
+        written = 0
+        flush_at = time.monotonic() + FLUSH_INTERVAL
+        for line in lines:
+            buffer.append(line)
+            size += len(line) + 1
+            if size >= self.chunk_size or time.monotonic() >= flush_at:
+                text = '\n'.join(buffer) + '\n'
+                if self.max_bytes is not None and written + len(text) > self.max_bytes:
+                    yield text[:self.max_bytes - written]
+                    self.truncated = True
+                    _close(lines)
+                    return
+                written += len(text)
+                yield text
+                buffer, size = [], 0
+                flush_at = time.monotonic() + FLUSH_INTERVAL
+        if buffer:
+            text = '\n'.join(buffer)
+            if self.max_bytes is not None and written + len(text) > self.max_bytes:
+                text = text[:self.max_bytes - written]
+                self.truncated = True
+            yield text
+    
+    def _open(self, path, mode):
+        f = open(path, mode)
+        self._files.append(f)
+        return f
+    
+    def _spawn(self, argv, stdin, stdout):
+        if self._stderr is None:
+            self._stderr = tempfile.TemporaryFile()
+        proc = subprocess.Popen(
+            self.terminal._limited(self._expand(argv)),
+            cwd=self.terminal.current_directory,
+            env=self.terminal._command_environment(),
+            stdin=stdin,
+            stdout=stdout,
+            stderr=self._stderr,
+            start_new_session=(os.name == 'posix')
+        )
+        self._procs.append(proc)
+        return proc
+    
+    def _expand(self, argv):
+        """Expand unquoted ~ and globs for external commands, as a shell would"""
+        expanded = []
+        for word in argv:
+            if not getattr(word, 'expandable', False):
+                expanded.append(str(word))
+                continue
+            word = os.path.expanduser(word)
+            if glob.has_magic(word):
+                base = self.terminal.current_directory
+                matches = sorted(glob.glob(os.path.join(base, word)))
+                if matches:
+                    if not os.path.isabs(word):
+                        matches = [os.path.relpath(match, base) for match in matches]
+                    expanded.extend(matches)
+                    continue
+            expanded.append(word)
+        return expanded
+    
+    def _feed(self, pipe, lines):
+        """Write a built-in stage's lines into an external command's stdin"""
+        def run():
+            try:
+                for line in lines:
+                    try:
+                        pipe.write(line.encode('utf-8') + b'\n')
+                    except (OSError, ValueError):
+                        return  # the command stopped reading its input
+            except PipelineStopped:
+                pass
+            except Exception as e:
+                # A failed stage aborts the pipeline
+                self._errors.append(_error_message(e))
+                self.kill()
+            finally:
+                _close(lines)
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+        
+        thread = threading.Thread(target=run, name='pipeline-feeder', daemon=True)
+        thread.start()
+    
+    def _on_timeout(self):
+        self.timed_out = True
+        self._budget.stopped = True
+        self.kill()
+    
+    def kill(self):
+        """Kill the external stages from another thread"""
+        for proc in list(self._procs):
+            if proc.poll() is None:
+                kill_process_tree(proc)
+    
+    def close(self):
+        """Stop every stage; the result is the last stage's status, or 1 if a stage failed
+        
+        After a run to completion the remaining stages only lose their
+        pipes, as in a shell (writers get SIGPIPE), and get EXIT_GRACE
+        seconds to exit. An early close kills them at once.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._timer is not None:
+            self._timer.cancel()
+        if not self._completed:
+            self._budget.stopped = True
+            self.kill()
+        for proc in self._procs:
+            for stream in (proc.stdout, proc.stdin):
+                if stream is not None:
+                    try:
+                        stream.close()
+                    except OSError:
+                        pass
+        for proc in self._procs:
+            try:
+                proc.wait(timeout=EXIT_GRACE)
+            except subprocess.TimeoutExpired:
+                kill_process_tree(proc)
+                proc.wait()
+        for f in self._files:
+            f.close()
+        if self._errors:
+            self.returncode = 1
+        elif self._ends_external:
+            self.returncode = self._procs[-1].returncode
+        else:
+            self.returncode = 0
@@ -0,0 +1,112 @@
+import heapq
+import threading
+import time
+from typing import Dict, List, Optional
+import psutil
+from .instrumentation import instrumentation
+
+# Fields sorted largest-first; everything else sorts ascending
+DESCENDING_SORTS = {'cpu', 'memory', 'rss'}
+SORT_KEYS = ('cpu', 'memory', 'rss', 'pid', 'name', 'user')
+
+class ProcessTable:
+    """Single shared snapshot of the process table
+    
+    Every refresh walks psutil.process_iter once. CPU usage is computed from
+    the CPU time each process consumed since the previous refresh, which is
+    kept per (pid, create_time) so that reused PIDs do not inherit stale
+    counters. Refreshes closer together than `min_refresh_interval` seconds
+    are served from the cached snapshot.
+    """
+    
+    ATTRS = ['pid', 'name', 'username', 'memory_percent', 'memory_info',
+             'cpu_times', 'create_time', 'status']
+    
+    def __init__(self, min_refresh_interval: float = 1.0, prime_interval: float = 0.1):
+        self.min_refresh_interval = min_refresh_interval
+        self.prime_interval = prime_interval
+        self._rows: List[Dict] = []
+        self._cpu_state: Dict = {}
+        self._sampled_at = 0.0
+        self._lock = threading.Lock()
+    
+    def refresh(self, force: bool = False) -> List[Dict]:
+        """Return the current rows, resampling if the snapshot is too old"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._rows and now - self._sampled_at < self.min_refresh_interval:
+                return self._rows
+            if not self._cpu_state:
+                # No baseline yet: take one so this refresh has real CPU deltas
+                self._sample()
+                time.sleep(self.prime_interval)
+            self._sample()
+            return self._rows
+    
+    def _sample(self):
+        with instrumentation.stage('monitor.processes'):
+            self._sample_processes()
+    
+    def _sample_processes(self):
+        now = time.monotonic()
+        rows = []
+        cpu_state = {}
+        for proc in psutil.process_iter(self.ATTRS):
+            info = proc.info
+            cpu_times = info.get('cpu_times')
+            cpu_total = (cpu_times.user + cpu_times.system) if cpu_times else None
+            key = (info['pid'], info.get('create_time'))
+            cpu = 0.0
+            previous = self._cpu_state.get(key)
+            if cpu_total is not None:
+                cpu_state[key] = (cpu_total, now)
+                if previous is not None and now > previous[1]:
+                    cpu = max(cpu_total - previous[0], 0.0) / (now - previous[1]) * 100
+            memory_info = info.get('memory_info')
+            rows.append({
+                'pid': info['pid'],
+                'name': info.get('name') or '',
+                'user': info.get('username'),
+                'status': info.get('status'),
+                'cpu': round(cpu, 1),
+                'memory': info.get('memory_percent') or 0.0,
+                'rss': memory_info.rss if memory_info else 0,
+            })
+        # Dropping state for exited processes keeps memory bounded
+        self._cpu_state = cpu_state
+        self._rows = rows
+        self._sampled_at = now
+    
+    def invalidate(self, pid: Optional[int] = None):
+        """Forget a process (e.g. after kill) or force the next refresh"""
+        with self._lock:
+            if pid is None:
+                self._sampled_at = 0.0
+            else:
+                self._rows = [row for row in self._rows if row['pid'] != pid]
+    
+    def query(self, sort: str = 'cpu', name: Optional[str] = None,
+              user: Optional[str] = None, min_cpu: Optional[float] = None,
+              limit: Optional[int] = None) -> List[Dict]:
+        """Filter and sort the snapshot; with `limit`, select top-k via a heap"""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Invalid sort key '{sort}' (use one of: {', '.join(SORT_KEYS)})")
+        rows = self.refresh()
+        name = name.lower() if name else None
+        if name or user or min_cpu is not None:
+            rows = [
+                row for row in rows
+                if (not name or name in row['name'].lower())
+                and (not user or row['user'] == user)
+                and (min_cpu is None or row['cpu'] >= min_cpu)
+            ]
+        
+        if sort in DESCENDING_SORTS:
+            key = lambda row: row[sort]
+            if limit is not None:
+                return heapq.nlargest(limit, rows, key=key)
+            return sorted(rows, key=key, reverse=True)
+        key = lambda row: (row[sort] is None, row[sort] or '') if sort in ('name', 'user') else row[sort]
+        if limit is not None:
+            return heapq.nsmallest(limit, rows, key=key)
+        return sorted(rows, key=key)
@@ -0,0 +1,399 @@
+import os
+import selectors
+import signal
+import struct
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+    import termios
+except ImportError:  # Windows has no pseudo-terminals
+    fcntl = None
+    termios = None
+
+# Raw output kept per session so a reconnecting client can repaint the screen
+SCROLLBACK_BYTES = 256 * 1024
+READ_SIZE = 64 * 1024
+# A listener holding this much unsent output pauses reads from the PTY
+# (the shell then blocks on write) until it has drained below LOW_WATER
+HIGH_WATER = 1024 * 1024
+LOW_WATER = 256 * 1024
+
+class PtyListener:
+    """One consumer of a PTY's output, drained by its own sender
+    
+    The reader thread only appends to `_buffer`, so a slow consumer never
+    stalls other sessions; it stalls its own session through the
+    high/low-water marks instead.
+    """
+    
+    def __init__(self, session: 'PtySession', on_output: Callable[[bytes], None],
+                 on_exit: Optional[Callable[[Optional[int]], None]] = None):
+        self.session = session
+        self.on_output = on_output
+        self.on_exit = on_exit
+        self._buffer = bytearray()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._exited = False
+        self._thread = threading.Thread(target=self._run, name='pty-listener', daemon=True)
+    
+    @property
+    def backlog(self) -> int:
+        return len(self._buffer)
+    
+    def feed(self, data: bytes) -> bool:
+        """Queue output; returns True once the backlog is over HIGH_WATER"""
+        with self._condition:
+            self._buffer += data
+            self._condition.notify()
+            return len(self._buffer) > HIGH_WATER
+    
+    def exited(self):
+        with self._condition:
+            self._exited = True
+            self._condition.notify()
+    
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._buffer and not self._exited and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                data = bytes(self._buffer)
+                self._buffer.clear()
+                exited = self._exited and not data
+            if data:
+                try:
+                    self.on_output(data)
+                except Exception:
+                    self.session.detach(self)
+                    return
+                self.session.drained(self)
+            if exited:
+                if self.on_exit is not None:
+                    try:
+                        self.on_exit(self.session.returncode)
+                    except Exception:
+                        pass
+                return
+
+class PtySession:
+    """A login shell attached to a pseudo-terminal
+    
+    The shell keeps running between commands and across reconnects, so its
+    cwd, environment and any full-screen program survive. Output is raw
+    bytes (escape sequences included) for a terminal emulator to render.
+    """
+    
+    def __init__(self, manager: 'PtyManager', session_id: str, cwd: str,
+                 cols: int = 80, rows: int = 24, shell: Optional[str] = None,
+                 env: Optional[Dict[str, str]] = None):
+        self.manager = manager
+        self.session_id = session_id
+        self.shell = shell or os.environ.get('SHELL') or '/bin/sh'
+        self.created_at = time.time()
+        self.returncode: Optional[int] = None
+        self.cols = cols
+        self.rows = rows
+        self._scrollback = bytearray()
+        self._listeners: List[PtyListener] = []
+        self._lock = threading.Lock()
+        self._paused = False
+        
+        master, slave = os.openpty()
+        try:
+            self._set_size(master, cols, rows)
+            child_env = dict(env if env is not None else os.environ)
+            child_env.setdefault('TERM', 'xterm-256color')
+            child_env['COLUMNS'] = str(cols)
+            child_env['LINES'] = str(rows)
+            self.proc = subprocess.Popen(
+                [self.shell, '-i'],
+                stdin=slave, stdout=slave, stderr=slave,
+                cwd=cwd, env=child_env,
+                start_new_session=True,
+                # Make the slave the controlling terminal of the new session
+                # so job control, ^C and SIGWINCH work
+                preexec_fn=lambda: fcntl.ioctl(0, termios.TIOCSCTTY, 0),
+                close_fds=True
+            )
+        except Exception:
+            os.close(master)
+            raise
+        finally:
+            os.close(slave)
+        os.set_blocking(master, False)
+        self.master_fd = master
+    
+    @staticmethod
+    def _set_size(fd: int, cols: int, rows: int):
+        fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack('HHHH', rows, cols, 0, 0))
+    
+    @property
+    def alive(self) -> bool:
+        return self.returncode is None
+    
+    def resize(self, cols: int, rows: int):
+        """Set the window size; the kernel signals SIGWINCH to the foreground job"""
+        cols = max(1, min(int(cols), 1000))
+        rows = max(1, min(int(rows), 1000))
+        if self.alive and (cols, rows) != (self.cols, self.rows):
+            self._set_size(self.master_fd, cols, rows)
+            self.cols, self.rows = cols, rows
+    
+    def write(self, data: bytes):
+        """Send keystrokes to the shell"""
+        if not self.alive:
+            return
+        view = memoryview(data)
+        while view:
+            try:
+                written = os.write(self.master_fd, view)
+            except BlockingIOError:
+                # The line discipline's input queue is full; wait for room
+                time.sleep(0.01)
+                continue
+            except OSError:
+                return
+            view = view[written:]
+    
+    def attach(self, on_output: Callable[[bytes], None],
+               on_exit: Optional[Callable[[Optional[int]], None]] = None,
+               replay: bool = True) -> PtyListener:
+        """Start delivering output to `on_output`, after the scrollback if `replay`"""
+        listener = PtyListener(self, on_output, on_exit)
+        with self._lock:
+            if replay and self._scrollback:
+                listener.feed(bytes(self._scrollback))
+            self._listeners.append(listener)
+            if not self.alive:
+                listener.exited()
+        listener._thread.start()
+        return listener
+    
+    def detach(self, listener: PtyListener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+        listener.close()
+        self.drained(listener)
+    
+    @property
+    def listener_count(self) -> int:
+        with self._lock:
+            return len(self._listeners)
+    
+    def _on_output(self, data: bytes):
+        """Called on the reader thread with bytes read from the master"""
+        with self._lock:
+            self._scrollback += data
+            if len(self._scrollback) > SCROLLBACK_BYTES:
+                del self._scrollback[:len(self._scrollback) - SCROLLBACK_BYTES]
+            listeners = list(self._listeners)
+        backed_up = False
+        for listener in listeners:
+            backed_up |= listener.feed(data)
+        if backed_up and not self._paused:
+            self._paused = True
+            self.manager._pause(self)
+    
+    def drained(self, listener: PtyListener):
+        """Resume reading once every listener is below LOW_WATER"""
+        if not self._paused:
+            return
+        with self._lock:
+            if any(l.backlog > LOW_WATER for l in self._listeners):
+                return
+        self._paused = False
+        self.manager._resume(self)
+    
+    def _on_eof(self):
+        """The shell exited (or closed the terminal)"""
+        try:
+            self.returncode = self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._kill()
+            self.returncode = self.proc.wait()
+        try:
+            os.close(self.master_fd)
+        except OSError:
+            pass
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener.exited()
+    
+    def _kill(self):
+        try:
+            os.killpg(self.proc.pid, signal.SIGHUP)
+        except (ProcessLookupError, PermissionError):
+            return
+        try:
+            self.proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+    
+    def close(self):
+        """Hang up the shell; listeners are told it exited"""
+        if self.alive:
+            self._kill()
+    
+    def to_dict(self) -> Dict:
+        return {
+            'pid': self.proc.pid,
+            'shell': self.shell,
+            'cols': self.cols,
+            'rows': self.rows,
+            'alive': self.alive,
+            'returncode': self.returncode,
+            'listeners': self.listener_count,
+            'created_at': self.created_at,
+        }
+
+class PtyManager:
+    """PTY sessions keyed by terminal session id, read by one selector thread
+    
+    All master descriptors are non-blocking and multiplexed with
+    `selectors`, so idle shells cost no threads. Sessions are created on
+    first use and live until their shell exits or `close()` is called
+    (e.g. when the terminal session is evicted).
+    """
+    
+    def __init__(self, max_sessions: int = 64, shell: Optional[str] = None):
+        self.max_sessions = max_sessions
+        self.shell = shell
+        self._sessions: Dict[str, PtySession] = {}
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        # Registration changes are made by the reader thread itself; other
+        # threads queue them and wake it through this pipe
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._changes: List = []
+        self._thread: Optional[threading.Thread] = None
+    
+    @staticmethod
+    def available() -> bool:
+        return termios is not None and hasattr(os, 'openpty')
+    
+    def get(self, session_id: str) -> Optional[PtySession]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+        return session if session is not None and session.alive else None
+    
+    def open(self, session_id: str, cwd: str, cols: int = 80, rows: int = 24) -> PtySession:
+        """Return the session's live PTY, starting a shell if there is none"""
+        if not self.available():
+            raise RuntimeError("Pseudo-terminals are not supported on this platform")
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and session.alive:
+                session.resize(cols, rows)
+                return session
+            if len([s for s in self._sessions.values() if s.alive]) >= self.max_sessions:
+                raise RuntimeError(f"Too many terminal shells (max {self.max_sessions})")
+            session = PtySession(self, session_id, cwd, cols=cols, rows=rows, shell=self.shell)
+            self._sessions[session_id] = session
+            self._ensure_thread()
+        self._queue('register', session)
+        return session
+    
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        session.close()
+        return True
+    
+    def close_all(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+    
+    def on_session_evicted(self, session_id: str, terminal=None):
+        """SessionManager eviction callback: hang up the evicted session's shell"""
+        self.close(session_id)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            'available': self.available(),
+            'sessions': sum(1 for s in sessions if s.alive),
+            'max_sessions': self.max_sessions,
+        }
+    
+    def _pause(self, session: PtySession):
+        self._queue('pause', session)
+    
+    def _resume(self, session: PtySession):
+        self._queue('resume', session)
+    
+    def _queue(self, action: str, session: PtySession):
+        with self._lock:
+            self._changes.append((action, session))
+        try:
+            os.write(self._wake_w, b'\0')
+        except BlockingIOError:
+            pass  # a wakeup is already pending
+    
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='pty-reader', daemon=True)
+            self._thread.start()
+    
+    def _apply_changes(self):
+        with self._lock:
+            changes, self._changes = self._changes, []
+        for action, session in changes:
+            if not session.alive:
+                continue
+            registered = session.master_fd in self._selector.get_map()
+            if action in ('register', 'resume') and not registered:
+                self._selector.register(session.master_fd, selectors.EVENT_READ, session)
+            elif action == 'pause' and registered:
+                self._selector.unregister(session.master_fd)
+    
+    def _run(self):
+        while True:
+            for key, _ in self._selector.select():
+                session = key.data
+                if session is None:
+                    try:
+                        while os.read(self._wake_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    self._apply_changes()
+                    continue
+                try:
+                    data = os.read(session.master_fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    # Linux reports EIO on the master once the slave side
+                    # has been closed by every process
+                    data = b''
+                if data:
+                    session._on_output(data)
+                    continue
+                self._selector.unregister(session.master_fd)
+                threading.Thread(target=session._on_eof, name='pty-reaper', daemon=True).start()
@@ -0,0 +1,250 @@
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Inherited listening socket for a graceful restart (see ProductionServer._reexec)
+LISTEN_FD_ENV = 'TERMINAL_LISTEN_FD'
+# Seconds clients are told to wait when the server turns them away
+RETRY_AFTER = 1
+
+def _busy_body(message: str) -> bytes:
+    # Same shape as main.busy_response
+    return json.dumps({'success': False, 'output': f'Error: {message}', 'type': 'busy'}).encode('utf-8')
+
+class _RequestHandler(WSGIRequestHandler):
+    # Idle keep-alive connections give their pool thread back after this
+    timeout = 15
+
+class ProductionServer(BaseWSGIServer):
+    """Werkzeug's HTTP server with a fixed worker thread pool and graceful stop
+    
+    Connections are handed to a pool of `threads` workers instead of one
+    new thread each, so load is bounded. At most `max_backlog` accepted
+    connections wait for a worker; beyond that new ones get a 503 with
+    Retry-After at once. Streaming responses (paths ending in `/stream`)
+    hold their worker while open, so at most `max_streams` of them run at
+    a time and the rest of the pool stays free for short requests.
+    SIGTERM/SIGINT stop accepting,
+    let in-flight requests finish (up to `drain_timeout` seconds) and run
+    `on_shutdown`. SIGHUP does the same and then re-executes the process,
+    passing the listening socket on so no connection is refused while the
+    new code loads.
+    
+    Everything runs in one process: sessions hold live shells, jobs and
+    file descriptors that cannot be shared between processes, so the
+    server scales with threads rather than forked workers.
+    """
+    
+    multithread = True
+    
+    def __init__(self, host: str, port: int, app, threads: int = 32,
+                 drain_timeout: float = 30.0, on_shutdown: Optional[Callable[[], None]] = None,
+                 max_backlog: int = 64, max_streams: Optional[int] = None):
+        fd = os.environ.pop(LISTEN_FD_ENV, None)
+        super().__init__(host, port, app, handler=_RequestHandler,
+                         fd=int(fd) if fd is not None else None)
+        if fd is not None:
+            os.close(int(fd))  # the server holds its own duplicate
+        self.app = self._limit_streams(app)
+        self.threads = threads
+        self.max_backlog = max_backlog
+        self.max_streams = max_streams if max_streams is not None else max(1, threads // 2)
+        self.drain_timeout = drain_timeout
+        self.on_shutdown = on_shutdown
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http-worker')
+        self._active = 0
+        self._streams = 0
+        self._active_lock = threading.Condition()
+        self._restart = False
+        self._stopping = False
+    
+    def process_request(self, request, client_address):
+        with self._active_lock:
+            overloaded = self._active >= self.threads + self.max_backlog
+            if not overloaded:
+                self._active += 1
+        if overloaded:
+            self._reject(request)
+            return
+        self._executor.submit(self._process, request, client_address)
+    
+    def _reject(self, request):
+        """Answer 503 from the accepting thread without queueing the connection"""
+        body = _busy_body('Server is overloaded, try again shortly')
+        try:
+            request.settimeout(0.1)
+            # Read what already arrived so closing does not reset the response
+            request.recv(65536)
+        except OSError:
+            pass
+        try:
+            request.sendall(
+                b'HTTP/1.1 503 Service Unavailable\r\n'
+                b'Content-Type: application/json\r\n'
+                + f'Retry-After: {RETRY_AFTER}\r\nContent-Length: {len(body)}\r\n'.encode('ascii')
+                + b'Connection: close\r\n\r\n' + body
+            )
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+    
+    def _limit_streams(self, app):
+        """Wrap `app` so at most `max_streams` streaming responses are open"""
+        def release():
+            with self._active_lock:
+                self._streams -= 1
+        
+        def limited(environ, start_response):
+            if not environ.get('PATH_INFO', '').endswith('/stream'):
+                return app(environ, start_response)
+            with self._active_lock:
+                admitted = self._streams < self.max_streams
+                if admitted:
+                    self._streams += 1
+            if not admitted:
+                body = _busy_body(f'Too many open streams (max {self.max_streams})')
+                start_response('503 Service Unavailable', [
+                    ('Content-Type', 'application/json'),
+                    ('Content-Length', str(len(body))),
+                    ('Retry-After', str(RETRY_AFTER)),
+                ])
+                return [body]
+            try:
+                return ClosingIterator(app(environ, start_response), release)
+            except BaseException:
+                release()
+                raise
+        return limited
+    
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._active_lock:
+                self._active -= 1
+                self._active_lock.notify_all()
+    
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: self.stop())
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.stop(restart=True))
+    
+    def stop(self, restart: bool = False):
+        """Stop accepting connections; safe to call from a signal handler"""
+        if self._stopping:
+            return
+        self._stopping = True
+        self._restart = restart
+        # shutdown() waits for serve_forever, which runs on this very thread
+        # when called from a signal handler, so it must run elsewhere
+        threading.Thread(target=self.shutdown, name='http-shutdown', daemon=True).start()
+    
+    def run(self):
+        """Serve until stopped, then drain and either exit or re-execute"""
+        try:
+            # BaseWSGIServer.serve_forever would close the socket on exit,
+            # which a restart needs to keep
+            super(BaseWSGIServer, self).serve_forever()
+        finally:
+            self._drain()
+            if self.on_shutdown is not None:
+                self.on_shutdown()
+        if self._restart:
+            self._reexec()
+        self.server_close()
+    
+    def _drain(self):
+        deadline = time.monotonic() + self.drain_timeout
+        with self._active_lock:
+            while self._active and time.monotonic() < deadline:
+                self._active_lock.wait(deadline - time.monotonic())
+            remaining = self._active
+        if remaining:
+            # Long-lived streams (SSE) never finish on their own
+            print(f" * {remaining} request(s) still open after {self.drain_timeout:.0f}s; closing",
+                  file=sys.stderr)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _reexec(self):
+        fd = self.socket.fileno()
+        os.set_inheritable(fd, True)
+        os.environ[LISTEN_FD_ENV] = str(fd)
+        print(" * Restarting", file=sys.stderr)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+
+_instance_lock = None
+
+def acquire_instance_lock(path: str, wait: float = 0.0):
+    """Refuse to start a second server process against the same state
+    
+    Sessions, shells and jobs live in process memory, and the history log
+    is compacted in place, so two processes (e.g. several gunicorn
+    workers) would each see different sessions and corrupt the log. Run
+    one process and scale with threads instead. `wait` allows for an
+    overlapping restart, where the old process is still draining.
+    """
+    global _instance_lock
+    if fcntl is None or _instance_lock is not None:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock = open(path, 'a')
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            break
+        except BlockingIOError:
+            if time.monotonic() < deadline:
+                time.sleep(0.1)
+                continue
+        lock.close()
+        raise RuntimeError(
+            f"Another terminal server process holds {path}. Terminal state is per process: "
+            "run a single worker (e.g. gunicorn --workers 1 --threads 32)."
+        )
+    _instance_lock = lock
+
+def serve(app, host: str = '0.0.0.0', port: int = 5000, threads: int = 32,
+          drain_timeout: float = 30.0, static_max_age: int = 3600, max_backlog: int = 64,
+          max_streams: Optional[int] = None):
+    """Run `app` with production settings until SIGTERM/SIGINT (SIGHUP restarts)"""
+    from . import main
+    
+    acquire_instance_lock(main.instance_lock_path)
+    app.debug = False
+    app.config['TEMPLATES_AUTO_RELOAD'] = False
+    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = static_max_age
+    
+    server = ProductionServer(host, port, app, threads=threads, drain_timeout=drain_timeout,
+                              on_shutdown=main.shutdown, max_backlog=max_backlog,
+                              max_streams=max_streams)
+    server.install_signal_handlers()
+    if main.websocket_server is not None:
+        main.websocket_server.start()
+    if main.async_server is not None:
+        main.async_server.start()
+    display_host = socket.gethostname() if host in ('0.0.0.0', '::') else host
+    print(f" * Serving on http://{display_host}:{server.port} ({threads} threads, pid {os.getpid()})",
+          file=sys.stderr)
+    server.run()
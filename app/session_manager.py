@@ -0,0 +1,124 @@
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from .terminal import PythonTerminal
+
+class SessionManager:
+    """Hand out one PythonTerminal per browser session
+    
+    Sessions are kept in least-recently-used order. Sessions idle for longer
+    than `idle_timeout` seconds are evicted on access, and the oldest session
+    is evicted whenever more than `max_sessions` are live.
+    """
+    
+    def __init__(self, system_monitor=None, max_sessions: int = 256,
+                 idle_timeout: float = 30 * 60, file_index=None, history=None,
+                 governor=None):
+        self.system_monitor = system_monitor
+        self.file_index = file_index
+        # Shared CommandHistory; each terminal records into it under its id
+        self.history = history
+        # Shared ExecutionGovernor limiting spawned commands across sessions
+        self.governor = governor
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: "OrderedDict[str, PythonTerminal]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        # Callbacks run with (session_id, terminal) when a session is evicted
+        self.eviction_callbacks: List[Callable[[str, PythonTerminal], None]] = []
+    
+    def new_session_id(self) -> str:
+        """Generate an identifier for a new session"""
+        return uuid.uuid4().hex
+    
+    def get_terminal(self, session_id: str) -> PythonTerminal:
+        """Return the terminal for a session, creating it if needed"""
+        now = time.monotonic()
+        evicted = []
+        with self._lock:
+            terminal = self._sessions.get(session_id)
+            if terminal is None:
+                terminal = PythonTerminal(system_monitor=self.system_monitor,
+                                          file_index=self.file_index,
+                                          history=self.history,
+                                          session_id=session_id,
+                                          governor=self.governor)
+                self._sessions[session_id] = terminal
+            else:
+                self._sessions.move_to_end(session_id)
+            self._last_access[session_id] = now
+            evicted = self._evict_locked(now)
+        self._run_eviction_callbacks(evicted)
+        return terminal
+    
+    def peek(self, session_id: str) -> Optional[PythonTerminal]:
+        """Return an existing session's terminal without touching its LRU slot"""
+        with self._lock:
+            return self._sessions.get(session_id)
+    
+    def close_session(self, session_id: str) -> bool:
+        """Explicitly discard a session"""
+        with self._lock:
+            terminal = self._sessions.pop(session_id, None)
+            self._last_access.pop(session_id, None)
+        if terminal is None:
+            return False
+        self._run_eviction_callbacks([(session_id, terminal)])
+        return True
+    
+    def evict_idle(self) -> int:
+        """Evict idle sessions now; returns the number evicted"""
+        with self._lock:
+            evicted = self._evict_locked(time.monotonic())
+        self._run_eviction_callbacks(evicted)
+        return len(evicted)
+    
+    def _evict_locked(self, now: float):
+        """Drop idle and over-capacity sessions (oldest first); caller holds the lock"""
+        evicted = []
+        while self._sessions:
+            oldest_id = next(iter(self._sessions))
+            idle = now - self._last_access[oldest_id] > self.idle_timeout
+            if not idle and len(self._sessions) <= self.max_sessions:
+                break
+            evicted.append((oldest_id, self._sessions.pop(oldest_id)))
+            del self._last_access[oldest_id]
+        return evicted
+    
+    def _run_eviction_callbacks(self, evicted):
+        for session_id, terminal in evicted:
+            for callback in self.eviction_callbacks:
+                try:
+                    callback(session_id, terminal)
+                except Exception:
+                    pass
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+    
+    def stats(self) -> Dict:
+        """Session counts and an estimate of the memory held by session state"""
+        with self._lock:
+            terminals = list(self._sessions.values())
+        return {
+            'active_sessions': len(terminals),
+            'max_sessions': self.max_sessions,
+            'idle_timeout': self.idle_timeout,
+            'approx_bytes': sum(self._estimate_size(t) for t in terminals),
+        }
+    
+    def _estimate_size(self, terminal: PythonTerminal) -> int:
+        """Approximate bytes held by a terminal's per-session state"""
+        size = sys.getsizeof(terminal.current_directory)
+        size += sys.getsizeof(terminal.command_history)
+        for entry in terminal.command_history:
+            size += sys.getsizeof(entry) + sys.getsizeof(entry['command'])
+        size += sys.getsizeof(terminal.environment)
+        for key, value in terminal.environment.items():
+            size += sys.getsizeof(key) + sys.getsizeof(value)
+        return size
@@ -0,0 +1,167 @@
+import codecs
+import json
+import os
+import signal
+import subprocess
+import threading
+from typing import Any, Optional
+
+# Headers that keep proxies (and the dev server) from buffering event streams
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',
+}
+# A child whose output reached EOF gets this long to exit before it is killed
+EXIT_GRACE = 1.0
+
+def sse_event(data: Any, event: Optional[str] = None) -> str:
+    """Format a payload as a single Server-Sent Events message"""
+    payload = data if isinstance(data, str) else json.dumps(data)
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    for line in payload.splitlines() or ['']:
+        lines.append(f"data: {line}")
+    return '\n'.join(lines) + '\n\n'
+
+def sse_comment(text: str = 'keepalive') -> str:
+    """Format an SSE comment line, used as a keepalive"""
+    return f": {text}\n\n"
+
+class ProcessOutputStream:
+    """Iterate over a child process's combined stdout/stderr as text chunks
+    
+    Output is read straight from the pipe in chunks of at most `chunk_size`
+    bytes and handed to the consumer as soon as it is available. Nothing is
+    read ahead of the consumer, so a slow client applies backpressure: the
+    pipe fills up and the child blocks on write. Once `max_bytes` have been
+    produced (or `timeout` seconds have passed) the process is killed.
+    """
+    
+    def __init__(self, proc, max_bytes: Optional[int] = None,
+                 chunk_size: int = 64 * 1024, timeout: Optional[float] = None):
+        self.proc = proc
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.bytes_read = 0
+        self.truncated = False
+        self.timed_out = False
+        self.returncode: Optional[int] = None
+        self._timer = None
+        self._eof = False
+    
+    def __iter__(self):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        fd = self.proc.stdout.fileno()
+        if self.timeout is not None:
+            self._timer = threading.Timer(self.timeout, self._on_timeout)
+            self._timer.daemon = True
+            self._timer.start()
+        try:
+            while True:
+                chunk = os.read(fd, self.chunk_size)
+                if not chunk:
+                    self._eof = True
+                    break
+                if self.max_bytes is not None and self.bytes_read + len(chunk) > self.max_bytes:
+                    chunk = chunk[:self.max_bytes - self.bytes_read]
+                    self.truncated = True
+                self.bytes_read += len(chunk)
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+                if self.truncated:
+                    break
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+        finally:
+            self.close()
+        if self.truncated:
+            yield f"\nError: Output truncated after {self.bytes_read} bytes"
+        elif self.timed_out:
+            yield "\nError: Command timed out"
+    
+    def _on_timeout(self):
+        """Timer callback: kill a process that exceeded its time budget"""
+        if self.proc.poll() is None:
+            self.timed_out = True
+            kill_process_tree(self.proc)
+    
+    def kill(self):
+        """Kill the process from another thread; iteration then ends"""
+        if self.proc.poll() is None:
+            kill_process_tree(self.proc)
+    
+    def close(self):
+        """Stop the process (if still running) and release the pipe
+        
+        After EOF the child is usually exiting but not yet reaped, so it
+        gets EXIT_GRACE seconds first; it is killed at once only when the
+        consumer stopped early.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._eof and self.proc.poll() is None:
+            try:
+                self.proc.wait(timeout=EXIT_GRACE)
+            except subprocess.TimeoutExpired:
+                pass
+        if self.proc.poll() is None:
+            kill_process_tree(self.proc)
+        self.proc.stdout.close()
+        self.returncode = self.proc.wait()
+
+class CompletionStream:
+    """Wrap an output stream and report its exit status once it ends
+    
+    `on_complete(returncode)` is called exactly once, when the stream is
+    exhausted or closed. Streams from built-in commands have no
+    `returncode`; their status is 1 when the output starts with "Error"
+    and 0 otherwise.
+    """
+    
+    def __init__(self, stream, on_complete):
+        self.stream = stream
+        self.on_complete = on_complete
+        self._first_chunk = None
+        self._done = False
+    
+    def __iter__(self):
+        try:
+            for chunk in self.stream:
+                if self._first_chunk is None and chunk:
+                    self._first_chunk = chunk
+                yield chunk
+        finally:
+            self.close()
+    
+    @property
+    def returncode(self) -> Optional[int]:
+        if hasattr(self.stream, 'returncode'):
+            return self.stream.returncode
+        return 1 if self._first_chunk and self._first_chunk.startswith('Error') else 0
+    
+    def kill(self):
+        kill = getattr(self.stream, 'kill', None)
+        if kill is not None:
+            kill()
+    
+    def close(self):
+        close = getattr(self.stream, 'close', None)
+        if close is not None:
+            close()
+        if not self._done:
+            self._done = True
+            self.on_complete(self.returncode)
+
+def kill_process_tree(proc):
+    """Kill a child started with start_new_session, including its children"""
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
@@ -1,35 +1,306 @@
+import asyncio
+import atexit
+import threading
+import time
+import weakref
 import psutil
 import platform
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional
+from .instrumentation import instrumentation
+from .process_table import ProcessTable
+
+# Every monitor, stopped together at exit by a single atexit hook; held
+# weakly so monitors that are dropped can still be collected
+_monitors: "weakref.WeakSet[SystemMonitor]" = weakref.WeakSet()
+_shared_monitor: Optional['SystemMonitor'] = None
+_shared_lock = threading.Lock()
+
+def shared_monitor() -> 'SystemMonitor':
+    """The process-wide default monitor, for terminals not given one"""
+    global _shared_monitor
+    with _shared_lock:
+        if _shared_monitor is None:
+            _shared_monitor = SystemMonitor()
+        return _shared_monitor
+
+def _stop_all():
+    for monitor in list(_monitors):
+        monitor.stop()
+
+atexit.register(_stop_all)
+
+class MetricsSubscription:
+    """A single consumer of metric deltas pushed by the shared sampler"""
+    
+    def __init__(self, fields: Optional[Iterable[str]] = None, interval: float = 1.0):
+        self.fields = set(fields) if fields else None
+        self.interval = interval
+        self._condition = threading.Condition()
+        # Only the newest snapshot is kept: a slow consumer skips intermediate
+        # ticks instead of accumulating a backlog.
+        self._pending: Optional[Dict] = None
+        self._last_sent: Dict = {}
+        self._last_sent_at = 0.0
+        self.closed = False
+        # Set while a coroutine waits in next_delta_async
+        self._wake = None
+    
+    def offer(self, snapshot: Dict):
+        """Called by the sampler with each new snapshot"""
+        with self._condition:
+            self._pending = snapshot
+            self._condition.notify()
+            if self._wake is not None:
+                self._wake()
+    
+    def close(self):
+        """Wake any waiting consumer and mark the subscription finished"""
+        with self._condition:
+            self.closed = True
+            self._condition.notify()
+            if self._wake is not None:
+                self._wake()
+    
+    def next_delta(self, timeout: float = 15.0) -> Optional[Dict]:
+        """Wait for the next delta; returns None on timeout or close"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                delta, wait_for = self._poll(deadline)
+                if wait_for is None:
+                    return delta
+                self._condition.wait(wait_for)
+    
+    async def next_delta_async(self, timeout: float = 15.0) -> Optional[Dict]:
+        """next_delta() for coroutines: waits on the event loop, not a thread"""
+        loop = asyncio.get_running_loop()
+        woken = asyncio.Event()
+        self._wake = lambda: loop.call_soon_threadsafe(woken.set)
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                with self._condition:
+                    woken.clear()
+                    delta, wait_for = self._poll(deadline)
+                if wait_for is None:
+                    return delta
+                try:
+                    await asyncio.wait_for(woken.wait(), wait_for)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._wake = None
+    
+    def _poll(self, deadline: float):
+        """(delta, None) when done, else (None, seconds to wait); holds the condition"""
+        if self.closed:
+            return None, None
+        wait_for = deadline - time.monotonic()
+        while self._pending is not None:
+            # Respect the subscriber's rate by holding the pending
+            # snapshot until its interval has elapsed
+            wait_for = min(wait_for, self._last_sent_at + self.interval - time.monotonic())
+            if wait_for > 0:
+                break
+            delta = self._build_delta(self._pending)
+            self._pending = None
+            if delta:
+                return delta, None
+            wait_for = deadline - time.monotonic()
+        if deadline - time.monotonic() <= 0:
+            return None, None
+        return None, max(wait_for, 0.01)
+    
+    def _build_delta(self, snapshot: Dict) -> Dict:
+        """Return the selected fields whose values changed since the last send"""
+        self._last_sent_at = time.monotonic()
+        delta = {}
+        for key, value in snapshot.items():
+            if key == 'timestamp' or (self.fields is not None and key not in self.fields):
+                continue
+            if self._last_sent.get(key) != value:
+                delta[key] = value
+                self._last_sent[key] = value
+        if delta:
+            delta['timestamp'] = snapshot['timestamp']
+        return delta
 
 class SystemMonitor:
     """Monitor system resources and processes"""
     
-    def __init__(self):
-        pass
+    def __init__(self, sample_interval: float = 1.0, max_staleness: float = 5.0,
+                 disk_path: str = '/'):
+        # The background sampler refreshes the snapshot every `sample_interval`
+        # seconds; readers accept a snapshot up to `max_staleness` seconds old
+        # before falling back to an inline (non-blocking) sample.
+        self.sample_interval = sample_interval
+        self.max_staleness = max_staleness
+        self.disk_path = disk_path
+        # Shared by ps, top, kill and the /processes API
+        self.process_table = ProcessTable()
+        
+        self._snapshot: Optional[Dict] = None
+        self._snapshot_lock = threading.Lock()
+        self._sampler_thread: Optional[threading.Thread] = None
+        self._sampler_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._subscribers: List[MetricsSubscription] = []
+        self._subscribers_lock = threading.Lock()
+        # Callables invoked with every new snapshot (e.g. MetricsHistory.record)
+        self._listeners: List = []
+        _monitors.add(self)
+    
+    def start(self):
+        """Start the background sampler thread if it is not already running"""
+        with self._sampler_lock:
+            if self._sampler_thread is not None and self._sampler_thread.is_alive():
+                return
+            self._stop_event.clear()
+            # Prime psutil's CPU counters so the first sample has a baseline
+            psutil.cpu_percent(interval=None)
+            self._sampler_thread = threading.Thread(
+                target=self._run_sampler,
+                name='system-monitor-sampler',
+                daemon=True
+            )
+            self._sampler_thread.start()
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the background sampler and wait for it to exit"""
+        with self._sampler_lock:
+            thread = self._sampler_thread
+            self._sampler_thread = None
+        self._stop_event.set()
+        with self._subscribers_lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for subscription in subscribers:
+            subscription.close()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout if timeout is not None else self.sample_interval + 1)
+    
+    def _run_sampler(self):
+        """Refresh the snapshot at a fixed cadence until stopped"""
+        while not self._stop_event.wait(self.sample_interval):
+            try:
+                self._take_snapshot()
+            except Exception:
+                # Keep the last good snapshot; readers will see it age out
+                pass
+    
+    def _take_snapshot(self) -> Dict:
+        """Collect a fresh snapshot and publish it to readers"""
+        with instrumentation.stage('monitor.sample'):
+            snapshot = self._sample()
+        with self._snapshot_lock:
+            self._snapshot = snapshot
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(snapshot)
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception:
+                pass
+        return snapshot
+    
+    def _sample(self) -> Dict:
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        return {
+            'timestamp': time.time(),
+            'cpu_count': psutil.cpu_count(),
+            # Non-blocking: utilisation since the previous call
+            'cpu_percent': psutil.cpu_percent(interval=None),
+            'memory_total': memory.total,
+            'memory_used': memory.used,
+            'memory_available': memory.available,
+            'memory_percent': memory.percent,
+            'disk_total': disk.total,
+            'disk_used': disk.used,
+            'disk_free': disk.free,
+            'disk_percent': disk.percent,
+            'boot_time': psutil.boot_time(),
+        }
+    
+    def add_listener(self, callback):
+        """Call `callback(snapshot)` for every snapshot the sampler takes"""
+        self._listeners.append(callback)
+    
+    def subscribe(self, fields: Optional[Iterable[str]] = None,
+                  interval: Optional[float] = None) -> MetricsSubscription:
+        """Register a consumer that receives deltas from the shared sampler"""
+        self.start()
+        # Consumers can slow down but never outpace the sampler itself
+        interval = max(interval or self.sample_interval, self.sample_interval)
+        subscription = MetricsSubscription(fields=fields, interval=interval)
+        with self._snapshot_lock:
+            snapshot = self._snapshot
+        if snapshot is not None:
+            subscription.offer(snapshot)
+        with self._subscribers_lock:
+            self._subscribers.append(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription: MetricsSubscription):
+        """Remove a consumer registered with subscribe()"""
+        with self._subscribers_lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+        subscription.close()
+    
+    def get_snapshot(self, max_age: Optional[float] = None) -> Dict:
+        """Return the latest metrics snapshot, sampling inline only if it is stale"""
+        self.start()
+        max_age = self.max_staleness if max_age is None else max_age
+        with self._snapshot_lock:
+            snapshot = self._snapshot
+        if snapshot is None or time.time() - snapshot['timestamp'] > max_age:
+            snapshot = self._take_snapshot()
+        return dict(snapshot)
+    
+    async def get_snapshot_async(self, executor=None, max_age: Optional[float] = None) -> Dict:
+        """get_snapshot() for coroutines; a stale snapshot is resampled on `executor`"""
+        self.start()
+        max_age = self.max_staleness if max_age is None else max_age
+        with self._snapshot_lock:
+            snapshot = self._snapshot
+        if snapshot is None or time.time() - snapshot['timestamp'] > max_age:
+            snapshot = await asyncio.get_running_loop().run_in_executor(executor, self._take_snapshot)
+        return dict(snapshot)
     
     def get_system_info(self) -> Dict:
         """Get basic system information"""
         try:
-            return {
-                'platform': platform.system(),
-                'platform_release': platform.release(),
-                'platform_version': platform.version(),
-                'architecture': platform.machine(),
-                'processor': platform.processor(),
-                'cpu_count': psutil.cpu_count(),
-                'cpu_percent': psutil.cpu_percent(interval=1),
-                'memory_percent': psutil.virtual_memory().percent,
-            }
+            return self._system_info(self.get_snapshot())
+        except Exception as e:
+            return {'error': str(e), 'cpu_percent': 0, 'memory_percent': 0}
+    
+    async def get_system_info_async(self, executor=None) -> Dict:
+        """get_system_info() for coroutines"""
+        try:
+            return self._system_info(await self.get_snapshot_async(executor))
         except Exception as e:
             return {'error': str(e), 'cpu_percent': 0, 'memory_percent': 0}
     
+    def _system_info(self, snapshot: Dict) -> Dict:
+        return {
+            'platform': platform.system(),
+            'platform_release': platform.release(),
+            'platform_version': platform.version(),
+            'architecture': platform.machine(),
+            'processor': platform.processor(),
+            'cpu_count': snapshot['cpu_count'],
+            'cpu_percent': snapshot['cpu_percent'],
+            'memory_percent': snapshot['memory_percent'],
+            'timestamp': snapshot['timestamp'],
+        }
+    
     def get_detailed_system_info(self) -> str:
         """Get detailed system information as formatted string"""
         try:
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
+            snapshot = self.get_snapshot()
             
             return f"""System Information:
 ===================
@@ -37,20 +308,20 @@ class SystemMonitor:
 Platform: {platform.system()} {platform.release()}
 Architecture: {platform.machine()}
 Processor: {platform.processor()}
-CPU Cores: {psutil.cpu_count()}
-CPU Usage: {psutil.cpu_percent(interval=1)}%
+CPU Cores: {snapshot['cpu_count']}
+CPU Usage: {snapshot['cpu_percent']}%
 
 Memory:
-  Total: {self._format_bytes(memory.total)}
-  Used: {self._format_bytes(memory.used)} ({memory.percent:.1f}%)
-  Available: {self._format_bytes(memory.available)}
+  Total: {self._format_bytes(snapshot['memory_total'])}
+  Used: {self._format_bytes(snapshot['memory_used'])} ({snapshot['memory_percent']:.1f}%)
+  Available: {self._format_bytes(snapshot['memory_available'])}
 
 Disk:
-  Total: {self._format_bytes(disk.total)}
-  Used: {self._format_bytes(disk.used)} ({disk.percent:.1f}%)
-  Free: {self._format_bytes(disk.free)}
+  Total: {self._format_bytes(snapshot['disk_total'])}
+  Used: {self._format_bytes(snapshot['disk_used'])} ({snapshot['disk_percent']:.1f}%)
+  Free: {self._format_bytes(snapshot['disk_free'])}
 
-Boot Time: {datetime.fromtimestamp(psutil.boot_time()).strftime('%Y-%m-%d %H:%M:%S')}
+Boot Time: {datetime.fromtimestamp(snapshot['boot_time']).strftime('%Y-%m-%d %H:%M:%S')}
 """
         except Exception as e:
             return f"Error: {str(e)}"
@@ -58,26 +329,12 @@ Boot Time: {datetime.fromtimestamp(psutil.boot_time()).strftime('%Y-%m-%d %H:%M:
     def get_process_list(self) -> str:
         """Get list of running processes"""
         try:
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-                try:
-                    processes.append({
-                        'pid': proc.info['pid'],
-                        'name': proc.info['name'][:20],
-                        'cpu': proc.info['cpu_percent'] or 0.0,
-                        'memory': proc.info['memory_percent'] or 0.0
-                    })
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-            
-            processes.sort(key=lambda x: x['cpu'], reverse=True)
-            
             header = f"{'PID':<8} {'NAME':<20} {'CPU%':<8} {'MEM%':<8}"
             separator = "-" * 50
             lines = [header, separator]
             
-            for proc in processes[:20]:
-                line = f"{proc['pid']:<8} {proc['name']:<20} {proc['cpu']:<8.1f} {proc['memory']:<8.1f}"
+            for proc in self.process_table.query(sort='cpu', limit=20):
+                line = f"{proc['pid']:<8} {proc['name'][:20]:<20} {proc['cpu']:<8.1f} {proc['memory']:<8.1f}"
                 lines.append(line)
             
             return '\n'.join(lines)
@@ -88,26 +345,12 @@ Boot Time: {datetime.fromtimestamp(psutil.boot_time()).strftime('%Y-%m-%d %H:%M:
     def get_top_processes(self) -> str:
         """Get top processes by CPU usage"""
         try:
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-                try:
-                    processes.append({
-                        'pid': proc.info['pid'],
-                        'name': proc.info['name'][:15],
-                        'cpu': proc.info['cpu_percent'] or 0.0,
-                        'memory': proc.info['memory_percent'] or 0.0
-                    })
-                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                    pass
-            
-            processes.sort(key=lambda x: x['cpu'], reverse=True)
-            
             header = f"{'PID':<8} {'CPU%':<8} {'MEM%':<8} {'COMMAND':<15}"
             separator = "-" * 45
             lines = [header, separator]
             
-            for proc in processes[:15]:
-                line = f"{proc['pid']:<8} {proc['cpu']:<8.1f} {proc['memory']:<8.1f} {proc['name']:<15}"
+            for proc in self.process_table.query(sort='cpu', limit=15):
+                line = f"{proc['pid']:<8} {proc['cpu']:<8.1f} {proc['memory']:<8.1f} {proc['name'][:15]:<15}"
                 lines.append(line)
             
             return '\n'.join(lines)
@@ -2,108 +2,318 @@ import os
 import subprocess
 import platform
 import shlex
+import shutil
+import time
+from collections import deque
 from datetime import datetime
-from .system_monitor import SystemMonitor
+from .system_monitor import shared_monitor
+from .governor import GovernorBusy
+from .streaming import CompletionStream, ProcessOutputStream, kill_process_tree
+from .file_operations import FileOperation
+from .file_search import ParallelFileFinder, parse_age, parse_size
+from .grep_engine import GrepEngine
+from . import file_reader
+from .directory_listing import format_entries, list_directory
+from .commands import Command, CommandRegistry
+from .pipeline import FILTER_ARGS, Pipeline, filter_command, needs_shell, parse as parse_pipeline
+from .history import format_entry
+from .instrumentation import instrumentation
+
+# Commands kept in each terminal's own (per-session) history
+HISTORY_SIZE = 100
+
+# Entries shown per `ls` call before a continuation cursor is offered
+LS_PAGE_SIZE = 1000
+
+# Worker threads per cp/mv/rm (per-file copies and unlinks run in parallel)
+FILE_OPERATION_WORKERS = 8
+
+# Limits for streamed command output (see stream_command)
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_MAX_OUTPUT_BYTES = 64 * 1024 * 1024
+# Data the built-in stages of one pipeline may read (files and pipes)
+PIPELINE_MAX_INPUT_BYTES = 256 * 1024 * 1024
 
 class PythonTerminal:
     """Main terminal class that handles command execution"""
     
-    def __init__(self):
-        self.current_directory = os.getcwd()
-        self.command_history = []
-        self.system_monitor = SystemMonitor()
-        self.supported_commands = {
-            'ls', 'dir', 'cd', 'pwd', 'mkdir', 'rmdir', 'rm', 'cp', 'mv',
-            'cat', 'echo', 'touch', 'find', 'grep', 'ps', 'kill', 'top',
-            'whoami', 'date', 'clear', 'help', 'history', 'sysinfo'
-        }
+    def __init__(self, system_monitor=None, current_directory=None, file_index=None,
+                 registry=None, history=None, session_id=None, governor=None):
+        # Per-terminal state: the process-wide cwd is never changed, so
+        # several terminals can be used concurrently from different threads
+        self.current_directory = current_directory or os.getcwd()
+        # This session's recent commands; `history` is the optional shared,
+        # persistent CommandHistory that every finished command is added to
+        self.command_history = deque(maxlen=HISTORY_SIZE)
+        self.history = history
+        self.session_id = session_id
+        if history is not None and session_id is not None:
+            self.command_history.extend(history.recent(session_id, HISTORY_SIZE))
+        # Environment overrides applied to spawned system commands
+        self.environment = {}
+        # The app passes its monitor in; otherwise every terminal shares one
+        # process-wide monitor and its single background sampler
+        self.system_monitor = system_monitor or shared_monitor()
+        # Optional persistent FileIndex used to answer find without a walk
+        self.file_index = file_index
+        # Command dispatch table; built-ins plus lazily loaded plugins
+        self.registry = registry or default_registry
+        # Optional ExecutionGovernor: admission control, rlimits and
+        # timeouts for every command that spawns processes
+        self.governor = governor
+    
+    @property
+    def supported_commands(self):
+        """Names the registry can dispatch, including unloaded plugins"""
+        return set(self.registry.names())
     
     def execute_command(self, command):
         """Execute a given command and return the output"""
+        # Log command to history; status and duration are filled in below
+        entry = self._add_to_history(command)
+        exit_status = 1
         try:
-            # Log command to history
-            self._add_to_history(command)
-            
-            # Parse command
-            if not command.strip():
-                return "Error: Empty command"
-            
-            parts = shlex.split(command.strip())
-            cmd = parts[0].lower()
-            args = parts[1:] if len(parts) > 1 else []
-            
-            # Handle built-in commands
-            if cmd in ['ls', 'dir']:
-                return self._list_directory(args)
-            elif cmd == 'cd':
-                return self._change_directory(args)
-            elif cmd == 'pwd':
-                return self.current_directory
-            elif cmd == 'mkdir':
-                return self._make_directory(args)
-            elif cmd in ['rmdir', 'rm']:
-                return self._remove_path(args)
-            elif cmd == 'cp':
-                return self._copy_file(args)
-            elif cmd == 'mv':
-                return self._move_file(args)
-            elif cmd == 'cat':
-                return self._read_file(args)
-            elif cmd == 'echo':
-                return ' '.join(args)
-            elif cmd == 'touch':
-                return self._create_file(args)
-            elif cmd == 'find':
-                return self._find_files(args)
-            elif cmd == 'grep':
-                return self._grep_content(args)
-            elif cmd == 'ps':
-                return self.system_monitor.get_process_list()
-            elif cmd == 'kill':
-                return self._kill_process(args)
-            elif cmd == 'top':
-                return self.system_monitor.get_top_processes()
-            elif cmd == 'whoami':
-                return os.getlogin() if hasattr(os, 'getlogin') else 'user'
-            elif cmd == 'date':
-                return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            elif cmd == 'clear':
-                return '\033[2J\033[H'  # ANSI clear screen
-            elif cmd == 'help':
-                return self._show_help()
-            elif cmd == 'history':
-                return self._show_history()
-            elif cmd == 'sysinfo':
-                return self.system_monitor.get_detailed_system_info()
-            else:
-                # Try to execute as system command
-                return self._execute_system_command(command)
-                
+            output, exit_status = self._dispatch(command)
+            return output
+        except GovernorBusy:
+            raise
         except Exception as e:
+            instrumentation.count_error('execute')
             return f"Error: {str(e)}"
+        finally:
+            self._finish_history(entry, exit_status)
+            if instrumentation.enabled:
+                instrumentation.observe_command(self._command_label(command), entry['duration'],
+                                                exit_status == 0)
+    
+    def _command_label(self, command):
+        """Bounded metric label for a command line: the built-in's name or a kind"""
+        words = command.split(None, 1)
+        if not words:
+            return 'empty'
+        if needs_shell(command) or any(op in command for op in '|<>'):
+            return 'shell'
+        handler = self.registry.get(words[0].lower())
+        return handler.name if handler is not None else 'external'
+    
+    def _dispatch(self, command):
+        """Run a command, returning (output, exit status)"""
+        # Parse command
+        if not command.strip():
+            return "Error: Empty command", 1
+        
+        spec = parse_pipeline(command)
+        if spec is not None:
+            # Built-in stages run on this thread, so every pipeline is bounded
+            pipeline = Pipeline(self, spec, max_bytes=STREAM_MAX_OUTPUT_BYTES,
+                                timeout=self._command_timeout(command),
+                                max_input_bytes=PIPELINE_MAX_INPUT_BYTES)
+            slot = None
+            if pipeline.spawns_processes:
+                slot = self._acquire_slot()
+            try:
+                output = pipeline.read()
+            finally:
+                if slot is not None:
+                    slot.release()
+            return (output if output else "Command executed successfully"), pipeline.returncode
+        if needs_shell(command):
+            return self._execute_system_command(command)
+        
+        parts = shlex.split(command.strip())
+        handler = self._builtin_for(parts)
+        if handler is None:
+            # Try to execute as system command
+            return self._execute_system_command(command)
+        return handler.execute(self, parts[1:])
+    
+    def _builtin_for(self, parts):
+        """The registered command that runs `parts`, or None for a system command
+        
+        Like a pipeline stage, a built-in with a `parse` check hands
+        arguments it does not implement (`sort -k2`, `head -c 100`) to the
+        installed program of the same name.
+        """
+        handler = self.registry.get(parts[0].lower())
+        if handler is not None and handler.parse is not None and handler.validate(parts[1:]) is None \
+                and handler.argument_error(self, parts[1:]) is not None and self._find_program(parts[0]):
+            return None
+        return handler
+    
+    def stream_command(self, command, max_output_bytes=STREAM_MAX_OUTPUT_BYTES,
+                       timeout=None, background=False):
+        """Execute a command, returning an iterable of output chunks
+        
+        Pipelines (`|`, `<`, `>`, `>>`) run in-process, see app/pipeline.py.
+        System commands are streamed from their pipes as output is produced;
+        built-in commands stream through their registered `stream` handler
+        or yield their complete output as a single chunk.
+        The returned iterable exposes `returncode` once exhausted.
+        
+        Spawning commands take an execution slot from the governor and,
+        unless `timeout` is given, are stopped after its stream timeout.
+        `background` commands skip admission control and the default
+        timeout: their caller bounds them, as the job pool does.
+        """
+        entry = self._add_to_history(command)
+        try:
+            stream = self._open_stream(command, max_output_bytes, timeout, background)
+        except GovernorBusy:
+            self._finish_history(entry, 1)
+            raise
+        except Exception as e:
+            stream = iter([f"Error: {str(e)}"])
+        return CompletionStream(stream, lambda status: self._finish_history(entry, status))
+    
+    def _open_stream(self, command, max_output_bytes, timeout, background=False):
+        if timeout is None and not background:
+            timeout = self._stream_timeout(command)
+        spec = parse_pipeline(command)
+        if spec is not None:
+            pipeline = Pipeline(self, spec, max_bytes=max_output_bytes,
+                                chunk_size=STREAM_CHUNK_SIZE, timeout=timeout,
+                                max_input_bytes=PIPELINE_MAX_INPUT_BYTES)
+            if not pipeline.spawns_processes or background:
+                return pipeline
+            return self._governed(pipeline, self._acquire_slot())
+        
+        parts = shlex.split(command.strip())
+        if not parts:
+            return iter(["Error: Empty command"])
+        
+        handler = None if needs_shell(command) else self._builtin_for(parts)
+        if handler is not None:
+            return handler.run_stream(self, parts[1:])
+        
+        slot = None if background else self._acquire_slot()
+        try:
+            proc = self._spawn_system_command(command)
+        except Exception:
+            if slot is not None:
+                slot.release()
+            raise
+        return self._governed(ProcessOutputStream(
+            proc,
+            max_bytes=max_output_bytes,
+            chunk_size=STREAM_CHUNK_SIZE,
+            timeout=timeout
+        ), slot)
+    
+    def _acquire_slot(self):
+        """Wait for an execution slot (None when no governor is configured)"""
+        if self.governor is None:
+            return None
+        return self.governor.acquire(self.session_id)
+    
+    def _governed(self, stream, slot):
+        """Hold `slot` until `stream` is closed"""
+        if slot is None:
+            return stream
+        return CompletionStream(stream, lambda status: slot.release())
+    
+    def _command_timeout(self, command):
+        return self.governor.timeout_for(command) if self.governor is not None else 30
+    
+    def _stream_timeout(self, command):
+        """Timeout for a streamed command (None without a governor)"""
+        return self.governor.timeout_for(command, streaming=True) if self.governor is not None else None
+    
+    def _limited(self, argv):
+        """`argv` wrapped so the child applies the governor's resource limits"""
+        return self.governor.wrap_argv(argv) if self.governor is not None else argv
+    
+    def _shell_args(self, command):
+        """Popen arguments running `command` under the shell with the limits applied"""
+        if os.name != 'posix':
+            return {'args': command, 'shell': True}
+        return {'args': self._limited(['/bin/sh', '-c', command])}
+    
+    def _spawn_system_command(self, command):
+        """Start a system command with its combined output on a pipe"""
+        return subprocess.Popen(
+            **self._shell_args(command),
+            cwd=self.current_directory,
+            env=self._command_environment(),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+            # Own process group so the whole pipeline can be killed at once
+            start_new_session=(os.name == 'posix')
+        )
     
     def _list_directory(self, args):
-        """List directory contents"""
+        """List directory contents
+        
+        Usage: ls [-l] [-a] [-h] [-r] [-S|-t|-U] [--sort KEY] [--limit N]
+                  [--cursor C] [path]
+        """
         try:
-            path = args[0] if args else self.current_directory
+            flags, options, positional, base_args = self._parse_ls_args(args)
+            sort = options.get('sort', 'type')
+            if 'S' in flags:
+                sort = 'size'
+            elif 't' in flags:
+                sort = 'mtime'
+            elif 'U' in flags:
+                sort = 'none'
+            limit = int(options.get('limit', LS_PAGE_SIZE))
+            
+            path = self._resolve_path(positional[0]) if positional else self.current_directory
             if not os.path.exists(path):
                 return f"Error: Path '{path}' does not exist"
             
-            items = []
-            for item in os.listdir(path):
-                item_path = os.path.join(path, item)
-                if os.path.isdir(item_path):
-                    items.append(f"[DIR]  {item}")
-                else:
-                    size = os.path.getsize(item_path)
-                    items.append(f"[FILE] {item} ({size} bytes)")
-            
-            return '\n'.join(sorted(items))
+            entries, next_cursor, total = list_directory(
+                path,
+                show_hidden='a' in flags,
+                sort=sort,
+                reverse='r' in flags,
+                cursor=options.get('cursor'),
+                limit=limit
+            )
+            lines = format_entries(entries, long='l' in flags, human='h' in flags)
+            if next_cursor is not None:
+                shown = f" of {total}" if total is not None else ""
+                lines.append(f"-- showing {len(entries)} entries{shown}; continue with: "
+                             f"ls {' '.join(base_args + ['--limit', str(limit), '--cursor', next_cursor])} --")
+            return '\n'.join(lines)
         except PermissionError:
             return "Error: Permission denied"
         except Exception as e:
             return f"Error: {str(e)}"
     
+    def _parse_ls_args(self, args):
+        """Split ls arguments into flags, --options, positionals and hint arguments"""
+        flags = set()
+        options = {}
+        positional = []
+        # Arguments echoed back in the continuation hint (minus paging)
+        base_args = []
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            if arg in ('--sort', '--limit', '--cursor'):
+                if i + 1 >= len(args):
+                    raise ValueError(f"Option {arg} requires a value")
+                options[arg[2:]] = args[i + 1]
+                if arg == '--sort':
+                    base_args.extend(args[i:i + 2])
+                i += 2
+                continue
+            if arg.startswith('-') and len(arg) > 1:
+                flags.update(arg[1:])
+            else:
+                positional.append(arg)
+            base_args.append(arg)
+            i += 1
+        
+        unknown = flags - set('lahrStU')
+        if unknown:
+            raise ValueError(f"Unknown option -{''.join(sorted(unknown))}")
+        if len(positional) > 1:
+            raise ValueError("Only one path is supported")
+        return flags, options, positional, base_args
+    
     def _change_directory(self, args):
         """Change current directory"""
         try:
@@ -124,7 +334,6 @@ class PythonTerminal:
                 return f"Error: '{new_path}' is not a directory"
             
             self.current_directory = new_path
-            os.chdir(self.current_directory)
             return f"Changed directory to: {self.current_directory}"
         
         except PermissionError:
@@ -134,9 +343,6 @@ class PythonTerminal:
     
     def _make_directory(self, args):
         """Create a new directory"""
-        if not args:
-            return "Error: Directory name required"
-        
         try:
             dir_path = args[0]
             if not os.path.isabs(dir_path):
@@ -153,104 +359,238 @@ class PythonTerminal:
             return f"Error: {str(e)}"
     
     def _remove_path(self, args):
-        """Remove file or directory"""
-        if not args:
-            return "Error: Path required"
-        
+        """Remove files or directory trees (rm [-r] [-f] <path>...)"""
+        return self._run_file_operation('remove', args)
+    
+    def _copy_file(self, args):
+        """Copy files or directory trees (cp [-r] <src>... <dst>)"""
+        return self._run_file_operation('copy', args)
+    
+    def _move_file(self, args):
+        """Move/rename files or directory trees (mv <src>... <dst>)"""
+        return self._run_file_operation('move', args)
+    
+    def _run_file_operation(self, kind, args):
+        """Run to completion; returns (summary, exit status)"""
         try:
-            target_path = args[0]
-            if not os.path.isabs(target_path):
-                target_path = os.path.join(self.current_directory, target_path)
-            
-            if not os.path.exists(target_path):
-                return f"Error: Path '{target_path}' does not exist"
-            
-            if os.path.isdir(target_path):
-                os.rmdir(target_path)
-                return f"Directory removed: {target_path}"
+            operation = self._file_operation(kind, args)
+        except ValueError as e:
+            return f"Error: {str(e)}", 1
+        return operation.run(), operation.returncode
+    
+    def _stream_file_operation(self, kind, args):
+        """The operation itself is the stream: progress lines, then the summary"""
+        try:
+            return self._file_operation(kind, args)
+        except ValueError as e:
+            return iter([f"Error: {str(e)}"])
+    
+    def _file_operation(self, kind, args):
+        """Build a FileOperation from cp/mv/rm arguments"""
+        flags = set()
+        paths = []
+        options_done = False
+        for arg in args:
+            if arg == '--' and not options_done:
+                options_done = True
+            elif arg.startswith('-') and len(arg) > 1 and not options_done:
+                flags.update(arg[1:])
             else:
-                os.remove(target_path)
-                return f"File removed: {target_path}"
-        
-        except OSError as e:
-            return f"Error: {str(e)}"
+                paths.append(self._resolve_path(arg))
+        # -f is accepted for cp/mv, which always overwrite
+        unknown = flags - {'copy': set('rRaf'), 'move': set('f'), 'remove': set('rRf')}[kind]
+        if unknown:
+            raise ValueError(f"Unknown option -{''.join(sorted(unknown))}")
+        recursive = bool(flags & set('rRa'))
+        if kind == 'remove':
+            if not paths:
+                raise ValueError("Path required")
+            return FileOperation('remove', paths, recursive=recursive, force='f' in flags,
+                                 workers=FILE_OPERATION_WORKERS)
+        if len(paths) < 2:
+            raise ValueError("Source and destination required")
+        return FileOperation(kind, paths[:-1], paths[-1], recursive=recursive,
+                             workers=FILE_OPERATION_WORKERS)
     
-    def _copy_file(self, args):
-        """Copy file from source to destination"""
-        if len(args) < 2:
-            return "Error: Source and destination required"
+    def _read_file(self, args):
+        """Read and display file contents, one page at a time
         
+        Usage: cat [--offset BYTES] [--lines START[:COUNT]] [--max-bytes N] <file>...
+        Output is capped at --max-bytes (default 1 MiB); when the file is
+        longer a continuation hint with the next offset is appended.
+        Several files are concatenated within the same cap.
+        """
+        file_path = args[-1]
         try:
-            import shutil
-            src, dst = args[0], args[1]
+            options, paths = self._parse_cat_args(args)
+            max_bytes = int(options.get('--max-bytes', file_reader.DEFAULT_MAX_BYTES))
+            if len(paths) > 1:
+                if set(options) - {'--max-bytes'}:
+                    return "Error: --offset and --lines take a single file"
+                parts = []
+                for index, name in enumerate(paths):
+                    file_path = self._resolve_path(name)
+                    page = file_reader.read_range(file_path, 0, max_bytes=max_bytes)
+                    parts.append(page['text'])
+                    max_bytes -= page['next_offset']
+                    if not page['eof'] or (max_bytes <= 0 and index + 1 < len(paths)):
+                        rest = ' '.join(paths[index + 1:])
+                        hint = f"cat --offset {page['next_offset']} {name}" if not page['eof'] else ''
+                        if rest:
+                            hint = f"{hint}; cat {rest}" if hint else f"cat {rest}"
+                        parts.append(f"\n-- output capped; continue with: {hint} --")
+                        break
+                return ''.join(parts) or "(empty file)"
+            file_path = self._resolve_path(paths[0])
             
-            if not os.path.isabs(src):
-                src = os.path.join(self.current_directory, src)
-            if not os.path.isabs(dst):
-                dst = os.path.join(self.current_directory, dst)
+            if '--lines' in options:
+                start, _, count = options['--lines'].partition(':')
+                page = file_reader.read_lines(file_path, int(start), int(count) if count else None,
+                                              max_bytes=max_bytes)
+            else:
+                page = file_reader.read_range(file_path, int(options.get('--offset', 0)),
+                                              max_bytes=max_bytes)
             
-            shutil.copy2(src, dst)
-            return f"Copied '{src}' to '{dst}'"
+            if page['size'] == 0:
+                return "(empty file)"
+            content = page['text']
+            if not page['eof']:
+                content += (f"\n-- showing bytes {page['offset']}-{page['next_offset']} of {page['size']}; "
+                            f"continue with: cat --offset {page['next_offset']} {paths[0]} --")
+            return content
         
         except FileNotFoundError:
-            return f"Error: Source file '{src}' not found"
+            return f"Error: File '{file_path}' not found"
         except PermissionError:
             return "Error: Permission denied"
+        except UnicodeDecodeError:
+            return "Error: Cannot read binary file"
         except Exception as e:
             return f"Error: {str(e)}"
     
-    def _move_file(self, args):
-        """Move/rename file"""
-        if len(args) < 2:
-            return "Error: Source and destination required"
-        
+    def _parse_cat_args(self, args):
+        """Split cat arguments into paging options and file names"""
+        options = {}
+        paths = []
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            if arg in ('--offset', '--lines', '--max-bytes'):
+                if i + 1 >= len(args):
+                    raise ValueError(f"Option {arg} requires a value")
+                options[arg] = args[i + 1]
+                i += 2
+                continue
+            if arg.startswith('-') and len(arg) > 1:
+                raise ValueError(f"Unknown option {arg}")
+            paths.append(arg)
+            i += 1
+        if not paths:
+            raise ValueError("Filename required")
+        return options, paths
+    
+    def _head_file(self, args):
+        """Show the first lines of a file: head [-n N] <file>"""
+        return self._read_lines_command(args, tail=False)
+    
+    def _tail_file(self, args):
+        """Show the last lines of a file: tail [-n N|+N] <file> (+N: from line N on)"""
+        if '-f' in args:
+            return "Error: tail -f needs a streaming connection (/execute/stream)"
+        return self._read_lines_command(args, tail=True)
+    
+    def _read_lines_command(self, args, tail):
+        file_path = args[-1]
         try:
-            import shutil
-            src, dst = args[0], args[1]
-            
-            if not os.path.isabs(src):
-                src = os.path.join(self.current_directory, src)
-            if not os.path.isabs(dst):
-                dst = os.path.join(self.current_directory, dst)
-            
-            shutil.move(src, dst)
-            return f"Moved '{src}' to '{dst}'"
+            count, from_start, max_bytes, file_path = self._parse_lines_args(args)
+            file_path = self._resolve_path(file_path)
+            if tail and from_start:
+                page = file_reader.read_lines(file_path, count, max_bytes=max_bytes)
+            elif tail:
+                page = file_reader.tail_lines(file_path, count, max_bytes=max_bytes)
+            else:
+                page = file_reader.read_lines(file_path, 1, count, max_bytes=max_bytes)
+            return page['text'].rstrip('\n') if page['text'] else "(empty file)"
         
         except FileNotFoundError:
-            return f"Error: Source '{src}' not found"
+            return f"Error: File '{file_path}' not found"
         except PermissionError:
             return "Error: Permission denied"
+        except UnicodeDecodeError:
+            return "Error: Cannot read binary file"
         except Exception as e:
             return f"Error: {str(e)}"
     
-    def _read_file(self, args):
-        """Read and display file contents"""
+    def _parse_lines_args(self, args, allowed=('-n', '--max-bytes')):
+        """Parse `head`/`tail [-n N] [--max-bytes N] <file>`
+        
+        Returns (count, from_start, max_bytes, file); `from_start` is set
+        for `-n +N`, which tail reads as "from line N on". Negative counts
+        (`head -n -N`: all but the last N) are not implemented and raise
+        ValueError, like pipeline._split_count.
+        """
+        if not args:
+            raise ValueError("Filename required")
+        options = self._parse_read_options(args[:-1], allowed)
+        value = options.get('-n', '10')
+        count = int(value)
+        if count < 0:
+            raise ValueError(f"Unsupported count {value}")
+        max_bytes = int(options.get('--max-bytes', file_reader.DEFAULT_MAX_BYTES))
+        return count, value.startswith('+'), max_bytes, args[-1]
+    
+    def _follow_file(self, args):
+        """Stream the last lines of a file and then anything appended to it"""
         if not args:
-            return "Error: Filename required"
+            yield "Error: Filename required"
+            return
         
+        file_path = args[-1]
         try:
-            file_path = args[0]
-            if not os.path.isabs(file_path):
-                file_path = os.path.join(self.current_directory, file_path)
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                return content if content else "(empty file)"
-        
+            count, from_start, _, file_path = self._parse_lines_args(args, ('-n',))
+            file_path = self._resolve_path(file_path)
+            if from_start:
+                # follow() picks up from where this page stops, even if it is cut short
+                page = file_reader.read_lines(file_path, count)
+            else:
+                page = file_reader.tail_lines(file_path, count)
         except FileNotFoundError:
-            return f"Error: File '{file_path}' not found"
-        except PermissionError:
-            return "Error: Permission denied"
+            yield f"Error: File '{file_path}' not found"
+            return
         except UnicodeDecodeError:
-            return "Error: Cannot read binary file"
+            yield "Error: Cannot read binary file"
+            return
         except Exception as e:
-            return f"Error: {str(e)}"
+            yield f"Error: {str(e)}"
+            return
+        
+        if page['text']:
+            yield page['text']
+        yield from file_reader.follow(file_path, page['next_offset'])
+    
+    def _parse_read_options(self, args, allowed):
+        """Parse `--option value` pairs (also `-n5` / `-5` for line counts)"""
+        options = {}
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            if arg.startswith('-n') and len(arg) > 2 and '-n' in allowed:
+                options['-n'] = arg[2:]
+                i += 1
+            elif arg.startswith('-') and arg[1:].isdigit() and '-n' in allowed:
+                options['-n'] = arg[1:]
+                i += 1
+            elif arg in allowed:
+                if i + 1 >= len(args):
+                    raise ValueError(f"Option {arg} requires a value")
+                options[arg] = args[i + 1]
+                i += 2
+            else:
+                raise ValueError(f"Unknown option {arg}")
+        return options
     
     def _create_file(self, args):
         """Create empty file"""
-        if not args:
-            return "Error: Filename required"
-        
         try:
             file_path = args[0]
             if not os.path.isabs(file_path):
@@ -267,56 +607,210 @@ class PythonTerminal:
     
     def _find_files(self, args):
         """Find files matching pattern"""
-        if not args:
-            return "Error: Search pattern required"
-        
         try:
-            import fnmatch
-            pattern = args[0]
-            search_path = args[1] if len(args) > 1 else self.current_directory
-            
-            matches = []
-            for root, dirs, files in os.walk(search_path):
-                for filename in fnmatch.filter(files, pattern):
-                    matches.append(os.path.join(root, filename))
-            
+            finder, search_path, max_results = self._parse_find_args(args)
+            matches = [
+                path
+                for batch in self._find_batches(finder, search_path, max_results)
+                for path in batch
+            ]
             return '\n'.join(matches) if matches else "No files found"
         
         except Exception as e:
             return f"Error: {str(e)}"
     
+    def _stream_find(self, args):
+        """Yield find results in batches as the parallel walk produces them"""
+        try:
+            finder, search_path, max_results = self._parse_find_args(args)
+            found = False
+            for batch in self._find_batches(finder, search_path, max_results):
+                if batch:
+                    found = True
+                    yield '\n'.join(batch) + '\n'
+            if not found:
+                yield "No files found"
+        
+        except Exception as e:
+            yield f"Error: {str(e)}"
+    
+    def _find_batches(self, finder, search_path, max_results):
+        """Answer from the file index when it covers the path, else walk live"""
+        if self.file_index is not None and self.file_index.covers(search_path):
+            # Pick up changes since the last background refresh, such as a
+            # file this terminal just created
+            self.file_index.refresh(search_path)
+            return self.file_index.search(finder, search_path, max_results=max_results)
+        return finder.iter_batches(search_path, max_results=max_results)
+    
+    def _reindex(self, args):
+        """Rebuild the file index for a path (default: all indexed roots)"""
+        if self.file_index is None:
+            return "Error: File index is not configured (set TERMINAL_INDEX_ROOTS)"
+        
+        try:
+            path = self._resolve_path(args[0]) if args else None
+            if path is not None and not os.path.isdir(path):
+                return f"Error: Directory '{path}' does not exist"
+            if path is not None and not any(
+                    path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+                    for root in self.file_index.roots):
+                return f"Error: '{path}' is not under an indexed root"
+            count = self.file_index.reindex(path)
+            return f"Indexed {count} files under {path or ', '.join(self.file_index.roots)}"
+        
+        except Exception as e:
+            return f"Error: {str(e)}"
+    
+    def _parse_find_args(self, args):
+        """Parse `find <pattern> [path] [options]` into a finder, root and limit
+        
+        Options: --max-results N, --max-depth N, --exclude DIR (repeatable),
+        --min-size SIZE, --max-size SIZE, --newer-than AGE, --older-than AGE
+        """
+        options = {'exclude': []}
+        positional = []
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            if arg.startswith('--'):
+                if i + 1 >= len(args):
+                    raise ValueError(f"Option {arg} requires a value")
+                value = args[i + 1]
+                if arg == '--exclude':
+                    options['exclude'].append(value)
+                elif arg in ('--max-results', '--max-depth'):
+                    options[arg[2:].replace('-', '_')] = int(value)
+                elif arg in ('--min-size', '--max-size'):
+                    options[arg[2:].replace('-', '_')] = parse_size(value)
+                elif arg in ('--newer-than', '--older-than'):
+                    options[arg[2:].replace('-', '_')] = parse_age(value)
+                else:
+                    raise ValueError(f"Unknown option {arg}")
+                i += 2
+            elif arg.startswith('-') and len(arg) > 1:
+                raise ValueError(f"Unknown option {arg}")
+            else:
+                positional.append(arg)
+                i += 1
+        
+        if not positional:
+            raise ValueError("Search pattern required")
+        if len(positional) > 2:
+            raise ValueError("Too many arguments")
+        
+        pattern = positional[0]
+        search_path = self._resolve_path(positional[1]) if len(positional) > 1 else self.current_directory
+        max_results = options.pop('max_results', None)
+        return ParallelFileFinder(pattern, **options), search_path, max_results
+    
     def _grep_content(self, args):
         """Search for text in files"""
-        if len(args) < 2:
-            return "Error: Pattern and filename required"
-        
         try:
-            pattern, filename = args[0], args[1]
-            if not os.path.isabs(filename):
-                filename = os.path.join(self.current_directory, filename)
-            
-            matches = []
-            with open(filename, 'r', encoding='utf-8') as f:
-                for line_num, line in enumerate(f, 1):
-                    if pattern.lower() in line.lower():
-                        matches.append(f"{line_num}: {line.strip()}")
-            
-            return '\n'.join(matches) if matches else "No matches found"
+            lines = []
+            for chunk in self._iter_grep(args):
+                lines.extend(chunk)
+            return '\n'.join(lines) if lines else "No matches found"
         
-        except FileNotFoundError:
-            return f"Error: File '{filename}' not found"
         except Exception as e:
             return f"Error: {str(e)}"
     
+    def _stream_grep(self, args):
+        """Yield grep results file by file as the search progresses"""
+        try:
+            found = False
+            for chunk in self._iter_grep(args):
+                found = True
+                yield '\n'.join(chunk) + '\n'
+            if not found:
+                yield "No matches found"
+        
+        except Exception as e:
+            yield f"Error: {str(e)}"
+    
+    def _iter_grep(self, args):
+        """Run grep and yield formatted output lines, one list per file
+        
+        Usage: grep [options] <pattern> <file|dir|glob>...
+        Matching is case-insensitive fixed-string by default.
+        Options: -E (regex), -F (fixed string), -i (ignore case),
+        -s/--case-sensitive, -r/-R (recurse into directories),
+        -m N (max matches per file), --include GLOB, --exclude-dir DIR
+        """
+        options, recursive, positional, _ = self._parse_grep_args(args)
+        if len(positional) < 2:
+            raise ValueError("Pattern and filename required")
+        
+        engine = GrepEngine(positional[0], **options)
+        targets = [self._resolve_path(path) for path in positional[1:]]
+        # Keep the original "N: line" format for a single plain file
+        with_names = recursive or len(targets) > 1 or any(glob_chars in path
+                                                          for path in targets
+                                                          for glob_chars in '*?[')
+        
+        for path, matches in engine.search(engine.expand_paths(targets, recursive=recursive)):
+            if with_names:
+                yield [f"{path}:{line_num}: {line.strip()}" for line_num, line in matches]
+            else:
+                yield [f"{line_num}: {line.strip()}" for line_num, line in matches]
+        
+        if engine.errors:
+            yield engine.errors
+    
+    def _parse_grep_args(self, args):
+        """Split grep arguments into GrepEngine options, -r, positionals and -n"""
+        options = {'regex': False, 'ignore_case': True, 'max_count': None,
+                   'include': None, 'exclude_dirs': []}
+        recursive = False
+        line_numbers = False
+        positional = []
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            if arg in ('-m', '--max-count', '--include', '--exclude-dir'):
+                if i + 1 >= len(args):
+                    raise ValueError(f"Option {arg} requires a value")
+                value = args[i + 1]
+                if arg == '--include':
+                    options['include'] = value
+                elif arg == '--exclude-dir':
+                    options['exclude_dirs'].append(value)
+                else:
+                    options['max_count'] = int(value)
+                i += 2
+                continue
+            if arg == '--case-sensitive':
+                options['ignore_case'] = False
+            elif arg.startswith('-') and len(arg) > 1 and not positional:
+                for flag in arg[1:]:
+                    if flag == 'E':
+                        options['regex'] = True
+                    elif flag == 'F':
+                        options['regex'] = False
+                    elif flag == 'i':
+                        options['ignore_case'] = True
+                    elif flag == 's':
+                        options['ignore_case'] = False
+                    elif flag in ('r', 'R'):
+                        recursive = True
+                    elif flag == 'n':
+                        # Accepted for compatibility: numbers are always shown
+                        line_numbers = True
+                    else:
+                        raise ValueError(f"Unknown option -{flag}")
+            else:
+                positional.append(arg)
+            i += 1
+        
+        return options, recursive, positional, line_numbers
+    
     def _kill_process(self, args):
         """Kill process by PID"""
-        if not args:
-            return "Error: Process ID required"
-        
         try:
             pid = int(args[0])
             import signal
             os.kill(pid, signal.SIGTERM)
+            self.system_monitor.process_table.invalidate(pid)
             return f"Process {pid} terminated"
         
         except ValueError:
@@ -329,27 +823,75 @@ class PythonTerminal:
             return f"Error: {str(e)}"
     
     def _execute_system_command(self, command):
-        """Execute system command as fallback"""
+        """Execute system command as fallback; returns (output, exit status)"""
+        # Raises GovernorBusy when the server is saturated
+        slot = self._acquire_slot()
         try:
-            result = subprocess.run(
-                command,
-                shell=True,
-                cwd=self.current_directory,
-                capture_output=True,
-                text=True,
-                timeout=30  # 30 second timeout
-            )
+            with instrumentation.stage('spawn'):
+                proc = subprocess.Popen(
+                    **self._shell_args(command),
+                    cwd=self.current_directory,
+                    env=self._command_environment(),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    start_new_session=(os.name == 'posix')
+                )
+            with instrumentation.stage('subprocess'):
+                try:
+                    stdout, stderr = proc.communicate(timeout=self._command_timeout(command))
+                except subprocess.TimeoutExpired:
+                    # Kill the whole group, not just the shell
+                    kill_process_tree(proc)
+                    proc.communicate()
+                    raise
             
-            output = result.stdout.strip()
-            if result.stderr:
-                output += f"\nError: {result.stderr.strip()}"
+            output = stdout.strip()
+            if stderr:
+                output += f"\nError: {stderr.strip()}"
             
-            return output if output else "Command executed successfully"
+            return (output if output else "Command executed successfully"), proc.returncode
         
         except subprocess.TimeoutExpired:
-            return "Error: Command timed out"
+            instrumentation.count_error('subprocess')
+            return "Error: Command timed out", 124
         except Exception as e:
-            return f"Error: {str(e)}"
+            return f"Error: {str(e)}", 1
+        finally:
+            if slot is not None:
+                slot.release()
+    
+    def _export_variable(self, args):
+        """Set environment variables for subsequent system commands"""
+        if not args:
+            return '\n'.join(f"{key}={value}" for key, value in sorted(self.environment.items())) \
+                or "No exported variables"
+        
+        for assignment in args:
+            if '=' not in assignment:
+                return f"Error: Invalid assignment '{assignment}', expected NAME=value"
+            key, value = assignment.split('=', 1)
+            self.environment[key] = value
+        return f"Exported: {', '.join(a.split('=', 1)[0] for a in args)}"
+    
+    def _resolve_path(self, path):
+        """Resolve a user-supplied path relative to the terminal's directory"""
+        path = os.path.expanduser(path)
+        if not os.path.isabs(path):
+            path = os.path.join(self.current_directory, path)
+        return os.path.normpath(path)
+    
+    def _find_program(self, name):
+        """Path of `name` on the PATH spawned commands get, or None"""
+        return shutil.which(name, path=(self._command_environment() or os.environ).get('PATH', os.defpath))
+    
+    def _command_environment(self):
+        """Environment for spawned system commands"""
+        if not self.environment:
+            return None
+        env = os.environ.copy()
+        env.update(self.environment)
+        return env
     
     def _show_help(self):
         """Show available commands"""
@@ -357,17 +899,35 @@ class PythonTerminal:
 Available Commands:
 
 File Operations:
-  ls/dir [path]     - List directory contents
+  ls/dir [-l] [-a] [-h] [-r] [-S|-t|-U] [--limit N] [--cursor C] [path]
+                    - List directory contents (paged)
   cd [path]         - Change directory
   pwd               - Show current directory
   mkdir <name>      - Create directory
-  rm/rmdir <path>   - Remove file/directory
-  cp <src> <dst>    - Copy file
-  mv <src> <dst>    - Move/rename file
-  cat <file>        - Display file contents
+  rm/rmdir [-r] [-f] <path>...
+                    - Remove files/directories (-r: whole trees)
+  cp [-r] <src>... <dst>
+                    - Copy files/directories (-r: whole trees)
+  mv <src>... <dst> - Move/rename files or trees (also across filesystems)
+  cat [--offset N] [--lines START[:COUNT]] <file>...
+                    - Display/concatenate files (paged, 1 MiB per call)
+  head [-n N] <file> - Show the first lines of a file
+  tail [-n N|+N] [-f] <file> - Show the last lines (+N: from line N; -f follows when streaming)
   touch <file>      - Create empty file
-  find <pattern>    - Find files matching pattern
-  grep <text> <file> - Search text in file
+  find <pattern> [path] [--max-results N] [--max-depth N] [--exclude DIR]
+       [--min-size SIZE] [--max-size SIZE] [--newer-than AGE] [--older-than AGE]
+                    - Find files matching pattern
+  grep [-E|-F] [-i|-s] [-r] [-m N] <text> <file|dir|glob>...
+                    - Search text in files
+  reindex [path]    - Rebuild the file index used by find
+  wc [-l|-w|-c] <file>     - Count lines, words and bytes
+  sort [-r] [-n] [-u] <file> - Sort lines
+  uniq [-c] [-d] [-u] <file> - Collapse adjacent duplicate lines
+
+Pipelines:
+  cmd | cmd ...     - Chain commands (built-ins run in-process, lazily)
+  cmd < file        - Read the first command's input from a file
+  cmd > file        - Write output to a file (>> appends)
 
 System Operations:
   ps                - List processes
@@ -382,12 +942,16 @@ Utility:
   clear             - Clear screen
   help              - Show this help
   history           - Command history
+  export NAME=value - Set environment variable
 
 AI Commands (Natural Language):
   "create a folder called test"
   "show me all Python files"
   "find files containing 'hello'"
         """
+        plugins = self.registry.plugin_names()
+        if plugins:
+            help_text = help_text.rstrip() + "\n\nPlugins:\n  " + ', '.join(plugins)
         return help_text.strip()
     
     def _show_history(self):
@@ -396,29 +960,125 @@ AI Commands (Natural Language):
             return "No commands in history"
         
         history_lines = []
-        for i, entry in enumerate(self.command_history[-20:], 1):  # Last 20 commands
-            timestamp = entry['timestamp'].strftime('%H:%M:%S')
-            history_lines.append(f"{i:2d}. [{timestamp}] {entry['command']}")
+        start = max(0, len(self.command_history) - 20)  # Last 20 commands
+        for i in range(start, len(self.command_history)):
+            entry = self.command_history[i]
+            timestamp = datetime.fromtimestamp(entry['timestamp']).strftime('%H:%M:%S')
+            history_lines.append(f"{i - start + 1:2d}. [{timestamp}] {entry['command']}")
         
         return '\n'.join(history_lines)
     
     def _add_to_history(self, command):
-        """Add command to history"""
-        self.command_history.append({
+        """Add command to history (the deque drops the oldest entry itself)"""
+        entry = {
             'command': command,
-            'timestamp': datetime.now()
-        })
-        
-        # Keep only last 100 commands
-        if len(self.command_history) > 100:
-            self.command_history = self.command_history[-100:]
+            'timestamp': time.time(),
+            'session': self.session_id,
+            'exit_status': None,
+            'duration': None,
+        }
+        self.command_history.append(entry)
+        return entry
+    
+    def _finish_history(self, entry, exit_status):
+        """Record a command's exit status and duration, then persist it"""
+        entry['exit_status'] = exit_status
+        entry['duration'] = round(time.time() - entry['timestamp'], 6)
+        if self.history is not None:
+            self.history.record(entry)
     
     def get_command_history(self):
         """Get command history for API"""
-        return [
-            {
-                'command': entry['command'],
-                'timestamp': entry['timestamp'].isoformat()
-            }
-            for entry in self.command_history[-50:]  # Last 50 commands
-        ]
\ No newline at end of file
+        start = max(0, len(self.command_history) - 50)  # Last 50 commands
+        return [format_entry(self.command_history[i])
+                for i in range(start, len(self.command_history))]
+    
+    def search_history(self, prefix='', q='', scope='session', limit=50):
+        """Newest-first distinct commands matching a prefix and/or substring
+        
+        `scope` is 'session' (this terminal) or 'global' (every session,
+        needs the shared CommandHistory).
+        """
+        if self.history is not None and (scope == 'global' or self.session_id is not None):
+            session_id = self.session_id if scope == 'session' else None
+            return [format_entry(entry) for entry in
+                    self.history.search(prefix, q, session_id=session_id, limit=limit)]
+        found, seen = [], set()
+        for entry in reversed(self.command_history):
+            command = entry['command']
+            if command not in seen and command.startswith(prefix) and q in command:
+                seen.add(command)
+                found.append(format_entry(entry))
+                if len(found) >= limit:
+                    break
+        return found
+
+def _stream_tail(terminal, args):
+    """`tail -f` follows the file when streaming; plain tail is one chunk"""
+    if '-f' in args:
+        return terminal._follow_file([arg for arg in args if arg != '-f'])
+    return iter([terminal._tail_file(args)])
+
+# Built-in commands. Looked up by name in O(1); the registry falls back to
+# `python_terminal.commands` entry points for names not listed here.
+default_registry = CommandRegistry()
+for _command in (
+    Command('ls', PythonTerminal._list_directory, aliases=('dir',),
+            usage='ls [-l] [-a] [-h] [-r] [-S|-t|-U] [--limit N] [--cursor C] [path]',
+            parse=PythonTerminal._parse_ls_args),
+    Command('cd', PythonTerminal._change_directory, max_args=1, usage='cd [path]'),
+    Command('pwd', lambda terminal, args: terminal.current_directory, usage='pwd'),
+    Command('mkdir', PythonTerminal._make_directory, min_args=1,
+            missing='Directory name required', usage='mkdir <name>'),
+    Command('rm', PythonTerminal._remove_path, aliases=('rmdir',), min_args=1,
+            missing='Path required', usage='rm [-r] [-f] <path>...',
+            stream=lambda terminal, args: terminal._stream_file_operation('remove', args)),
+    Command('cp', PythonTerminal._copy_file, min_args=2,
+            missing='Source and destination required', usage='cp [-r] <src>... <dst>',
+            stream=lambda terminal, args: terminal._stream_file_operation('copy', args)),
+    Command('mv', PythonTerminal._move_file, min_args=2,
+            missing='Source and destination required', usage='mv <src>... <dst>',
+            stream=lambda terminal, args: terminal._stream_file_operation('move', args)),
+    Command('cat', PythonTerminal._read_file, min_args=1, missing='Filename required',
+            usage='cat [--offset N] [--lines START[:COUNT]] [--max-bytes N] <file>...',
+            parse=PythonTerminal._parse_cat_args),
+    Command('head', PythonTerminal._head_file, min_args=1, missing='Filename required',
+            usage='head [-n N] <file>', parse=PythonTerminal._parse_lines_args),
+    Command('tail', PythonTerminal._tail_file, min_args=1, missing='Filename required',
+            usage='tail [-n N|+N] [-f] <file>', stream=_stream_tail,
+            parse=lambda terminal, args: terminal._parse_lines_args([arg for arg in args if arg != '-f'])),
+    Command('echo', lambda terminal, args: ' '.join(args), usage='echo <text>'),
+    Command('touch', PythonTerminal._create_file, min_args=1, missing='Filename required',
+            usage='touch <file>'),
+    Command('find', PythonTerminal._find_files, min_args=1, missing='Search pattern required',
+            usage='find <pattern> [path] [options]', stream=PythonTerminal._stream_find),
+    Command('grep', PythonTerminal._grep_content, min_args=2,
+            missing='Pattern and filename required',
+            usage='grep [options] <pattern> <file|dir|glob>...',
+            stream=PythonTerminal._stream_grep),
+    Command('ps', lambda terminal, args: terminal.system_monitor.get_process_list(),
+            usage='ps'),
+    Command('kill', PythonTerminal._kill_process, min_args=1,
+            missing='Process ID required', usage='kill <pid>'),
+    Command('top', lambda terminal, args: terminal.system_monitor.get_top_processes(),
+            usage='top'),
+    Command('whoami', lambda terminal, args: os.getlogin() if hasattr(os, 'getlogin') else 'user',
+            usage='whoami'),
+    Command('date', lambda terminal, args: datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            usage='date'),
+    Command('clear', lambda terminal, args: '\033[2J\033[H', usage='clear'),  # ANSI clear screen
+    Command('help', lambda terminal, args: terminal._show_help(), usage='help'),
+    Command('history', lambda terminal, args: terminal._show_history(), usage='history'),
+    Command('sysinfo', lambda terminal, args: terminal.system_monitor.get_detailed_system_info(),
+            usage='sysinfo'),
+    Command('export', PythonTerminal._export_variable, usage='export NAME=value'),
+    Command('reindex', PythonTerminal._reindex, max_args=1, usage='reindex [path]'),
+    Command('wc', filter_command('wc'), usage='wc [-l] [-w] [-c] [-m] <file>...',
+            parse=FILTER_ARGS['wc']),
+    Command('sort', filter_command('sort'), usage='sort [-r] [-n] [-f] [-u] <file>...',
+            parse=FILTER_ARGS['sort']),
+    Command('uniq', filter_command('uniq'), usage='uniq [-c] [-d] [-u] [-i] <file>',
+            parse=FILTER_ARGS['uniq']),
+):
+    default_registry.register(_command)
+del _command
@@ -0,0 +1,651 @@
+import base64
+import hashlib
+import json
+import math
+import socket
+import socketserver
+import struct
+import threading
+import zlib
+from http.client import parse_headers
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from .governor import GovernorBusy
+
+# RFC 6455 handshake constant
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# Largest message accepted from a client (commands are small)
+MAX_MESSAGE_BYTES = 1024 * 1024
+# Outgoing messages shorter than this are not worth deflating
+COMPRESS_MIN_BYTES = 256
+# Commands a single connection may have running at once
+MAX_CONCURRENT_COMMANDS = 8
+
+class WebSocketClosed(Exception):
+    """Raised when the peer closed the connection or it broke"""
+
+class WebSocket:
+    """Server side of one RFC 6455 connection over a blocking socket
+    
+    Reads happen on the connection's own thread; sends may come from any
+    thread and are serialized by a lock. With permessage-deflate (RFC 7692)
+    negotiated, messages longer than COMPRESS_MIN_BYTES are compressed
+    with a shared context in each direction.
+    """
+    
+    def __init__(self, sock: socket.socket, rfile, deflate_wbits: Optional[int] = None):
+        self.sock = sock
+        self.rfile = rfile
+        self.closed = False
+        self._send_lock = threading.Lock()
+        self._compressor = None
+        self._decompressor = None
+        if deflate_wbits is not None:
+            self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED,
+                                                -deflate_wbits)
+            self._decompressor = zlib.decompressobj(-15)
+    
+    def _read_exact(self, size: int) -> bytes:
+        data = self.rfile.read(size)
+        if len(data) < size:
+            raise WebSocketClosed("Connection closed")
+        return data
+    
+    def _read_frame(self) -> Tuple[bool, bool, int, bytes]:
+        first, second = self._read_exact(2)
+        fin = bool(first & 0x80)
+        rsv1 = bool(first & 0x40)
+        opcode = first & 0x0F
+        length = second & 0x7F
+        if not second & 0x80:
+            raise WebSocketClosed("Client frames must be masked")
+        if length == 126:
+            length = struct.unpack('!H', self._read_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self._read_exact(8))[0]
+        if length > MAX_MESSAGE_BYTES:
+            self.close(1009, 'Message too big')
+            raise WebSocketClosed("Message too big")
+        mask = self._read_exact(4)
+        payload = self._read_exact(length)
+        if length:
+            # XOR with the repeated 4-byte mask, done as one big integer op
+            repeated = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, 'little') ^
+                       int.from_bytes(repeated, 'little')).to_bytes(length, 'little')
+        return fin, rsv1, opcode, payload
+    
+    def receive(self):
+        """Return the next data message (str for text, bytes for binary)
+        
+        Control frames are handled here: pings are answered and a close
+        frame is echoed before WebSocketClosed is raised.
+        """
+        fragments = []
+        message_opcode = None
+        compressed = False
+        size = 0
+        while True:
+            fin, rsv1, opcode, payload = self._read_frame()
+            if opcode == OP_PING:
+                self._send_frame(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                code = struct.unpack('!H', payload[:2])[0] if len(payload) >= 2 else 1000
+                self.close(code if code not in (1005, 1006) else 1000)
+                raise WebSocketClosed("Closed by peer")
+            if opcode in (OP_TEXT, OP_BINARY):
+                if message_opcode is not None:
+                    raise WebSocketClosed("Unexpected new message inside a fragmented one")
+                message_opcode = opcode
+                compressed = rsv1
+            elif opcode != OP_CONTINUATION or message_opcode is None:
+                raise WebSocketClosed(f"Unexpected opcode {opcode}")
+            fragments.append(payload)
+            size += len(payload)
+            if size > MAX_MESSAGE_BYTES:
+                self.close(1009, 'Message too big')
+                raise WebSocketClosed("Message too big")
+            if fin:
+                break
+        
+        data = b''.join(fragments)
+        if compressed:
+            if self._decompressor is None:
+                raise WebSocketClosed("Compressed frame without permessage-deflate")
+            data = self._decompressor.decompress(data + b'\x00\x00\xff\xff', MAX_MESSAGE_BYTES)
+        if message_opcode == OP_TEXT:
+            return data.decode('utf-8')
+        return data
+    
+    def send_text(self, text: str):
+        self._send_message(OP_TEXT, text.encode('utf-8'))
+    
+    def send_binary(self, data: bytes):
+        self._send_message(OP_BINARY, data)
+    
+    def send_json(self, payload: Dict):
+        self.send_text(json.dumps(payload))
+    
+    def _send_message(self, opcode: int, payload: bytes):
+        with self._send_lock:
+            rsv1 = False
+            if self._compressor is not None and len(payload) >= COMPRESS_MIN_BYTES:
+                # The compression context is shared across messages, so
+                # compressing must happen under the send lock, in send order
+                payload = self._compressor.compress(payload) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+                payload = payload[:-4]
+                rsv1 = True
+            self._send_frame_locked(opcode, payload, rsv1)
+    
+    def _send_frame(self, opcode: int, payload: bytes):
+        with self._send_lock:
+            self._send_frame_locked(opcode, payload, False)
+    
+    def _send_frame_locked(self, opcode: int, payload: bytes, rsv1: bool):
+        if self.closed and opcode != OP_CLOSE:
+            raise WebSocketClosed("Connection closed")
+        header = bytearray([0x80 | (0x40 if rsv1 else 0) | opcode])
+        length = len(payload)
+        if length < 126:
+            header.append(length)
+        elif length < 1 << 16:
+            header.append(126)
+            header += struct.pack('!H', length)
+        else:
+            header.append(127)
+            header += struct.pack('!Q', length)
+        try:
+            if length < 65536:
+                self.sock.sendall(bytes(header) + payload)
+            else:
+                # Avoid copying large payloads just to prepend the header
+                self.sock.sendall(header)
+                self.sock.sendall(payload)
+        except OSError as e:
+            self.closed = True
+            raise WebSocketClosed(str(e))
+    
+    def close(self, code: int = 1000, reason: str = ''):
+        """Send a close frame (once); the socket itself is closed by the server"""
+        with self._send_lock:
+            if self.closed:
+                return
+            try:
+                self._send_frame_locked(OP_CLOSE, struct.pack('!H', code) + reason.encode('utf-8')[:120],
+                                        False)
+            except WebSocketClosed:
+                pass
+            self.closed = True
+
+def accept_key(key: str) -> str:
+    """Sec-WebSocket-Accept value for a client's Sec-WebSocket-Key"""
+    digest = hashlib.sha1((key + WS_GUID).encode('ascii')).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+def negotiate_deflate(offer: str) -> Tuple[Optional[int], Optional[str]]:
+    """Pick a permessage-deflate offer; returns (server wbits, response header)"""
+    for extension in offer.split(','):
+        params = [p.strip() for p in extension.split(';')]
+        if params[0].lower() != 'permessage-deflate':
+            continue
+        wbits = 15
+        response = ['permessage-deflate']
+        acceptable = True
+        for param in params[1:]:
+            name, _, value = param.partition('=')
+            name = name.strip().lower()
+            value = value.strip().strip('"')
+            if name == 'server_max_window_bits':
+                if not value.isdigit() or not 8 <= int(value) <= 15:
+                    acceptable = False
+                    break
+                # zlib cannot produce raw deflate with an 8-bit window
+                wbits = max(int(value), 9)
+                response.append(f'server_max_window_bits={wbits}')
+            elif name == 'server_no_context_takeover':
+                acceptable = False  # not implemented; try the next offer
+                break
+            elif name in ('client_max_window_bits', 'client_no_context_takeover'):
+                pass  # our decompressor handles any client window/context
+            else:
+                acceptable = False
+                break
+        if acceptable:
+            return wbits, '; '.join(response)
+    return None, None
+
+class TerminalChannel:
+    """Multiplex commands, job output and metric pushes over one WebSocket
+    
+    Client messages are JSON objects with a `type`:
+      
+      execute           {id, command, binary?}  run a command, stream output
+      cancel            {id}                    kill a running command
+      job.submit        {id, command, binary?}  queue a background job, then watch it
+      job.watch         {id, job_id, offset?, binary?}
+      job.cancel        {job_id}
+      metrics.subscribe {fields?, interval?}    push metric deltas
+      metrics.unsubscribe
+      pty.open          {id, cols?, rows?}      attach to the session's shell
+      pty.resize        {cols, rows}
+      pty.detach / pty.close                  stop receiving / hang up the shell
+      ping
+    
+    Output for request `id` arrives as `{"type": "output", "id", "data"}`
+    text messages, or - when the request set `binary` and `id` is an
+    integer - as binary messages made of a 4-byte big-endian id followed
+    by the raw UTF-8 output. Commands end with `{"type": "exit", "id",
+    "returncode"}`, jobs with `{"type": "job", "id", "job"}`.
+    
+    While a PTY is attached, binary client messages are keystrokes for the
+    shell and its raw output arrives as binary messages prefixed with the
+    `pty.open` id, ending with `{"type": "pty.exit", "id", "returncode"}`.
+    """
+    
+    def __init__(self, ws: WebSocket, terminal, session_id: str, job_manager=None,
+                 system_monitor=None, pty_manager=None):
+        self.ws = ws
+        self.terminal = terminal
+        self.session_id = session_id
+        self.job_manager = job_manager
+        self.system_monitor = system_monitor
+        self._running: Dict = {}
+        self._lock = threading.Lock()
+        self._metrics = None
+        self.pty_manager = pty_manager
+        self._pty = None
+        self._pty_listener = None
+        self._closed = threading.Event()
+    
+    def run(self):
+        """Serve messages until the connection closes"""
+        try:
+            self.ws.send_json({'type': 'ready', 'session': self.session_id[:8],
+                               'cwd': self.terminal.current_directory})
+            while True:
+                message = self.ws.receive()
+                if isinstance(message, bytes):
+                    if self._pty_listener is not None:
+                        self._pty.write(message)
+                        continue
+                    # Otherwise binary input is treated as a UTF-8 command line
+                    message = {'type': 'execute', 'id': None, 'command': message.decode('utf-8', 'replace')}
+                else:
+                    try:
+                        message = json.loads(message)
+                    except ValueError:
+                        self.ws.send_json({'type': 'error', 'message': 'Invalid JSON'})
+                        continue
+                    if not isinstance(message, dict):
+                        self.ws.send_json({'type': 'error', 'message': 'Expected a JSON object'})
+                        continue
+                self._dispatch(message)
+        except WebSocketClosed:
+            pass
+        finally:
+            self._shutdown()
+    
+    def _dispatch(self, message: Dict):
+        handler = {
+            'execute': self._on_execute,
+            'cancel': self._on_cancel,
+            'job.submit': self._on_job_submit,
+            'job.watch': self._on_job_watch,
+            'job.cancel': self._on_job_cancel,
+            'metrics.subscribe': self._on_metrics_subscribe,
+            'metrics.unsubscribe': self._on_metrics_unsubscribe,
+            'pty.open': self._on_pty_open,
+            'pty.resize': self._on_pty_resize,
+            'pty.detach': self._on_pty_detach,
+            'pty.close': self._on_pty_close,
+            'ping': lambda message: self.ws.send_json({'type': 'pong', 'id': message.get('id')}),
+        }.get(message.get('type'))
+        if handler is None:
+            self.ws.send_json({'type': 'error', 'id': message.get('id'),
+                               'message': f"Unknown message type {message.get('type')!r}"})
+            return
+        try:
+            handler(message)
+        except WebSocketClosed:
+            raise
+        except Exception as e:
+            # A malformed message fails on its own; the channel stays open
+            self.ws.send_json({'type': 'error', 'id': message.get('id'),
+                               'message': f"Invalid {message.get('type')} message: {e}"})
+    
+    def _send_output(self, request_id, chunk: str, binary: bool):
+        if binary and isinstance(request_id, int):
+            self.ws.send_binary(struct.pack('!I', request_id & 0xFFFFFFFF) + chunk.encode('utf-8'))
+        else:
+            self.ws.send_json({'type': 'output', 'id': request_id, 'data': chunk})
+    
+    def _start(self, request_id, target, *args):
+        """Run `target` on its own thread, tracked under `request_id`"""
+        with self._lock:
+            if len(self._running) >= MAX_CONCURRENT_COMMANDS:
+                self.ws.send_json({'type': 'error', 'id': request_id,
+                                   'message': f'Too many running commands (max {MAX_CONCURRENT_COMMANDS})'})
+                return
+            if request_id in self._running:
+                self.ws.send_json({'type': 'error', 'id': request_id,
+                                   'message': f'Request id {request_id!r} is already running'})
+                return
+            self._running[request_id] = None
+        thread = threading.Thread(target=self._run_tracked, args=(request_id, target) + args,
+                                  name='websocket-command', daemon=True)
+        thread.start()
+    
+    def _run_tracked(self, request_id, target, *args):
+        try:
+            target(request_id, *args)
+        except WebSocketClosed:
+            pass
+        finally:
+            with self._lock:
+                self._running.pop(request_id, None)
+    
+    def _on_execute(self, message: Dict):
+        command = str(message.get('command') or '').strip()
+        if not command:
+            self.ws.send_json({'type': 'exit', 'id': message.get('id'), 'returncode': 1,
+                               'error': 'Empty command'})
+            return
+        self._start(message.get('id'), self._execute, command, bool(message.get('binary')))
+    
+    def _execute(self, request_id, command: str, binary: bool):
+        try:
+            stream = self.terminal.stream_command(command)
+        except GovernorBusy as e:
+            self.ws.send_json({'type': 'error', 'id': request_id, 'message': str(e),
+                               'code': 429, 'retry_after': e.retry_after})
+            return
+        with self._lock:
+            self._running[request_id] = stream
+        try:
+            for chunk in stream:
+                if chunk:
+                    self._send_output(request_id, chunk, binary)
+                if self._closed.is_set():
+                    return
+        finally:
+            stream.close()
+        self.ws.send_json({'type': 'exit', 'id': request_id,
+                           'returncode': getattr(stream, 'returncode', 0),
+                           'cwd': self.terminal.current_directory})
+    
+    def _on_cancel(self, message: Dict):
+        with self._lock:
+            stream = self._running.get(message.get('id'))
+        kill = getattr(stream, 'kill', None)
+        if kill is not None:
+            kill()
+    
+    def _on_job_submit(self, message: Dict):
+        if self.job_manager is None:
+            self.ws.send_json({'type': 'error', 'id': message.get('id'), 'message': 'Jobs are not available'})
+            return
+        command = str(message.get('command') or '').strip()
+        if not command:
+            self.ws.send_json({'type': 'error', 'id': message.get('id'), 'message': 'Empty command'})
+            return
+        try:
+            job = self.job_manager.submit(self.terminal, command, session_id=self.session_id)
+        except Exception as e:
+            self.ws.send_json({'type': 'error', 'id': message.get('id'), 'message': str(e)})
+            return
+        self.ws.send_json({'type': 'job', 'id': message.get('id'), 'job': job.to_dict()})
+        self._start(message.get('id'), self._watch_job, job, 0, bool(message.get('binary')))
+    
+    def _session_job(self, job_id):
+        job = self.job_manager.get(str(job_id)) if self.job_manager is not None else None
+        if job is None or job.session_id != self.session_id:
+            return None
+        return job
+    
+    def _on_job_watch(self, message: Dict):
+        job = self._session_job(message.get('job_id'))
+        if job is None:
+            self.ws.send_json({'type': 'error', 'id': message.get('id'),
+                               'message': f"Job {message.get('job_id')} not found"})
+            return
+        offset = message.get('offset') or 0
+        if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+            self.ws.send_json({'type': 'error', 'id': message.get('id'),
+                               'message': 'offset must be a non-negative integer'})
+            return
+        self._start(message.get('id'), self._watch_job, job, offset, bool(message.get('binary')))
+    
+    def _watch_job(self, request_id, job, offset: int, binary: bool):
+        for chunk in job.iter_output(offset, keepalive=1.0):
+            if self._closed.is_set():
+                return
+            if chunk is not None:
+                self._send_output(request_id, chunk, binary)
+        self.ws.send_json({'type': 'job', 'id': request_id, 'job': job.to_dict()})
+    
+    def _on_job_cancel(self, message: Dict):
+        job = self._session_job(message.get('job_id'))
+        if job is None:
+            self.ws.send_json({'type': 'error', 'message': f"Job {message.get('job_id')} not found"})
+            return
+        self.job_manager.cancel(job.id)
+    
+    def _on_metrics_subscribe(self, message: Dict):
+        if self.system_monitor is None:
+            self.ws.send_json({'type': 'error', 'message': 'Metrics are not available'})
+            return
+        fields = message.get('fields')
+        if isinstance(fields, str):
+            # Same form as the SSE endpoint's query parameter
+            fields = [field.strip() for field in fields.split(',') if field.strip()]
+        if fields is not None and not (isinstance(fields, list)
+                                       and all(isinstance(field, str) for field in fields)):
+            self.ws.send_json({'type': 'error', 'message': 'fields must be a list of names'})
+            return
+        interval = message.get('interval')
+        if interval is not None and (not isinstance(interval, (int, float)) or isinstance(interval, bool)
+                                     or not math.isfinite(interval) or interval < 0):
+            self.ws.send_json({'type': 'error', 'message': 'interval must be a non-negative number'})
+            return
+        self._on_metrics_unsubscribe(message)
+        subscription = self.system_monitor.subscribe(fields=fields or None, interval=interval)
+        self._metrics = subscription
+        thread = threading.Thread(target=self._push_metrics, args=(subscription,),
+                                  name='websocket-metrics', daemon=True)
+        thread.start()
+    
+    def _push_metrics(self, subscription):
+        try:
+            while not subscription.closed and not self._closed.is_set():
+                delta = subscription.next_delta(timeout=15.0)
+                if delta:
+                    self.ws.send_json({'type': 'metrics', 'data': delta})
+        except WebSocketClosed:
+            pass
+        finally:
+            self.system_monitor.unsubscribe(subscription)
+    
+    def _on_metrics_unsubscribe(self, message: Dict):
+        subscription, self._metrics = self._metrics, None
+        if subscription is not None:
+            self.system_monitor.unsubscribe(subscription)
+    
+    def _on_pty_open(self, message: Dict):
+        if self.pty_manager is None:
+            self.ws.send_json({'type': 'error', 'id': message.get('id'), 'message': 'Terminals are not available'})
+            return
+        request_id = message.get('id')
+        if not isinstance(request_id, int):
+            self.ws.send_json({'type': 'error', 'id': request_id, 'message': 'pty.open needs an integer id'})
+            return
+        self._on_pty_detach(message)
+        try:
+            pty = self.pty_manager.open(self.session_id, self.terminal.current_directory,
+                                        cols=int(message.get('cols') or 80),
+                                        rows=int(message.get('rows') or 24))
+        except (RuntimeError, OSError, ValueError) as e:
+            self.ws.send_json({'type': 'error', 'id': request_id, 'message': str(e)})
+            return
+        prefix = struct.pack('!I', request_id & 0xFFFFFFFF)
+        self._pty = pty
+        self.ws.send_json({'type': 'pty', 'id': request_id, 'pty': pty.to_dict()})
+        self._pty_listener = pty.attach(
+            lambda data: self.ws.send_binary(prefix + data),
+            lambda returncode: self.ws.send_json({'type': 'pty.exit', 'id': request_id,
+                                                  'returncode': returncode}),
+            replay=message.get('replay', True)
+        )
+    
+    def _on_pty_resize(self, message: Dict):
+        if self._pty is not None:
+            try:
+                self._pty.resize(message.get('cols') or self._pty.cols, message.get('rows') or self._pty.rows)
+            except (ValueError, OSError):
+                pass
+    
+    def _on_pty_detach(self, message: Dict):
+        listener, self._pty_listener = self._pty_listener, None
+        if listener is not None:
+            self._pty.detach(listener)
+    
+    def _on_pty_close(self, message: Dict):
+        self._on_pty_detach(message)
+        if self._pty is not None:
+            self.pty_manager.close(self.session_id)
+            self._pty = None
+    
+    def _shutdown(self):
+        """Stop everything this connection started"""
+        self._closed.set()
+        self._on_metrics_unsubscribe({})
+        # The shell itself keeps running so a reconnect can reattach
+        self._on_pty_detach({})
+        with self._lock:
+            streams = [stream for stream in self._running.values() if stream is not None]
+        for stream in streams:
+            kill = getattr(stream, 'kill', None)
+            if kill is not None:
+                kill()
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Perform the HTTP upgrade, then hand the socket to a TerminalChannel"""
+    
+    def handle(self):
+        server: WebSocketServer = self.server
+        request_line = self.rfile.readline(8192).decode('latin-1').strip()
+        try:
+            headers = parse_headers(self.rfile)
+        except Exception:
+            return self._reject(400, 'Bad Request')
+        parts = request_line.split()
+        if len(parts) != 3 or parts[0] != 'GET':
+            return self._reject(405, 'Method Not Allowed')
+        if urlsplit(parts[1]).path != server.path:
+            return self._reject(404, 'Not Found')
+        key = headers.get('Sec-WebSocket-Key')
+        if (headers.get('Upgrade', '').lower() != 'websocket'
+                or 'upgrade' not in headers.get('Connection', '').lower()
+                or not key):
+            return self._reject(426, 'Upgrade Required')
+        if headers.get('Sec-WebSocket-Version') != '13':
+            return self._reject(426, 'Upgrade Required', {'Sec-WebSocket-Version': '13'})
+        if not server.origin_allowed(headers.get('Origin'), headers.get('Host', '')):
+            return self._reject(403, 'Forbidden')
+        
+        session_id = server.session_resolver(headers.get('Cookie', ''))
+        if session_id is None:
+            return self._reject(401, 'Unauthorized')
+        
+        wbits, extension = (None, None)
+        if server.compression:
+            wbits, extension = negotiate_deflate(headers.get('Sec-WebSocket-Extensions', ''))
+        response = [
+            'HTTP/1.1 101 Switching Protocols',
+            'Upgrade: websocket',
+            'Connection: Upgrade',
+            f'Sec-WebSocket-Accept: {accept_key(key.strip())}',
+        ]
+        if extension:
+            response.append(f'Sec-WebSocket-Extensions: {extension}')
+        self.wfile.write(('\r\n'.join(response) + '\r\n\r\n').encode('latin-1'))
+        self.wfile.flush()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        
+        ws = WebSocket(self.connection, self.rfile, deflate_wbits=wbits)
+        terminal = server.session_manager.get_terminal(session_id)
+        TerminalChannel(ws, terminal, session_id, job_manager=server.job_manager,
+                        system_monitor=server.system_monitor, pty_manager=server.pty_manager).run()
+        ws.close()
+    
+    def _reject(self, status: int, reason: str, extra: Optional[Dict] = None):
+        lines = [f'HTTP/1.1 {status} {reason}', 'Content-Length: 0', 'Connection: close']
+        lines += [f'{name}: {value}' for name, value in (extra or {}).items()]
+        self.wfile.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+class WebSocketServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """Stand-alone WebSocket endpoint sharing the app's sessions, jobs and monitor
+    
+    Runs beside the HTTP server (on its own port) because WSGI cannot hold
+    a connection open for bidirectional traffic. `session_resolver` maps
+    the request's Cookie header to a terminal session id (or None to
+    refuse the connection). Cross-origin upgrades are refused unless the
+    origin's host is the server's host or listed in `allowed_origins`.
+    """
+    
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, address: Tuple[str, int], session_manager, session_resolver: Callable,
+                 job_manager=None, system_monitor=None, pty_manager=None, path: str = '/ws',
+                 compression: bool = True, allowed_origins=(), bind_and_activate: bool = True):
+        self.session_manager = session_manager
+        self.session_resolver = session_resolver
+        self.job_manager = job_manager
+        self.system_monitor = system_monitor
+        self.pty_manager = pty_manager
+        self.path = path
+        self.compression = compression
+        self.allowed_origins = {origin.rstrip('/') for origin in allowed_origins}
+        self._thread: Optional[threading.Thread] = None
+        self._bound = bind_and_activate
+        super().__init__(address, _Handler, bind_and_activate=bind_and_activate)
+    
+    def origin_allowed(self, origin: Optional[str], host: str) -> bool:
+        if not origin:
+            return True  # not a browser
+        if origin.rstrip('/') in self.allowed_origins:
+            return True
+        # Same host on any port: the page is served by the HTTP port
+        return urlsplit(origin).hostname == urlsplit(f'//{host}').hostname
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """Bind (if not done yet) and serve on a daemon thread"""
+        if self.running:
+            return
+        if not self._bound:
+            self.server_bind()
+            self.server_activate()
+            self._bound = True
+        self._thread = threading.Thread(target=self.serve_forever, name='websocket-server',
+                                        daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,87 @@
+"""Micro-benchmark for AIProcessor intent matching.
+
+Measures per-query latency as the number of registered intents grows,
+comparing the compiled keyword-indexed matcher (with and without the
+result cache) against the original linear scan over uncompiled patterns.
+
+Run from the repository root:
+    python -m benchmarks.bench_intent_matcher [--sizes 13,100,500] [--json]
+"""
+import argparse
+import json
+import re
+import time
+
+from app.ai_processor import AIProcessor
+
+QUERIES = [
+    'create a folder called reports',
+    'show me all files in src',
+    'what is the current directory',
+    'go to the folder build',
+    'delete the file old.log',
+    'who am i',
+    'tell me a joke',
+]
+
+def build_processor(n_intents, cache_size):
+    """AIProcessor padded with synthetic intents up to `n_intents` patterns"""
+    processor = AIProcessor(cache_size=cache_size)
+    i = 0
+    while len(processor.command_patterns) < n_intents:
+        processor.command_patterns[rf'verb{i} (?:the )?(?:object|thing) ([^\s]+)'] = f'cmd{i} {{}}'
+        i += 1
+    processor._compile_intents()
+    return processor
+
+def linear_scan(patterns, query):
+    """The original matcher: re.search over every pattern in order"""
+    query = query.strip().lower()
+    for pattern, template in patterns.items():
+        if re.search(pattern, query, re.IGNORECASE):
+            return template
+    return None
+
+def time_per_query(func, queries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            func(query)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1e6
+
+def run(sizes, repeat):
+    results = []
+    for size in sizes:
+        uncached = build_processor(size, cache_size=0)
+        cached = build_processor(size, cache_size=1024)
+        patterns = dict(uncached.command_patterns)
+        # re caches compiled patterns internally (up to 512); purge so the
+        # baseline reflects recompilation once the pattern set exceeds it
+        re.purge()
+        results.append({
+            'intents': len(patterns),
+            'linear_scan_us': round(time_per_query(lambda q: linear_scan(patterns, q), QUERIES, repeat), 2),
+            'indexed_us': round(time_per_query(uncached.process_query, QUERIES, repeat), 2),
+            'indexed_cached_us': round(time_per_query(cached.process_query, QUERIES, repeat), 2),
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='13,50,100,250,500,1000',
+                        help='comma separated intent counts')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--json', action='store_true', help='emit JSON instead of a table')
+    args = parser.parse_args()
+    
+    results = run([int(s) for s in args.sizes.split(',')], args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'INTENTS':>8} {'LINEAR us':>12} {'INDEXED us':>12} {'CACHED us':>12}")
+    for row in results:
+        print(f"{row['intents']:>8} {row['linear_scan_us']:>12} {row['indexed_us']:>12} "
+              f"{row['indexed_cached_us']:>12}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""Benchmark suite for terminal commands, AI matching and HTTP endpoints.
+
+Builds synthetic fixtures (a deep tree, a very wide directory, a large
+log, a large process table via a psutil stub), then reports latency
+percentiles and peak traced memory for each benchmark. Results are JSON
+so runs can be compared: pass --baseline to flag regressions, which also
+makes the exit status non-zero.
+
+Run from the repository root:
+    python -m benchmarks.bench_suite [--scale small|medium|large]
+        [--only NAME,...] [--output results.json]
+        [--baseline old.json] [--threshold 0.25]
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from benchmarks import fixtures
+
+# Regressions are judged on these statistics
+COMPARED_STATS = ('p50_ms', 'p90_ms', 'peak_kib')
+# Differences below this are noise whatever the ratio (ms for latency, KiB for memory)
+ABSOLUTE_SLACK = {'p50_ms': 0.05, 'p90_ms': 0.1, 'peak_kib': 64}
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+def summarize(latencies, peak_bytes):
+    latencies = sorted(latencies)
+    return {
+        'runs': len(latencies),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+        'peak_kib': round(peak_bytes / 1024, 1),
+    }
+
+def measure(func, repeat, warmup=1):
+    """Time `repeat` calls of `func`, then trace one more for peak memory
+    
+    Memory is traced separately because tracemalloc slows allocation-heavy
+    code several times over and would distort the latencies.
+    """
+    for _ in range(warmup):
+        func()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return summarize(latencies, peak)
+
+def measure_concurrent(make_call, threads, requests_per_thread):
+    """Run `requests_per_thread` calls on each of `threads` threads at once
+    
+    `make_call()` is invoked once per thread and returns the function that
+    thread repeatedly calls (so each thread can own its client).
+    """
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+    errors = []
+    
+    def worker():
+        call = make_call()
+        local = []
+        barrier.wait()
+        for _ in range(requests_per_thread):
+            start = time.perf_counter()
+            try:
+                call()
+            except Exception as e:
+                errors.append(repr(e))
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+    
+    tracemalloc.start()
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = summarize(latencies, peak)
+    result['threads'] = threads
+    result['throughput_rps'] = round(len(latencies) / elapsed, 1)
+    result['errors'] = len(errors)
+    return result
+
+def terminal_benchmarks(paths, repeat):
+    """Benchmarks calling PythonTerminal handlers directly"""
+    from app.terminal import PythonTerminal
+    
+    terminal = PythonTerminal(current_directory=paths['tree'])
+    heavy = max(1, repeat // 10)  # whole-file scans of the log
+    log = paths['log']
+    log_size = os.path.getsize(log)
+    return {
+        'list_directory.wide_page': (lambda: terminal._list_directory(['--limit', '100', paths['wide']]), repeat),
+        'list_directory.wide_unsorted': (lambda: terminal._list_directory(['-U', '--limit', '100', paths['wide']]), repeat),
+        'list_directory.wide_long': (lambda: terminal._list_directory(['-l', '--limit', '100', paths['wide']]), heavy),
+        'find_files.deep_tree': (lambda: terminal._find_files(['*.py', paths['tree']]), heavy),
+        'find_files.first_match': (lambda: terminal._find_files(['*.log', paths['tree'], '--max-results', '1']), repeat),
+        'grep_content.large_log': (lambda: terminal._grep_content(['ERROR', log]), heavy),
+        'read_file.first_page': (lambda: terminal._read_file([log]), repeat),
+        'read_file.middle_page': (lambda: terminal._read_file(['--offset', str(log_size // 2), log]), repeat),
+        'read_file.tail': (lambda: terminal._tail_file(['-n', '100', log]), repeat),
+    }
+
+def process_benchmarks(repeat):
+    from app.process_table import ProcessTable
+    
+    table = ProcessTable(min_refresh_interval=0, prime_interval=0)
+    return {
+        'process_table.refresh': (lambda: table.refresh(force=True), max(1, repeat // 5)),
+        'process_table.top20': (lambda: table.query(sort='cpu', limit=20), max(1, repeat // 5)),
+    }
+
+def ai_benchmarks(repeat):
+    from app.ai_processor import AIProcessor
+    from benchmarks.bench_intent_matcher import QUERIES
+    
+    cached = AIProcessor()
+    uncached = AIProcessor(cache_size=0)
+    queries = itertools.cycle(QUERIES)
+    return {
+        'ai.process_query': (lambda: uncached.process_query(next(queries)), repeat * 5),
+        'ai.process_query_cached': (lambda: cached.process_query(QUERIES[0]), repeat * 5),
+    }
+
+def http_benchmarks(work_dir, threads, requests_per_thread):
+    """/execute and /system_info under concurrent load via the Flask test client"""
+    # Keep the app's persistent state out of the user's home directory
+    os.environ.setdefault('TERMINAL_HISTORY_PATH', os.path.join(work_dir, 'history.jsonl'))
+    os.environ.setdefault('TERMINAL_SECRET_KEY_PATH', os.path.join(work_dir, 'secret_key'))
+    os.environ.setdefault('TERMINAL_WS_ENABLED', '0')
+    from app.main import app
+    
+    def execute_client(command):
+        def make_call():
+            client = app.test_client()
+            
+            def call():
+                response = client.post('/execute', json={'command': command})
+                if response.status_code != 200 or not response.get_json()['success']:
+                    raise RuntimeError(response.get_data(as_text=True)[:200])
+            return call
+        return make_call
+    
+    def system_info_client():
+        client = app.test_client()
+        return lambda: client.get('/system_info')
+    
+    return {
+        'http.execute_builtin': (execute_client('pwd'), threads, requests_per_thread),
+        'http.execute_system': (execute_client('uname -s'), threads, max(1, requests_per_thread // 4)),
+        'http.system_info': (system_info_client, threads, requests_per_thread),
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run(scale, fixtures_dir, repeat, threads, requests_per_thread, only=None):
+    sizes = fixtures.SCALES[scale]
+    started = time.perf_counter()
+    paths = fixtures.build_all(fixtures_dir, scale)
+    fixture_seconds = round(time.perf_counter() - started, 1)
+    
+    def selected(name):
+        return not only or any(name == o or name.startswith(o + '.') for o in only)
+    
+    results = {}
+    for name, (func, runs) in {**terminal_benchmarks(paths, repeat), **ai_benchmarks(repeat)}.items():
+        if selected(name):
+            results[name] = measure(func, runs)
+    with fixtures.stub_process_table(sizes['processes']):
+        for name, (func, runs) in process_benchmarks(repeat).items():
+            if selected(name):
+                results[name] = measure(func, runs)
+                results[name]['processes'] = sizes['processes']
+    if any(selected(name) for name in ('http.execute_builtin', 'http.execute_system', 'http.system_info')):
+        for name, (make_call, n_threads, n_requests) in http_benchmarks(fixtures_dir, threads,
+                                                                         requests_per_thread).items():
+            if selected(name):
+                results[name] = measure_concurrent(make_call, n_threads, n_requests)
+    
+    return {
+        'meta': {
+            'scale': scale,
+            'sizes': sizes,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'revision': git_revision(),
+            'timestamp': time.time(),
+            'fixture_seconds': fixture_seconds,
+        },
+        'results': results,
+    }
+
+def compare(current, baseline, threshold):
+    """Benchmarks whose compared stats grew by more than `threshold` (a ratio)"""
+    regressions = []
+    if baseline.get('meta', {}).get('scale') != current['meta']['scale']:
+        print(f"warning: baseline scale {baseline.get('meta', {}).get('scale')!r} differs from "
+              f"{current['meta']['scale']!r}", file=sys.stderr)
+    for name, stats in current['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if not old:
+            continue
+        for stat in COMPARED_STATS:
+            before, after = old.get(stat), stats.get(stat)
+            if before is None or after is None:
+                continue
+            if after - before > ABSOLUTE_SLACK[stat] and after > before * (1 + threshold):
+                regressions.append({'benchmark': name, 'stat': stat, 'baseline': before, 'current': after,
+                                    'change': round(after / before - 1, 3) if before else None})
+    return regressions
+
+def print_table(report):
+    print(f"{'BENCHMARK':<32} {'RUNS':>5} {'P50 ms':>10} {'P90 ms':>10} {'P99 ms':>10} {'PEAK KiB':>10}")
+    for name, stats in report['results'].items():
+        print(f"{name:<32} {stats['runs']:>5} {stats['p50_ms']:>10} {stats['p90_ms']:>10} "
+              f"{stats['p99_ms']:>10} {stats['peak_kib']:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=sorted(fixtures.SCALES), default='small')
+    parser.add_argument('--fixtures', default=os.path.join(tempfile.gettempdir(), 'python_terminal_bench'),
+                        help='directory for generated fixtures (reused between runs)')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per cheap benchmark')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent HTTP clients')
+    parser.add_argument('--requests', type=int, default=50, help='HTTP requests per client')
+    parser.add_argument('--only', default='', help='comma separated benchmark names or prefixes')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative slowdown that counts as a regression')
+    parser.add_argument('--json', action='store_true', help='print JSON instead of a table')
+    args = parser.parse_args()
+    
+    only = [name for name in args.only.split(',') if name]
+    report = run(args.scale, args.fixtures, args.repeat, args.threads, args.requests, only)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(report, json.load(f), args.threshold)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_table(report)
+        for regression in report.get('regressions', []):
+            print(f"REGRESSION {regression['benchmark']} {regression['stat']}: "
+                  f"{regression['baseline']} -> {regression['current']}")
+    if report.get('regressions'):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
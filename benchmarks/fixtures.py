@@ -0,0 +1,165 @@
+"""Synthetic fixtures for the benchmark suite.
+
+Fixtures are generated once under a fixtures directory and reused by later
+runs with the same parameters (a `.complete` marker records them), since
+the large ones take minutes to build.
+"""
+import json
+import os
+import random
+from collections import namedtuple
+from contextlib import contextmanager
+
+import psutil
+
+# name -> fixture sizes; `large` matches the sizes the terminal must cope with
+SCALES = {
+    'small': {'tree_depth': 4, 'tree_fanout': 4, 'tree_files': 5,
+              'wide_files': 10000, 'log_bytes': 50 * 1024 ** 2, 'processes': 2000},
+    'medium': {'tree_depth': 5, 'tree_fanout': 5, 'tree_files': 8,
+               'wide_files': 100000, 'log_bytes': 512 * 1024 ** 2, 'processes': 10000},
+    'large': {'tree_depth': 6, 'tree_fanout': 6, 'tree_files': 10,
+              'wide_files': 1000000, 'log_bytes': 2 * 1024 ** 3, 'processes': 50000},
+}
+
+# One log line in this many is an ERROR, the pattern the grep benchmark searches for
+ERROR_EVERY = 1000
+LOG_LEVELS = ('INFO', 'DEBUG', 'WARN')
+LOG_MESSAGES = (
+    'request handled in {n}ms path=/api/v1/items/{m}',
+    'cache miss key=user:{m} refreshing from store',
+    'worker {n} picked up job {m} from queue default',
+    'connection pool size={n} idle={m}',
+)
+
+def _marker(path):
+    return os.path.join(path, '.complete') if os.path.isdir(path) else path + '.complete'
+
+def _is_built(path, params):
+    try:
+        with open(_marker(path)) as f:
+            return json.load(f) == params
+    except (OSError, ValueError):
+        return False
+
+def _mark_built(path, params):
+    with open(_marker(path), 'w') as f:
+        json.dump(params, f)
+
+def deep_tree(root, depth, fanout, files_per_dir):
+    """Directory tree `depth` levels deep with `fanout` subdirectories each"""
+    params = {'depth': depth, 'fanout': fanout, 'files': files_per_dir}
+    if _is_built(root, params):
+        return root
+    os.makedirs(root, exist_ok=True)
+    
+    def build(path, level):
+        for i in range(files_per_dir):
+            extension = ('py', 'log', 'txt', 'json', 'md')[i % 5]
+            with open(os.path.join(path, f'file_{level}_{i}.{extension}'), 'w') as f:
+                f.write(f'level {level} file {i}\n' * (i + 1))
+        if level < depth:
+            for i in range(fanout):
+                child = os.path.join(path, f'dir_{level}_{i}')
+                os.makedirs(child, exist_ok=True)
+                build(child, level + 1)
+    
+    build(root, 1)
+    _mark_built(root, params)
+    return root
+
+def wide_directory(root, count):
+    """A single directory holding `count` empty files"""
+    params = {'files': count}
+    if _is_built(root, params):
+        return root
+    os.makedirs(root, exist_ok=True)
+    for i in range(count):
+        # os.open/close is several times faster than open() for empty files
+        os.close(os.open(os.path.join(root, f'entry_{i:07d}.dat'), os.O_CREAT | os.O_WRONLY, 0o644))
+    _mark_built(root, params)
+    return root
+
+def large_log(path, size_bytes, seed=0):
+    """Text log of roughly `size_bytes`, with an ERROR line every ERROR_EVERY lines"""
+    params = {'bytes': size_bytes, 'seed': seed}
+    if _is_built(path, params):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rng = random.Random(seed)
+    # Build one block of lines and write it repeatedly; the content only
+    # has to look like a log, not be unique
+    lines = []
+    for i in range(ERROR_EVERY * 10):
+        level = 'ERROR' if i % ERROR_EVERY == 0 else rng.choice(LOG_LEVELS)
+        message = rng.choice(LOG_MESSAGES).format(n=rng.randint(1, 999), m=rng.randint(1, 99999))
+        lines.append(f'2026-01-01T00:{i // 600 % 60:02d}:{i // 10 % 60:02d} {level:<5} {message}\n')
+    block = ''.join(lines).encode('utf-8')
+    written = 0
+    with open(path, 'wb') as f:
+        while written < size_bytes:
+            f.write(block)
+            written += len(block)
+    _mark_built(path, params)
+    return path
+
+def build_all(directory, scale):
+    """Build (or reuse) every filesystem fixture for `scale`"""
+    sizes = SCALES[scale]
+    return {
+        'tree': deep_tree(os.path.join(directory, f'tree_{scale}'), sizes['tree_depth'],
+                          sizes['tree_fanout'], sizes['tree_files']),
+        'wide': wide_directory(os.path.join(directory, f'wide_{scale}'), sizes['wide_files']),
+        'log': large_log(os.path.join(directory, f'log_{scale}.log'), sizes['log_bytes']),
+    }
+
+_CpuTimes = namedtuple('_CpuTimes', 'user system')
+_MemoryInfo = namedtuple('_MemoryInfo', 'rss vms')
+
+class _FakeProcess:
+    __slots__ = ('info',)
+    
+    def __init__(self, info):
+        self.info = info
+
+def fake_processes(count, seed=0):
+    """`count` process records shaped like psutil.process_iter(attrs) results"""
+    rng = random.Random(seed)
+    names = ('python', 'nginx', 'postgres', 'node', 'java', 'bash', 'sshd', 'redis-server')
+    users = ('root', 'www-data', 'postgres', 'app')
+    processes = []
+    for pid in range(1, count + 1):
+        processes.append({
+            'pid': pid,
+            'name': f'{rng.choice(names)}-{pid % 97}',
+            'username': rng.choice(users),
+            'memory_percent': rng.random() * 2,
+            'memory_info': _MemoryInfo(rng.randint(1, 512) * 1024 ** 2, 0),
+            'cpu_times': _CpuTimes(rng.random() * 1000, rng.random() * 100),
+            'create_time': 1700000000.0 + pid,
+            'status': 'running' if pid % 10 == 0 else 'sleeping',
+        })
+    return processes
+
+@contextmanager
+def stub_process_table(count, seed=0):
+    """Replace psutil.process_iter with `count` synthetic processes
+    
+    CPU times advance on every call so CPU-percent deltas are non-zero.
+    """
+    processes = fake_processes(count, seed)
+    original = psutil.process_iter
+    calls = [0]
+    
+    def process_iter(attrs=None, ad_value=None):
+        calls[0] += 1
+        for info in processes:
+            cpu = info['cpu_times']
+            tick = (info['pid'] % 7) * 0.01 * calls[0]
+            yield _FakeProcess(dict(info, cpu_times=_CpuTimes(cpu.user + tick, cpu.system)))
+    
+    psutil.process_iter = process_iter
+    try:
+        yield processes
+    finally:
+        psutil.process_iter = original
@@ -1,14 +1,41 @@
-from app.main import app
+from app.main import app, async_server, websocket_server
 import os
+import sys
 
 if __name__ == '__main__':
+    # `python run.py --production` (or TERMINAL_ENV=production) serves with a
+    # worker thread pool, no debugger and graceful restart on SIGHUP
+    if '--production' in sys.argv or os.environ.get('TERMINAL_ENV') == 'production':
+        from app.server import serve
+        serve(
+            app,
+            host=os.environ.get('TERMINAL_HOST', '0.0.0.0'),
+            port=int(os.environ.get('TERMINAL_PORT', '5000')),
+            threads=int(os.environ.get('TERMINAL_SERVER_THREADS', '32')),
+            drain_timeout=float(os.environ.get('TERMINAL_DRAIN_TIMEOUT', '30')),
+            static_max_age=int(os.environ.get('TERMINAL_STATIC_MAX_AGE', '3600')),
+            max_backlog=int(os.environ.get('TERMINAL_SERVER_BACKLOG', '64')),
+            max_streams=int(os.environ['TERMINAL_SERVER_MAX_STREAMS'])
+            if os.environ.get('TERMINAL_SERVER_MAX_STREAMS') else None
+        )
+        sys.exit(0)
+    
     # Set environment variables if needed
     os.environ.setdefault('FLASK_ENV', 'development')
     
+    # The debug reloader runs the app in a child process; only that one
+    # (or a non-debug run) should own the WebSocket and asyncio ports
+    debug = True
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        if websocket_server is not None:
+            websocket_server.start()
+        if async_server is not None:
+            async_server.start()
+    
     # Run the Flask application
     app.run(
         host='0.0.0.0',
         port=5000,
-        debug=True,
+        debug=debug,
         threaded=True
     )
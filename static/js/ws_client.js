@@ -0,0 +1,244 @@
+// Persistent command channel to the terminal backend.
+//
+// Commands, streamed output, background jobs and metric pushes share one
+// WebSocket (see app/websocket_server.py). When the socket is unavailable
+// execute() falls back to the buffered POST /execute endpoint.
+const FINISHED_JOB_STATES = new Set(["completed", "failed", "cancelled"]);
+
+class TerminalSocket {
+  constructor(options = {}) {
+    this.binary = options.binary !== false;
+    this.reconnectDelay = options.reconnectDelay || 1000;
+    this.onMetrics = options.onMetrics || null;
+    this.onJob = options.onJob || null;
+    this.onStateChange = options.onStateChange || null;
+    this.socket = null;
+    this.nextId = 1;
+    this.pending = new Map();
+    this.decoder = new TextDecoder();
+    this.metricsRequest = null;
+    this.pty = null;
+    this.encoder = new TextEncoder();
+    this.closedByUser = false;
+  }
+
+  async connect() {
+    this.closedByUser = false;
+    let info;
+    try {
+      const response = await fetch("/ws/info", { credentials: "same-origin" });
+      info = (await response.json()).data;
+    } catch (error) {
+      info = { enabled: false };
+    }
+    if (!info.enabled || typeof WebSocket === "undefined") {
+      this.setState("http");
+      return false;
+    }
+
+    const scheme = window.location.protocol === "https:" ? "wss" : "ws";
+    const url = `${scheme}://${window.location.hostname}:${info.port}${info.path}`;
+    return new Promise((resolve) => {
+      const socket = new WebSocket(url);
+      socket.binaryType = "arraybuffer";
+      socket.onopen = () => {
+        this.socket = socket;
+        this.setState("open");
+        if (this.metricsRequest) {
+          this.send(this.metricsRequest);
+        }
+        resolve(true);
+      };
+      socket.onmessage = (event) => this.handleMessage(event.data);
+      socket.onerror = () => resolve(false);
+      socket.onclose = () => {
+        const wasOpen = this.socket === socket;
+        this.socket = null;
+        this.failPending("Connection closed");
+        this.setState("closed");
+        if (wasOpen && !this.closedByUser) {
+          setTimeout(() => this.connect(), this.reconnectDelay);
+        }
+        resolve(false);
+      };
+    });
+  }
+
+  close() {
+    this.closedByUser = true;
+    if (this.socket) {
+      this.socket.close(1000);
+    }
+  }
+
+  get connected() {
+    return this.socket !== null && this.socket.readyState === WebSocket.OPEN;
+  }
+
+  setState(state) {
+    if (this.onStateChange) {
+      this.onStateChange(state);
+    }
+  }
+
+  send(message) {
+    this.socket.send(JSON.stringify(message));
+  }
+
+  // Run a command; onOutput(chunk) is called as output arrives.
+  // Resolves with { returncode, cwd }.
+  execute(command, onOutput) {
+    if (!this.connected) {
+      return this.executeOverHttp(command, onOutput);
+    }
+    const id = this.nextId++;
+    return new Promise((resolve, reject) => {
+      this.pending.set(id, { onOutput, resolve, reject });
+      this.send({ type: "execute", id, command, binary: this.binary });
+    });
+  }
+
+  cancel(id) {
+    if (this.connected) {
+      this.send({ type: "cancel", id });
+    }
+  }
+
+  async executeOverHttp(command, onOutput) {
+    const response = await fetch("/execute", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      credentials: "same-origin",
+      body: JSON.stringify({ command }),
+    });
+    const data = await response.json();
+    if (onOutput && data.output) {
+      onOutput(data.output);
+    }
+    const failed = !data.success || String(data.output || "").startsWith("Error");
+    return { returncode: failed ? 1 : 0 };
+  }
+
+  // Queue a background job and stream its output as it is produced.
+  submitJob(command, onOutput) {
+    const id = this.nextId++;
+    return new Promise((resolve, reject) => {
+      this.pending.set(id, { onOutput, resolve, reject, job: true });
+      this.send({ type: "job.submit", id, command, binary: this.binary });
+    });
+  }
+
+  cancelJob(jobId) {
+    this.send({ type: "job.cancel", job_id: jobId });
+  }
+
+  subscribeMetrics(fields, interval) {
+    this.metricsRequest = { type: "metrics.subscribe", fields, interval };
+    if (this.connected) {
+      this.send(this.metricsRequest);
+    }
+  }
+
+  unsubscribeMetrics() {
+    this.metricsRequest = null;
+    if (this.connected) {
+      this.send({ type: "metrics.unsubscribe" });
+    }
+  }
+
+  // Attach to the session's interactive shell. onData receives raw bytes
+  // (a Uint8Array with escape sequences) for a terminal emulator.
+  openPty(onData, cols, rows, onExit) {
+    const id = this.nextId++;
+    this.pty = { id, onData, onExit };
+    this.send({ type: "pty.open", id, cols, rows });
+    return id;
+  }
+
+  // Keystrokes (a string or bytes) for the attached shell
+  sendKeys(data) {
+    if (this.pty && this.connected) {
+      this.socket.send(typeof data === "string" ? this.encoder.encode(data) : data);
+    }
+  }
+
+  resizePty(cols, rows) {
+    if (this.pty && this.connected) {
+      this.send({ type: "pty.resize", cols, rows });
+    }
+  }
+
+  closePty() {
+    if (this.pty && this.connected) {
+      this.send({ type: "pty.close" });
+    }
+    this.pty = null;
+  }
+
+  handleMessage(data) {
+    if (data instanceof ArrayBuffer) {
+      const id = new DataView(data).getUint32(0);
+      if (this.pty && this.pty.id === id) {
+        this.pty.onData(new Uint8Array(data, 4));
+        return;
+      }
+      // 4-byte big-endian request id followed by UTF-8 output
+      const request = this.pending.get(id);
+      if (request && request.onOutput) {
+        request.onOutput(this.decoder.decode(new Uint8Array(data, 4)));
+      }
+      return;
+    }
+
+    const message = JSON.parse(data);
+    const request = this.pending.get(message.id);
+    switch (message.type) {
+      case "output":
+        if (request && request.onOutput) {
+          request.onOutput(message.data);
+        }
+        break;
+      case "exit":
+        if (request) {
+          this.pending.delete(message.id);
+          request.resolve({ returncode: message.returncode, cwd: message.cwd });
+        }
+        break;
+      case "job":
+        if (this.onJob) {
+          this.onJob(message.job);
+        }
+        if (request && request.job && FINISHED_JOB_STATES.has(message.job.status)) {
+          this.pending.delete(message.id);
+          request.resolve(message.job);
+        }
+        break;
+      case "pty.exit":
+        if (this.pty && this.pty.id === message.id) {
+          if (this.pty.onExit) {
+            this.pty.onExit(message.returncode);
+          }
+          this.pty = null;
+        }
+        break;
+      case "metrics":
+        if (this.onMetrics) {
+          this.onMetrics(message.data);
+        }
+        break;
+      case "error":
+        if (request) {
+          this.pending.delete(message.id);
+          request.reject(new Error(message.message));
+        }
+        break;
+    }
+  }
+
+  failPending(reason) {
+    for (const request of this.pending.values()) {
+      request.reject(new Error(reason));
+    }
+    this.pending.clear();
+  }
+}
@@ -0,0 +1,34 @@
+from app.ai_backends import BatchingTranslator, CallableBackend, TranslationCache
+
+def translator(func, cache=None):
+    return BatchingTranslator(CallableBackend(func), cache=cache, batch_window=0)
+
+def test_translates_and_caches_answers(tmp_path):
+    calls = []
+    
+    def model(requests):
+        calls.append(len(requests))
+        return ['ls -la\nextra line' for _ in requests]
+    cache = TranslationCache(str(tmp_path / 'cache.db'))
+    batcher = translator(model, cache)
+    assert batcher.translate('list files', '/tmp', budget=2) == 'ls -la'
+    assert batcher.translate('list files', '/tmp', budget=2) == 'ls -la'
+    assert calls == [1]
+
+def test_non_answers_are_not_cached(tmp_path):
+    answers = [[None], ['pwd']]
+    cache = TranslationCache(str(tmp_path / 'cache.db'))
+    batcher = translator(lambda requests: answers.pop(0), cache)
+    assert batcher.translate('where am i', '/tmp', budget=2) is None
+    assert batcher.translate('where am i', '/tmp', budget=2) == 'pwd'
+
+def test_bad_results_fail_their_requests_without_stopping_the_batcher():
+    results = [[42], [], ['whoami']]
+    batcher = translator(lambda requests: results.pop(0))
+    # A non-str result and a short result list both fail fast instead of
+    # leaving the caller to wait out its budget
+    assert batcher.translate('a', '/', budget=2) is None
+    assert batcher.translate('b', '/', budget=2) is None
+    assert batcher.get_stats()['errors'] == 2
+    assert batcher.translate('c', '/', budget=2) == 'whoami'
+    assert batcher._thread.is_alive()
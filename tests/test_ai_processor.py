@@ -0,0 +1,76 @@
+import re
+
+import pytest
+
+from app.ai_processor import AIProcessor, leading_keywords
+
+QUERIES = [
+    'create a new folder called build',
+    'make directory tmp',
+    'delete the file old.txt',
+    'list all the files in src',
+    'show me the contents of docs',
+    'show the contents of file readme.md',
+    'find files named setup.py',
+    "what's the current directory",
+    'where am i',
+    'please go to the folder /var/log',
+    'show me all python files',
+    'sing a song',
+]
+
+def linear_match(processor, query):
+    """First matching pattern in registration order, without the index"""
+    for pattern, template in processor.command_patterns.items():
+        match = re.search(pattern, query, re.IGNORECASE)
+        if match:
+            args = [arg for arg in match.groups() if arg]
+            return template.format(*args) if args else template.replace(' {}', '')
+    return None
+
+@pytest.mark.parametrize('pattern, keywords', [
+    (r'create (?:a )?file', ['create']),
+    (r'(?:list|show) files', ['list', 'show']),
+    (r'where am i|who am i', None),
+    (r'make? dir', None),
+    (r'\w+ files', None),
+])
+def test_leading_keywords(pattern, keywords):
+    assert leading_keywords(pattern) == keywords
+
+def test_indexed_matching_agrees_with_a_linear_scan():
+    processor = AIProcessor()
+    processor.add_intent(r'(?:[a-z]+ )?disk usage', 'df -h')
+    for query in QUERIES + ['check disk usage']:
+        result = processor.process_query(query)
+        expected = linear_match(processor, query)
+        if expected is None:
+            assert result.get('command') in (None, 'find *.py')
+        else:
+            assert result['command'] == expected
+    assert processor.process_query('  Where AM I ')['command'] == 'pwd'
+    assert not processor.process_query('sing a song')['requires_execution']
+
+def test_result_cache_is_bounded_lru():
+    processor = AIProcessor(cache_size=2)
+    processor.process_query('where am i')
+    processor.process_query('who am i')
+    processor.process_query('where am i')
+    # 'who am i' is now least recently used and is evicted
+    processor.process_query('make directory x')
+    info = processor.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 3, 2)
+    processor.process_query('where am i')
+    processor.process_query('who am i')
+    info = processor.cache_info()
+    assert (info.hits, info.misses) == (2, 4)
+    
+    # Changing the intents invalidates cached results
+    processor.add_intent(r'who am i', 'id')
+    assert processor.cache_info().currsize == 0
+    assert processor.process_query('who am i')['command'] == 'id'
+
+def test_cached_results_are_not_shared_with_callers():
+    processor = AIProcessor()
+    processor.process_query('where am i')['command'] = 'rm -rf /'
+    assert processor.process_query('where am i')['command'] == 'pwd'
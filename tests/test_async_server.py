@@ -0,0 +1,73 @@
+import http.client
+import json
+
+import pytest
+
+from app import file_reader
+from app.async_server import AsyncServer
+from app.session_manager import SessionManager
+from app.system_monitor import SystemMonitor
+
+@pytest.fixture
+def server(tmp_path):
+    sessions = SessionManager(system_monitor=SystemMonitor())
+    sessions.get_terminal('s').current_directory = str(tmp_path)
+    server = AsyncServer(('127.0.0.1', 0), sessions, lambda cookie: 's')
+    server.start()
+    yield server
+    server.stop()
+
+def get(server, path):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=10)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read()), response.getheader('Connection')
+    finally:
+        connection.close()
+
+def test_file_errors_map_to_client_statuses(server, tmp_path, monkeypatch):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'f.txt').write_text('hello\n')
+    assert get(server, '/file?path=f.txt')[1]['text'] == 'hello\n'
+    status, body, connection = get(server, '/file?path=sub')
+    assert (status, body['error'], connection) == (400, "'sub' is a directory", 'keep-alive')
+    assert get(server, '/file?path=missing')[0] == 404
+    
+    def denied(*args):
+        raise PermissionError(13, 'Permission denied')
+    monkeypatch.setattr(file_reader, 'read_range', denied)
+    status, body, connection = get(server, '/file?path=f.txt')
+    assert (status, connection) == (403, 'keep-alive')
+
+def test_builtin_streams_have_their_own_limited_pool(tmp_path):
+    (tmp_path / 'log.txt').write_text('first\n')
+    sessions = SessionManager(system_monitor=SystemMonitor())
+    sessions.get_terminal('s').current_directory = str(tmp_path)
+    server = AsyncServer(('127.0.0.1', 0), sessions, lambda cookie: 's', workers=1, max_streams=1)
+    server.start()
+    try:
+        stream = http.client.HTTPConnection(*server.server_address, timeout=10)
+        stream.request('GET', '/execute/stream?command=tail%20-f%20log.txt')
+        response = stream.getresponse()
+        assert response.status == 200
+        assert b'first' in response.fp.readline() + response.fp.readline()
+        
+        # The follow holds the only stream thread, not the worker pool
+        assert get(server, '/file?path=log.txt')[0] == 200
+        status, body, _ = get(server, '/execute/stream?command=tail%20-f%20log.txt')
+        assert (status, body['type']) == (429, 'busy')
+        
+        # The disconnect is noticed on the next write, which frees the slot
+        response.close()
+        stream.close()
+        for _ in range(100):
+            with open(tmp_path / 'log.txt', 'a') as f:
+                f.write('more\n')
+            if server._stream_slots.acquire(timeout=0.05):
+                server._stream_slots.release()
+                break
+        else:
+            pytest.fail('stream slot was not released')
+    finally:
+        server.stop()
@@ -0,0 +1,46 @@
+import pytest
+
+from app.directory_listing import list_directory
+
+def names(entries):
+    return [entry['name'] for entry in entries]
+
+def page_through(path, **options):
+    """All pages of a listing, creating a file that sorts first after page one"""
+    pages = []
+    cursor = None
+    while True:
+        entries, cursor, _ = list_directory(path, cursor=cursor, limit=3, **options)
+        pages.append(names(entries))
+        if len(pages) == 1:
+            (path / '0-added').write_text('x' * 100)
+        if cursor is None:
+            return pages
+
+@pytest.fixture
+def directory(tmp_path):
+    for i in range(8):
+        (tmp_path / f"f{i}").write_text('x' * i)
+    (tmp_path / 'sub').mkdir()
+    return tmp_path
+
+def test_cursor_pages_stay_stable_while_entries_are_added(directory):
+    assert page_through(directory) == [['sub', 'f0', 'f1'], ['f2', 'f3', 'f4'], ['f5', 'f6', 'f7']]
+
+def test_cursor_follows_sort_order_and_direction(directory):
+    # Here the added entry sorts after the cursor, so it shows up
+    pages = page_through(directory, sort='name', reverse=True)
+    assert pages == [['sub', 'f7', 'f6'], ['f5', 'f4', 'f3'], ['f2', 'f1', 'f0'], ['0-added']]
+    (directory / 'sub' / 'big').write_text('x' * 10)
+    (directory / 'sub' / 'small').write_text('x')
+    (directory / 'sub' / 'empty').write_text('')
+    entries, cursor, total = list_directory(str(directory / 'sub'), sort='size', limit=2)
+    assert names(entries) == ['big', 'small'] and total == 3
+    assert names(list_directory(str(directory / 'sub'), sort='size', cursor=cursor, limit=2)[0]) == ['empty']
+
+def test_bad_cursors_are_rejected(directory):
+    _, cursor, _ = list_directory(str(directory), sort='size', limit=2)
+    with pytest.raises(ValueError):
+        list_directory(str(directory), sort='name', cursor=cursor, limit=2)
+    with pytest.raises(ValueError):
+        list_directory(str(directory), cursor='not a cursor!', limit=2)
@@ -0,0 +1,44 @@
+import os
+import shutil
+
+from app.file_index import FileIndex
+from app.file_search import ParallelFileFinder
+from app.terminal import PythonTerminal
+
+def test_find_sees_changes_made_since_the_last_refresh(tmp_path):
+    root = tmp_path / 'root'
+    (root / 'sub').mkdir(parents=True)
+    index = FileIndex(str(tmp_path / 'index.db'), [str(root)], refresh_interval=3600)
+    index.reindex()
+    terminal = PythonTerminal(current_directory=str(root), file_index=index)
+    assert terminal.execute_command('find x.txt') == 'No files found'
+    terminal.execute_command('touch sub/x.txt')
+    assert terminal.execute_command('find x.txt') == os.path.join(str(root), 'sub', 'x.txt')
+    terminal.execute_command('rm sub/x.txt')
+    assert terminal.execute_command('find x.txt') == 'No files found'
+
+def indexed(index, root, pattern='*'):
+    return sorted(os.path.relpath(path, root) for batch in index.search(ParallelFileFinder(pattern), root)
+                  for path in batch)
+
+def test_refresh_picks_up_added_and_deleted_entries(tmp_path):
+    root = str(tmp_path / 'root')
+    os.makedirs(os.path.join(root, 'a', 'b'))
+    for name in ('a/one.txt', 'a/b/two.txt', 'gone.txt'):
+        open(os.path.join(root, name), 'w').close()
+    index = FileIndex(str(tmp_path / 'index.db'), [root])
+    assert index.reindex() == 3
+    assert indexed(index, root) == ['a/b/two.txt', 'a/one.txt', 'gone.txt']
+    
+    os.remove(os.path.join(root, 'gone.txt'))
+    os.makedirs(os.path.join(root, 'new'))
+    open(os.path.join(root, 'new', 'three.txt'), 'w').close()
+    open(os.path.join(root, 'a', 'b', 'four.txt'), 'w').close()
+    assert index.refresh() == 2
+    assert indexed(index, root) == ['a/b/four.txt', 'a/b/two.txt', 'a/one.txt', 'new/three.txt']
+    assert index.refresh() == 0
+    
+    shutil.rmtree(os.path.join(root, 'a'))
+    index.refresh(os.path.join(root, 'a'))
+    assert not index.covers(os.path.join(root, 'a'))
+    assert indexed(index, root) == ['new/three.txt']
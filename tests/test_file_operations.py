@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from app.file_operations import FileOperation
+from app.terminal import PythonTerminal
+
+def make_tree(root):
+    os.makedirs(os.path.join(root, 'sub', 'deep'))
+    for name, size in (('a.txt', 10), ('sub/b.bin', 300000), ('sub/deep/c.txt', 0)):
+        with open(os.path.join(root, name), 'wb') as f:
+            f.write(os.urandom(size))
+    os.chmod(os.path.join(root, 'a.txt'), 0o640)
+    os.utime(os.path.join(root, 'sub', 'b.bin'), (1000000000, 1000000000))
+    os.symlink('a.txt', os.path.join(root, 'link'))
+
+def snapshot(root):
+    """Relative path -> (kind, mode, mtime, content or link target)"""
+    tree = {}
+    for directory, dirs, files in os.walk(root):
+        for name in dirs + files:
+            path = os.path.join(directory, name)
+            info = os.lstat(path)
+            if os.path.islink(path):
+                value = ('link', os.readlink(path))
+            elif os.path.isdir(path):
+                value = ('dir', info.st_mode)
+            else:
+                with open(path, 'rb') as f:
+                    value = ('file', info.st_mode, int(info.st_mtime), f.read())
+            tree[os.path.relpath(path, root)] = value
+    return tree
+
+@pytest.fixture
+def other_filesystem():
+    """A directory on another filesystem than tmp_path, if there is one"""
+    if not os.path.isdir('/dev/shm') or os.stat('/dev/shm').st_dev == os.stat(tempfile.gettempdir()).st_dev:
+        pytest.skip('no second filesystem available')
+    path = tempfile.mkdtemp(dir='/dev/shm')
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+def test_copy_tree_preserves_contents_and_metadata(tmp_path):
+    make_tree(str(tmp_path / 'src'))
+    operation = FileOperation('copy', [str(tmp_path / 'src')], str(tmp_path / 'dst'), recursive=True)
+    assert operation.run().startswith('Copied 4 files')
+    assert operation.returncode == 0
+    assert snapshot(str(tmp_path / 'dst')) == snapshot(str(tmp_path / 'src'))
+
+def test_move_across_filesystems(tmp_path, other_filesystem):
+    source = str(tmp_path / 'src')
+    make_tree(source)
+    expected = snapshot(source)
+    target = os.path.join(other_filesystem, 'moved')
+    operation = FileOperation('move', [source], target)
+    assert operation.run().startswith('Moved 4 files')
+    assert operation.returncode == 0
+    assert not os.path.exists(source)
+    assert snapshot(target) == expected
+    back = str(tmp_path / 'back')
+    FileOperation('move', [target], back).run()
+    assert snapshot(back) == expected
+
+def test_copy_across_filesystems_and_remove(tmp_path, other_filesystem):
+    make_tree(str(tmp_path / 'src'))
+    target = os.path.join(other_filesystem, 'copy')
+    FileOperation('copy', [str(tmp_path / 'src')], target, recursive=True).run()
+    assert snapshot(target) == snapshot(str(tmp_path / 'src'))
+    operation = FileOperation('remove', [target], recursive=True)
+    operation.run()
+    assert operation.returncode == 0 and not os.path.exists(target)
+
+def test_cancelled_copy_reports_130(tmp_path):
+    make_tree(str(tmp_path / 'src'))
+    operation = FileOperation('copy', [str(tmp_path / 'src')], str(tmp_path / 'dst'), recursive=True)
+    operation.kill()
+    assert 'Error: Cancelled' in operation.run()
+    assert operation.returncode == 130
+
+def test_partial_failure_sets_exit_status(tmp_path):
+    (tmp_path / 'zz').write_text('x')
+    terminal = PythonTerminal(current_directory=str(tmp_path))
+    output = terminal.execute_command('rm zz nonexist')
+    assert output.startswith('Removed 1 file') and 'does not exist' in output
+    assert terminal.command_history[-1]['exit_status'] == 1
+    assert not (tmp_path / 'zz').exists()
+
+def test_rm_without_r_keeps_rmdir_semantics(tmp_path):
+    (tmp_path / 'empty').mkdir()
+    (tmp_path / 'full').mkdir()
+    (tmp_path / 'full' / 'f').write_text('x')
+    terminal = PythonTerminal(current_directory=str(tmp_path))
+    terminal.execute_command('rm empty')
+    assert not (tmp_path / 'empty').exists()
+    assert terminal.execute_command('rm full').count('Error') == 1
+    assert terminal.command_history[-1]['exit_status'] == 1
+    assert (tmp_path / 'full' / 'f').exists()
@@ -0,0 +1,54 @@
+import pytest
+
+from app import file_reader
+
+def read_all(path, max_bytes):
+    """Follow read_range cursors to the end, returning each page"""
+    pages = []
+    offset = 0
+    while True:
+        page = file_reader.read_range(path, offset, max_bytes)
+        pages.append(page)
+        assert page['offset'] == offset
+        assert page['next_offset'] > offset or page['eof']
+        offset = page['next_offset']
+        if page['eof']:
+            return pages
+
+@pytest.mark.parametrize('max_bytes', [4, 5, 7, 16])
+def test_read_range_pages_split_multibyte_characters_cleanly(tmp_path, max_bytes):
+    text = 'aé€😀b' * 10
+    path = tmp_path / 'f.txt'
+    path.write_text(text, encoding='utf-8')
+    pages = read_all(str(path), max_bytes)
+    assert ''.join(page['text'] for page in pages) == text
+    assert pages[-1]['next_offset'] == pages[-1]['size'] == len(text.encode('utf-8'))
+
+def test_read_range_cuts_pages_on_line_boundaries(tmp_path):
+    path = tmp_path / 'f.txt'
+    path.write_text('one\ntwo\nthree\n')
+    page = file_reader.read_range(str(path), 0, 10)
+    assert page['text'] == 'one\ntwo\n'
+    assert not page['eof']
+    page = file_reader.read_range(str(path), page['next_offset'], 10)
+    assert page['text'] == 'three\n'
+    assert page['eof']
+
+def test_tail_lines_across_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_reader, 'TAIL_BLOCK_SIZE', 8)
+    lines = [f'line {i} é' for i in range(50)]
+    path = tmp_path / 'f.txt'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    result = file_reader.tail_lines(str(path), 3)
+    assert result['text'] == '\n'.join(lines[-3:]) + '\n'
+    assert result['next_offset'] == result['size']
+    assert result['offset'] == result['size'] - len(result['text'].encode('utf-8'))
+    path.write_text('\n'.join(lines), encoding='utf-8')
+    assert file_reader.tail_lines(str(path), 2)['text'] == '\n'.join(lines[-2:])
+
+def test_tail_lines_cap_does_not_split_a_character(tmp_path):
+    path = tmp_path / 'f.txt'
+    path.write_text('x€€€\n', encoding='utf-8')
+    result = file_reader.tail_lines(str(path), 1, max_bytes=6)
+    assert result['text'] == '€\n'
+    assert result['offset'] == result['size'] - 4
@@ -0,0 +1,108 @@
+import asyncio
+import subprocess
+import threading
+import time
+
+import pytest
+
+from app.async_terminal import AsyncTerminal
+from app.governor import ExecutionGovernor, GovernorBusy
+from app.jobs import Job, JobManager
+from app.terminal import PythonTerminal
+
+def test_slots_are_released_and_reused():
+    governor = ExecutionGovernor(max_concurrent=2, per_session=2, max_queue=0)
+    first = governor.acquire('a')
+    second = governor.acquire('a')
+    with pytest.raises(GovernorBusy):
+        governor.acquire('a')
+    first.release()
+    first.release()  # idempotent
+    third = governor.acquire('a')
+    assert governor.stats()['running'] == 2
+    second.release()
+    third.release()
+    assert governor.stats()['running'] == 0
+
+def test_busy_session_does_not_block_others():
+    governor = ExecutionGovernor(max_concurrent=4, per_session=1, queue_timeout=0.1)
+    held = governor.acquire('a')
+    with pytest.raises(GovernorBusy):
+        governor.acquire('a')
+    governor.acquire('b').release()
+    held.release()
+
+def test_queued_waiter_gets_the_freed_slot():
+    governor = ExecutionGovernor(max_concurrent=1, per_session=1, queue_timeout=5)
+    held = governor.acquire('a')
+    granted = []
+    waiter = threading.Thread(target=lambda: granted.append(governor.acquire('b')))
+    waiter.start()
+    time.sleep(0.1)
+    assert governor.stats()['queued'] == 1
+    held.release()
+    waiter.join(5)
+    assert len(granted) == 1 and governor.stats()['running'] == 1
+    granted[0].release()
+
+def test_async_acquire_queues_and_abandons():
+    governor = ExecutionGovernor(max_concurrent=1, per_session=1, queue_timeout=5)
+    
+    async def scenario():
+        held = governor.acquire('a')
+        waiter = asyncio.ensure_future(governor.acquire_async('b'))
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert governor.stats()['queued'] == 0
+        held.release()
+        slot = await governor.acquire_async('b')
+        slot.release()
+    asyncio.run(scenario())
+    assert governor.stats()['running'] == 0
+
+def test_timeouts_per_program_and_for_streams():
+    governor = ExecutionGovernor(default_timeout=30, stream_timeout=600, timeouts={'make': 900})
+    assert governor.timeout_for('ls -l') == 30
+    assert governor.timeout_for('ls -l', streaming=True) == 600
+    assert governor.timeout_for('make all', streaming=True) == 900
+
+def test_streamed_commands_get_the_stream_timeout(tmp_path):
+    governor = ExecutionGovernor(stream_timeout=0.5)
+    terminal = PythonTerminal(current_directory=str(tmp_path), governor=governor)
+    started = time.monotonic()
+    stream = terminal.stream_command('sleep 10')
+    output = ''.join(stream)
+    assert 'timed out' in output
+    assert time.monotonic() - started < 5
+    assert governor.stats()['running'] == 0
+
+def test_jobs_do_not_hold_interactive_slots(tmp_path):
+    governor = ExecutionGovernor(max_concurrent=8, per_session=2, queue_timeout=0.5)
+    terminal = PythonTerminal(current_directory=str(tmp_path), governor=governor,
+                              session_id='s')
+    jobs = JobManager(max_workers=4)
+    try:
+        running = [jobs.submit(terminal, 'sleep 2', session_id='s') for _ in range(4)]
+        time.sleep(0.3)
+        assert terminal.execute_command('echo interactive') == 'interactive'
+        for job in running:
+            for _ in job.iter_output(keepalive=0.2):
+                pass
+        assert [job.status for job in running] == [Job.COMPLETED] * 4
+    finally:
+        jobs.shutdown()
+
+def test_resource_limits_apply_to_every_spawn_path(tmp_path):
+    governor = ExecutionGovernor(cpu_seconds=5, memory_bytes=512 * 1024 * 1024, nice=3)
+    assert ExecutionGovernor().wrap_argv(['ls']) == ['ls']
+    terminal = PythonTerminal(current_directory=str(tmp_path), governor=governor)
+    script = 'ulimit -S -t; ulimit -H -t; ulimit -v; nice'
+    base = int(subprocess.check_output(['nice']))
+    expected = f'5\n6\n524288\n{base + 3}'
+    
+    assert terminal.execute_command(script) == expected
+    assert ''.join(terminal.stream_command(script)) == expected + '\n'
+    assert terminal.execute_command("sh -c 'ulimit -v' | head -n 1") == '524288'
+    assert asyncio.run(AsyncTerminal(terminal).execute_command(script)) == expected
@@ -0,0 +1,20 @@
+from app.grep_engine import GrepEngine
+
+def search(tmp_path, content, pattern, **options):
+    path = tmp_path / 'data.txt'
+    path.write_bytes(content)
+    return GrepEngine(pattern, **options).search_file(str(path))
+
+def test_regex_does_not_match_across_lines(tmp_path):
+    assert search(tmp_path, b'a\nb\n', r'a\s+b', regex=True) == []
+    assert search(tmp_path, b'a\nb\n', r'a[^x]b', regex=True) == []
+
+def test_line_with_a_crossing_and_an_inline_match_is_reported(tmp_path):
+    assert search(tmp_path, b'a\nb\na  b\n', r'a\s+b', regex=True) == [(3, 'a  b')]
+    assert search(tmp_path, b'xa\nb\n', r'a\s*', regex=True) == [(1, 'xa')]
+
+def test_line_numbers_and_max_count(tmp_path):
+    content = b'one\nTwo\nthree\ntwo again\n'
+    assert search(tmp_path, content, 'two') == [(2, 'Two'), (4, 'two again')]
+    assert search(tmp_path, content, 'two', ignore_case=False) == [(4, 'two again')]
+    assert search(tmp_path, content, 't.o', regex=True, max_count=1) == [(2, 'Two')]
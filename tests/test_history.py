@@ -0,0 +1,87 @@
+import importlib
+import json
+import time
+
+import pytest
+
+from app.history import CommandHistory
+
+def entry(command, session='s1'):
+    return {'command': command, 'timestamp': time.time(), 'session': session,
+            'exit_status': 0, 'duration': 0.0}
+
+def test_log_round_trips_across_instances(tmp_path):
+    path = str(tmp_path / 'history.jsonl')
+    history = CommandHistory(path)
+    for command in ('ls', 'pwd', 'ls'):
+        history.record(entry(command))
+    history.close()
+    with open(path, 'a') as f:
+        f.write('{"command": "torn')  # a crash mid-write
+    reloaded = CommandHistory(path)
+    assert [e['command'] for e in reloaded.recent()] == ['ls', 'pwd', 'ls']
+    assert reloaded.record(entry('date'))['id'] == 4
+    assert [e['command'] for e in reloaded.search('')] == ['date', 'ls', 'pwd']
+    reloaded.close()
+
+def test_compaction_keeps_the_newest_entries(tmp_path):
+    path = str(tmp_path / 'history.jsonl')
+    history = CommandHistory(path, max_entries=3)
+    for i in range(5):
+        history.record(entry(f"echo {i}"))
+    with open(path) as f:
+        assert len(f.readlines()) == 5
+    # The log is rewritten once it holds twice as many lines as are kept
+    history.record(entry('echo 5'))
+    with open(path) as f:
+        assert [json.loads(line)['command'] for line in f] == ['echo 3', 'echo 4', 'echo 5']
+    history.record(entry('echo 6'))
+    history.close()
+    reloaded = CommandHistory(path, max_entries=3)
+    assert [e['command'] for e in reloaded.recent()] == ['echo 4', 'echo 5', 'echo 6']
+    assert reloaded.search('echo 3') == []
+    # A log longer than what is kept is compacted on load
+    assert reloaded.stats()['log_lines'] == 3
+    reloaded.close()
+
+def test_prefix_search_bounds_and_duplicates():
+    history = CommandHistory()
+    for command in ('git status', 'git log', 'git status', 'git \uffff', 'git \U0001f600', 'gitk', 'grep'):
+        history.record(entry(command))
+    found = [e['command'] for e in history.search('git ')]
+    # Newest first, each command once (its newest entry), including commands
+    # with characters at and above U+FFFF
+    assert found == ['git \U0001f600', 'git \uffff', 'git status', 'git log']
+    assert history.search('git status')[0]['id'] == 3
+    assert [e['command'] for e in history.search('git', q='st')] == ['git status']
+
+def test_evicted_commands_leave_the_index():
+    history = CommandHistory(max_entries=2)
+    for command in ('make', 'ls', 'pwd'):
+        history.record(entry(command))
+    assert history.search('ma') == []
+    assert history.stats()['distinct_commands'] == 2
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    monkeypatch.setenv('TERMINAL_HISTORY_PATH', str(tmp_path / 'history.jsonl'))
+    monkeypatch.setenv('TERMINAL_SECRET_KEY', 'test-secret-key')
+    monkeypatch.setenv('TERMINAL_WS_ENABLED', '0')
+    monkeypatch.setenv('TERMINAL_LOCK_PATH', str(tmp_path / 'server.lock'))
+    monkeypatch.setenv('TERMINAL_PROFILE_DIR', str(tmp_path / 'profiles'))
+    return importlib.import_module('app.main')
+
+def test_history_endpoint_scopes(main, monkeypatch):
+    alice = main.app.test_client()
+    bob = main.app.test_client()
+    alice.post('/execute', json={'command': 'echo from-alice'})
+    bob.post('/execute', json={'command': 'echo from-bob'})
+    
+    def commands(client, **params):
+        response = client.get('/history', query_string=params)
+        return response.status_code, [e['command'] for e in response.get_json().get('history', [])]
+    assert commands(alice, prefix='echo from') == (200, ['echo from-alice'])
+    assert commands(alice, prefix='echo from', scope='global')[0] == 403
+    monkeypatch.setattr(main, 'history_global_search', True)
+    status, found = commands(alice, prefix='echo from', scope='global')
+    assert status == 200 and found[:2] == ['echo from-bob', 'echo from-alice']
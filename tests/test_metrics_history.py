@@ -0,0 +1,38 @@
+import pytest
+
+from app.metrics_history import MetricsHistory, RingSeries
+
+def test_ring_series_reuses_slots_for_newer_buckets():
+    ring = RingSeries(1, 4)
+    for t in range(10):
+        ring.add(t, t)
+    # Only the last four buckets survive; stale slots are never reported
+    assert ring.query(0, 9) == [(6, 6, 6, 6), (7, 7, 7, 7), (8, 8, 8, 8), (9, 9, 9, 9)]
+    ring.add(12, 5)
+    assert ring.query(0, 12) == [(9, 9, 9, 9), (12, 5, 5, 5)]
+    # Bucket 8 shared its slot with bucket 12
+    assert ring.query(0, 8) == [(6, 6, 6, 6), (7, 7, 7, 7)]
+
+def test_history_downsamples_min_max_avg_per_resolution():
+    history = MetricsHistory(metrics=['cpu_percent'], resolutions=[(10, 6), (1, 5)])
+    assert history.resolutions == [(1, 5), (10, 6)]
+    for t, value in enumerate([1, 5, 3, 7, 9, 2, 4, 8, 6, 10, 20, 30]):
+        history.record({'timestamp': 100 + t, 'cpu_percent': value, 'memory_percent': 50})
+    history.record({'timestamp': 112})
+    
+    coarse = history.query(['cpu_percent'], window=60, end=119)
+    assert coarse['resolution'] == 10
+    assert coarse['series']['cpu_percent'] == [(100, 1, 10, 5.5), (110, 20, 30, 25)]
+    
+    fine = history.query(['cpu_percent'], window=5, end=111)
+    assert fine['resolution'] == 1
+    assert [point[0] for point in fine['series']['cpu_percent']] == [107, 108, 109, 110, 111]
+    assert fine['series']['cpu_percent'][-1] == (111, 30, 30, 30)
+
+def test_history_rejects_unknown_metric_and_resolution():
+    history = MetricsHistory(metrics=['cpu_percent'], resolutions=[(1, 5)])
+    with pytest.raises(ValueError, match='Unknown metric'):
+        history.query(['load'])
+    with pytest.raises(ValueError, match='Unsupported resolution'):
+        history.query(['cpu_percent'], resolution=60)
+    assert history.pick_resolution(3600) == 1
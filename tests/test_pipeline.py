@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from app.pipeline import Pipeline, parse
+from app.terminal import PythonTerminal
+
+@pytest.fixture
+def terminal(tmp_path):
+    (tmp_path / 'f.txt').write_text('foo 3\nbar 1\nbaz 2\n')
+    return PythonTerminal(current_directory=str(tmp_path))
+
+def run(terminal, command):
+    """Output and exit status of a pipeline"""
+    pipeline = Pipeline(terminal, parse(command))
+    return pipeline.read(), pipeline.returncode
+
+def test_clean_external_pipeline_is_not_killed(terminal):
+    for _ in range(20):
+        assert run(terminal, 'echo hi | sed s/h/H/') == ('Hi', 0)
+
+def test_early_stop_ends_upstream_commands(terminal):
+    assert run(terminal, 'yes | head -n 2') == ('y\ny', 0)
+
+def test_failed_builtin_stage_sets_exit_status(terminal):
+    output, status = run(terminal, 'cat missing.txt | sort')
+    assert output.startswith("Error: '") and output.endswith("missing.txt' not found")
+    assert status == 1
+
+def test_failed_stage_feeding_external_command_sets_exit_status(terminal):
+    output, status = run(terminal, 'cat missing.txt | sed s/a/b/')
+    assert output.endswith("missing.txt' not found")
+    assert status == 1
+
+def test_exit_status_of_last_external_stage(terminal):
+    assert run(terminal, 'cat f.txt | false')[1] == 1
+    assert run(terminal, 'cat f.txt | sed s/a/b/') == ('foo 3\nbbr 1\nbbz 2', 0)
+
+def test_history_records_pipeline_status(terminal):
+    terminal.execute_command('cat missing.txt | sort')
+    assert terminal.command_history[-1]['exit_status'] == 1
+    terminal.execute_command('cat f.txt | sort')
+    assert terminal.command_history[-1]['exit_status'] == 0
+
+def test_flags_the_builtin_lacks_run_the_real_program(terminal):
+    assert run(terminal, 'cat f.txt | grep -P "^ba"') == ('bar 1\nbaz 2', 0)
+    assert run(terminal, 'cat f.txt | grep -q zzz')[1] == 1
+    assert run(terminal, 'sort -k2 f.txt | head -n 1') == ('bar 1', 0)
+
+def test_posix_find_runs_the_real_program(terminal, tmp_path):
+    (tmp_path / 'd').mkdir()
+    (tmp_path / 'd' / 'a.txt').write_text('x\n')
+    assert run(terminal, 'find . -name "a.*" | wc -l') == ('1', 0)
+
+def test_builtin_filters_follow_grep_semantics(terminal):
+    assert run(terminal, 'cat f.txt | grep -c ba') == ('2', 0)
+    assert run(terminal, 'cat f.txt | grep -v ba') == ('foo 3', 0)
+    assert run(terminal, 'cat f.txt | grep -in BA') == ('2:bar 1\n3:baz 2', 0)
+    assert run(terminal, 'cat f.txt | grep Foo')[0] == ''
+
+def test_unsupported_stage_without_program_aborts(terminal, tmp_path):
+    terminal.environment['PATH'] = str(tmp_path / 'empty')
+    output, status = run(terminal, 'cat f.txt | grep -P foo > out.txt')
+    assert output == 'Error: grep: unknown option -P'
+    assert status == 1
+    # Nothing ran: the redirection target was not even created
+    assert not (tmp_path / 'out.txt').exists()
+
+def test_failing_builtin_stage_is_not_piped_onwards(terminal):
+    output, status = run(terminal, 'ls missing | wc -l')
+    assert output.startswith("Error: Path '") and status == 1
+
+def test_builtin_only_pipelines_are_bounded(terminal):
+    pipeline = Pipeline(terminal, parse('cat /dev/urandom | wc -l'), timeout=0.5)
+    started = time.monotonic()
+    assert pipeline.read().endswith('Error: Command timed out')
+    assert time.monotonic() - started < 5
+    pipeline = Pipeline(terminal, parse('cat /dev/zero | wc -c'), max_input_bytes=1024 * 1024)
+    output = pipeline.read()
+    assert output.startswith('Error:') and pipeline.returncode == 1
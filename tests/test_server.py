@@ -0,0 +1,62 @@
+import http.client
+import threading
+import time
+
+import pytest
+
+from app.server import ProductionServer
+
+@pytest.fixture
+def blocking_server():
+    """A server whose /hold and /hold/stream requests wait for `release`"""
+    release = threading.Event()
+    
+    def app(environ, start_response):
+        if environ['PATH_INFO'].startswith('/hold'):
+            release.wait(10)
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'ok']
+    
+    def start(**options):
+        server = ProductionServer('127.0.0.1', 0, app, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+    servers = []
+    yield start, release
+    release.set()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def request(server, path, wait=True):
+    connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=10)
+    connection.request('GET', path)
+    if not wait:
+        return connection
+    response = connection.getresponse()
+    return response.status, response.getheader('Retry-After'), response.read()
+
+def test_streams_cannot_take_the_whole_pool(blocking_server):
+    start, release = blocking_server
+    server = start(threads=4, max_streams=1)
+    held = request(server, '/hold/stream', wait=False)
+    while server._streams == 0:
+        time.sleep(0.01)
+    status, retry_after, _ = request(server, '/other/stream')
+    assert (status, retry_after) == (503, '1')
+    assert request(server, '/execute')[0] == 200
+    release.set()
+    assert held.getresponse().status == 200
+    while server._streams:
+        time.sleep(0.01)  # released once the server closes the response
+    assert request(server, '/other/stream')[0] == 200
+
+def test_backlog_beyond_the_limit_is_turned_away(blocking_server):
+    start, release = blocking_server
+    server = start(threads=1, max_backlog=1)
+    held = [request(server, '/hold', wait=False) for _ in range(2)]
+    status, retry_after, body = request(server, '/execute')
+    assert (status, retry_after) == (503, '1') and b'overloaded' in body
+    release.set()
+    assert [connection.getresponse().status for connection in held] == [200, 200]
@@ -0,0 +1,78 @@
+import atexit
+import gc
+import weakref
+
+import pytest
+
+from app import session_manager as session_module
+from app.session_manager import SessionManager
+from app.system_monitor import SystemMonitor
+from app.terminal import PythonTerminal
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_module.time, 'monotonic', lambda: now[0])
+    return now
+
+@pytest.fixture
+def manager():
+    manager = SessionManager(system_monitor=SystemMonitor(), max_sessions=2, idle_timeout=60)
+    manager.closed = []
+    manager.eviction_callbacks.append(lambda session_id, terminal: manager.closed.append((session_id, terminal)))
+    return manager
+
+def test_sessions_have_independent_state(manager, tmp_path):
+    a = manager.get_terminal('a')
+    b = manager.get_terminal('b')
+    assert a is not b and manager.get_terminal('a') is a
+    a.execute_command(f'cd {tmp_path}')
+    assert a.current_directory == str(tmp_path)
+    assert b.current_directory != str(tmp_path)
+    assert a.system_monitor is b.system_monitor is manager.system_monitor
+
+def test_least_recently_used_session_is_evicted_and_closed(manager, clock):
+    a = manager.get_terminal('a')
+    b = manager.get_terminal('b')
+    manager.get_terminal('a')
+    # peek does not count as a use
+    assert manager.peek('b') is b
+    manager.get_terminal('c')
+    assert manager.closed == [('b', b)]
+    assert len(manager) == 2 and manager.peek('b') is None
+    # An evicted session starts over with a fresh terminal
+    assert manager.get_terminal('b') is not b
+    assert manager.closed[-1] == ('a', a)
+
+def test_idle_sessions_are_evicted_and_closed(manager, clock):
+    a = manager.get_terminal('a')
+    clock[0] += 30
+    b = manager.get_terminal('b')
+    clock[0] += 31
+    assert manager.evict_idle() == 1
+    assert manager.closed == [('a', a)]
+    clock[0] += 30
+    # Expired sessions are also dropped when another session is touched
+    manager.get_terminal('c')
+    assert manager.closed == [('a', a), ('b', b)]
+    assert manager.stats()['active_sessions'] == 1
+
+def test_close_session_runs_callbacks_despite_failures(manager):
+    def broken(session_id, terminal):
+        raise RuntimeError('boom')
+    manager.eviction_callbacks.insert(0, broken)
+    a = manager.get_terminal('a')
+    assert manager.close_session('a')
+    assert not manager.close_session('a')
+    assert manager.closed == [('a', a)]
+
+def test_terminals_share_one_monitor_by_default():
+    callbacks = atexit._ncallbacks()
+    sessions = SessionManager()
+    a, b = sessions.get_terminal('a'), sessions.get_terminal('b')
+    assert a.system_monitor is b.system_monitor is PythonTerminal().system_monitor
+    # Monitors register no exit hook of their own and can be collected
+    monitor = weakref.ref(SystemMonitor())
+    gc.collect()
+    assert monitor() is None
+    assert atexit._ncallbacks() == callbacks
@@ -0,0 +1,33 @@
+import pytest
+
+from app.terminal import PythonTerminal
+
+@pytest.fixture
+def terminal(tmp_path):
+    (tmp_path / 'f.txt').write_text('foo,3\nbar,1\nbaz,22\n')
+    return PythonTerminal(current_directory=str(tmp_path))
+
+def test_flags_the_builtin_lacks_run_the_system_program(terminal):
+    assert terminal.execute_command('sort -t, -k2 -n f.txt') == 'bar,1\nfoo,3\nbaz,22'
+    assert terminal.execute_command('wc -L f.txt') == '6 f.txt'
+    assert terminal.execute_command('head -c 5 f.txt') == 'foo,3'
+    assert terminal.command_history[-1]['exit_status'] == 0
+
+def test_supported_flags_stay_builtin(terminal, tmp_path):
+    terminal.environment['PATH'] = str(tmp_path / 'empty')
+    assert terminal.execute_command('sort -r f.txt') == 'foo,3\nbaz,22\nbar,1'
+    assert terminal.execute_command('head -n 1 f.txt') == 'foo,3'
+    assert terminal.execute_command('sort -k2 f.txt').startswith('Error')
+
+def test_head_and_tail_counts_from_the_other_end(terminal, tmp_path):
+    (tmp_path / 'n.txt').write_text(''.join(f"{i}\n" for i in range(1, 21)))
+    assert terminal.execute_command('tail -n +18 n.txt') == '18\n19\n20'
+    terminal.environment['PATH'] = str(tmp_path / 'empty')
+    assert terminal.execute_command('head -n -3 n.txt') == 'Error: Unsupported count -3'
+    assert terminal.command_history[-1]['exit_status'] == 1
+
+def test_cat_concatenates_files(terminal, tmp_path):
+    (tmp_path / 'g.txt').write_text('qux,4\n')
+    assert terminal.execute_command('cat f.txt g.txt') == 'foo,3\nbar,1\nbaz,22\nqux,4\n'
+    assert terminal.execute_command('cat --max-bytes 8 f.txt g.txt').endswith(
+        'continue with: cat --offset 6 f.txt; cat g.txt --')
@@ -0,0 +1,47 @@
+from app.jobs import JobManager
+from app.system_monitor import SystemMonitor
+from app.terminal import PythonTerminal
+from app.websocket_server import TerminalChannel
+
+class FakeWebSocket:
+    """Records the JSON messages a channel sends"""
+    
+    def __init__(self):
+        self.sent = []
+    
+    def send_json(self, message):
+        self.sent.append(message)
+
+def channel(tmp_path, **options):
+    terminal = PythonTerminal(current_directory=str(tmp_path))
+    return TerminalChannel(FakeWebSocket(), terminal, 'session-id', **options)
+
+def test_malformed_messages_get_an_error_and_keep_the_channel(tmp_path):
+    monitor = SystemMonitor(sample_interval=60)
+    ws_channel = channel(tmp_path, system_monitor=monitor)
+    try:
+        ws_channel._dispatch({'type': 'metrics.subscribe', 'interval': 'x'})
+        ws_channel._dispatch({'type': 'metrics.subscribe', 'fields': 7})
+        ws_channel._dispatch({'type': 'ping', 'id': 1})
+    finally:
+        ws_channel._shutdown()
+        monitor.stop()
+    sent = ws_channel.ws.sent
+    assert [message['type'] for message in sent] == ['error', 'error', 'pong']
+    assert ws_channel._metrics is None
+
+def test_handler_exceptions_become_error_frames(tmp_path):
+    ws_channel = channel(tmp_path)
+    ws_channel._dispatch({'type': 'execute', 'id': ['unhashable'], 'command': 'echo hi'})
+    assert ws_channel.ws.sent[-1]['type'] == 'error'
+
+def test_job_watch_rejects_a_bad_offset(tmp_path):
+    jobs = JobManager(max_workers=1)
+    ws_channel = channel(tmp_path, job_manager=jobs)
+    try:
+        job = jobs.submit(ws_channel.terminal, 'echo hi', session_id='session-id')
+        ws_channel._dispatch({'type': 'job.watch', 'id': 1, 'job_id': job.id, 'offset': 'a'})
+        assert ws_channel.ws.sent[-1] == {'type': 'error', 'id': 1,
+                                          'message': 'offset must be a non-negative integer'}
+    finally:
+        jobs.shutdown()
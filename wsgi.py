@@ -0,0 +1,25 @@
+"""WSGI entry point for external servers
+
+    gunicorn --workers 1 --threads 32 --graceful-timeout 30 wsgi:application
+
+Terminal sessions, shells and jobs live in this process's memory, so run
+exactly one worker process and scale with threads; a second process
+refuses to start. On `kill -HUP` the gunicorn master starts a new worker
+which waits (up to TERMINAL_LOCK_WAIT seconds) for the old one to drain.
+The WebSocket channel is started here on TERMINAL_WS_PORT, and the
+asyncio endpoint on TERMINAL_ASYNC_PORT when TERMINAL_ASYNC_ENABLED=1.
+"""
+import atexit
+import os
+from app.main import app, async_server, instance_lock_path, shutdown, websocket_server
+from app.server import acquire_instance_lock
+
+acquire_instance_lock(instance_lock_path, wait=float(os.environ.get('TERMINAL_LOCK_WAIT', '30')))
+app.debug = False
+if websocket_server is not None:
+    websocket_server.start()
+if async_server is not None:
+    async_server.start()
+atexit.register(shutdown)
+
+application = app